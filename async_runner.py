@@ -0,0 +1,60 @@
+"""
+Background event loop for calling async code from Flask's sync handlers
+One loop per process runs every coroutine, so many conversations share a
+single thread while they wait on providers
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Awaitable, Callable, Optional
+
+# How often a waiting caller checks whether its client is still connected
+CANCEL_POLL_INTERVAL = 0.1
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """The process-wide background loop, started on first use"""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='async-runner', daemon=True)
+                thread.start()
+                _loop = loop
+    return _loop
+
+
+def run_sync(coro: Awaitable, timeout: Optional[float] = None,
+             is_cancelled: Optional[Callable[[], bool]] = None):
+    """Run `coro` on the background loop and wait for its result.
+
+    If `is_cancelled` starts returning True (e.g. the HTTP client went away)
+    the coroutine is cancelled and asyncio.CancelledError is raised here.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_loop())
+    if is_cancelled is None:
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
+
+    waited = 0.0
+    while True:
+        try:
+            return future.result(CANCEL_POLL_INTERVAL)
+        except FutureTimeout:
+            waited += CANCEL_POLL_INTERVAL
+            if is_cancelled():
+                logging.info("Client disconnected, cancelling in-flight response")
+                future.cancel()
+                raise asyncio.CancelledError()
+            if timeout is not None and waited >= timeout:
+                future.cancel()
+                raise
@@ -0,0 +1,200 @@
+"""
+Micro-benchmarks for GABE's hot paths.
+
+Run with: python benchmarks.py crisis memory intents
+"""
+
+import re
+import sys
+import time
+import timeit
+import asyncio
+import statistics
+
+from crisis_detection import CrisisDetector
+
+
+def _legacy_check_for_crisis(detector, message):
+    """The original per-phrase CrisisDetector.check_for_crisis, kept for comparison"""
+    message_lower = message.lower()
+    for positive in detector.positive_indicators:
+        if positive in message_lower:
+            return None
+    cleaned_message = re.sub(r'[^\w\s]', ' ', message_lower)
+    for keyword in detector.high_crisis_keywords:
+        if keyword in cleaned_message:
+            return detector._generate_crisis_response(message)
+    for pattern in detector.severe_patterns:
+        if re.search(pattern, cleaned_message):
+            return detector._generate_crisis_response(message)
+    return None
+
+
+CRISIS_SAMPLES = [
+    "I had a really hard day and I feel so alone tonight",
+    "Honestly I just want to die, nothing matters",
+    "Thank you, that prayer really helped me today!",
+    "I'm better off dead... everyone would move on",
+    "Can you tell me the story of David and Goliath?",
+    "no reason to live anymore. final goodbye",
+    "I feel hopeless and I want to die",
+    "Work is challenging but I'm getting through it",
+]
+
+
+def _time_per_call(func, message, number):
+    return timeit.timeit(lambda: func(message), number=number) / number * 1e6
+
+
+def bench_crisis():
+    """Compare the compiled matcher against the legacy loop on short and 5 KB messages"""
+    detector = CrisisDetector()
+
+    # Verdicts must be identical before latency means anything
+    for sample in CRISIS_SAMPLES + [sample * 100 for sample in CRISIS_SAMPLES]:
+        legacy = _legacy_check_for_crisis(detector, sample)
+        current = detector.check_for_crisis(sample)
+        if legacy != current:
+            raise SystemExit(f"Verdict mismatch for: {sample[:60]!r}")
+
+    short_message = CRISIS_SAMPLES[0][:50]
+    long_message = (CRISIS_SAMPLES[0] + ' ') * 100
+    long_message = long_message[:5 * 1024]
+
+    print(f"{'message':<12}{'legacy (us)':>14}{'compiled (us)':>16}")
+    for label, message, number in (('50 chars', short_message, 20000), ('5 KB', long_message, 500)):
+        legacy = _time_per_call(lambda m: _legacy_check_for_crisis(detector, m), message, number)
+        current = _time_per_call(detector.check_for_crisis, message, number)
+        print(f"{label:<12}{legacy:>14.2f}{current:>16.2f}")
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return {
+        'p50': samples[len(samples) // 2] * 1000,
+        'p95': samples[int(len(samples) * 0.95)] * 1000,
+        'mean': statistics.mean(samples) * 1000,
+    }
+
+
+def bench_memory(latency=0.02, error_rate=0.0, users=50):
+    """User memory reads and saves against the local Firestore stand-in with injected latency"""
+    from firebase_service import FirebaseService
+    from local_firestore import FaultInjector, LocalFirestoreClient
+
+    async def timed(coro):
+        started = time.perf_counter()
+        await coro
+        return time.perf_counter() - started
+
+    async def run(label, **service_options):
+        faults = FaultInjector(latency=0.0)
+        db = LocalFirestoreClient(faults=faults)
+        service = FirebaseService(db=db, **service_options)
+        user_ids = [f"user_{i}" for i in range(users)]
+        for user_id in user_ids:
+            await service.save_user_profile(user_id, user_id)
+            await service.save_mood(user_id, 'hopeful')
+            await service.save_journal_entry(user_id, 'Grateful for today')
+            await service.save_prayer_request(user_id, 'Peace for my family')
+        await service.flush_writes()
+
+        faults.latency, faults.error_rate = latency, error_rate
+        faults.round_trips = 0
+        first_turn = [await timed(service.get_user_memory(user_id)) for user_id in user_ids]
+        repeat_turn = [await timed(service.get_user_memory(user_id)) for user_id in user_ids]
+        saves = [await timed(service.save_mood(user_id, 'grateful')) for user_id in user_ids]
+        await service.flush_writes()
+        service.close()
+
+        first, repeat, save = _percentiles(first_turn), _percentiles(repeat_turn), _percentiles(saves)
+        print(f"{label:<22}{first['p50']:>14.1f}{repeat['p50']:>14.1f}"
+              f"{save['p50']:>10.1f}{save['p95']:>10.1f}{faults.round_trips:>8}")
+
+    print(f"injected latency {latency * 1000:.0f} ms, error rate {error_rate:.0%}, {users} users x 2 turns")
+    print(f"{'configuration (ms)':<22}{'1st read p50':>14}{'2nd read p50':>14}"
+          f"{'save p50':>10}{'save p95':>10}{'RPCs':>8}")
+    asyncio.run(run('no cache', cache_enabled=False))
+    asyncio.run(run('cache', cache_enabled=True))
+    asyncio.run(run('cache + write-behind', cache_enabled=True, write_behind=True))
+
+
+# The original GabeCompanion interceptor lists, scanned one by one
+LEGACY_PRAYER_TRIGGERS = ['pray for', 'say a prayer', 'please pray', 'pray that', 'father help', 'lord help',
+                          'jesus help', 'pray with me', 'can you pray']
+LEGACY_STORY_KEYWORDS = ['story', 'tell me a story', 'bible story', 'share a story', 'david and goliath', 'moses',
+                         'daniel', 'noah', 'jesus', 'parable', 'tell me about', 'biblical story']
+
+INTENT_CORPUS = CRISIS_SAMPLES + [
+    "Can you pray for my mom? She has surgery tomorrow morning",
+    "tell me a story about David and Goliath please",
+    "I'm so stressed about finals, I can't focus on anything",
+    "what does Romans 8:28 actually mean",
+    "Lord help me, I keep messing up at work",
+    "voice mode on",
+    "My friends left me out again this weekend and it really hurt",
+    "Who was Moses and why did God pick him?",
+    "I feel like God isn't listening to me anymore",
+    "please pray that my dad finds a job soon",
+    "Good morning GABE! Today is a good day",
+    "How do I forgive someone who keeps hurting me?",
+    "Share a story from the Bible about courage",
+    "I don't know, I just feel empty lately",
+    "turn off voice, text only please",
+    "Thanks for listening, I feel a little better now",
+    "Is it wrong to be angry at God?",
+    "Tell me about Daniel in the lions den",
+    "I've been anxious all week and I can't sleep",
+    "Jesus help me get through this day",
+    "What's a good verse for when you feel lonely?",
+    "My grandma passed away last night",
+    "Can you pray with me right now?",
+    "Why do bad things happen to good people?",
+] * 4
+
+
+def bench_intents():
+    """One intent-router scan against the separate interceptor checks per message"""
+    from intent_router import IntentRouter
+
+    detector = CrisisDetector()
+    router = IntentRouter(crisis_detector=detector)
+
+    def legacy(message):
+        message_lower = message.lower()
+        return (
+            any(trigger in message_lower for trigger in LEGACY_PRAYER_TRIGGERS),
+            any(keyword in message_lower for keyword in LEGACY_STORY_KEYWORDS),
+            _legacy_check_for_crisis(detector, message) is not None,
+        )
+
+    def routed(message):
+        intents = {match.intent for match in router.route(message)}
+        return 'prayer' in intents, 'story' in intents, 'crisis' in intents
+
+    # Every verdict must agree with the original checks
+    for message in INTENT_CORPUS:
+        old, new = legacy(message), routed(message)
+        if old != new:
+            raise SystemExit(f"Intent mismatch for {message!r}: {old} vs {new}")
+
+    number = 20
+    legacy_us = timeit.timeit(lambda: [legacy(m) for m in INTENT_CORPUS], number=number) / number / len(INTENT_CORPUS) * 1e6
+    routed_us = timeit.timeit(lambda: [routed(m) for m in INTENT_CORPUS], number=number) / number / len(INTENT_CORPUS) * 1e6
+    print(f"{len(INTENT_CORPUS)} messages")
+    print(f"{'per message':<14}{'separate checks (us)':>22}{'router (us)':>14}")
+    print(f"{'':<14}{legacy_us:>22.2f}{routed_us:>14.2f}")
+
+
+BENCHMARKS = {
+    'crisis': bench_crisis,
+    'memory': bench_memory,
+    'intents': bench_intents,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
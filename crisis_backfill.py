@@ -0,0 +1,198 @@
+"""
+Crisis backfill job for GABE
+Re-screens every stored conversation against the current crisis lexicon
+
+Run with: python crisis_backfill.py --database-url postgresql://...
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, create_engine, text
+
+from crisis_detection import CrisisDetector
+
+# Table backing the Conversation model in models.py
+CONVERSATIONS_TABLE = 'conversations'
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_CHECKPOINT = 'crisis_backfill.checkpoint.json'
+
+SELECT_CHUNK = text(
+    f"SELECT id, user_message, is_crisis FROM {CONVERSATIONS_TABLE} "
+    "WHERE id > :last_id ORDER BY id LIMIT :limit"
+)
+
+UPDATE_FLAGS = text(
+    f"UPDATE {CONVERSATIONS_TABLE} SET is_crisis = :flag WHERE id IN :ids"
+).bindparams(bindparam('ids', expanding=True))
+
+# One detector per worker process, built by the pool initializer
+_worker_detector = None
+
+
+def _init_worker():
+    """Build the crisis matcher once per worker process"""
+    global _worker_detector
+    _worker_detector = CrisisDetector()
+
+
+def _screen_chunk(rows: List[Tuple[int, str, Optional[bool]]]) -> Dict[bool, List[int]]:
+    """Screen a chunk of rows and return the ids whose flag has to change"""
+    flags = _worker_detector.check_many([message or '' for _, message, _ in rows])
+    changes = {True: [], False: []}
+    for (row_id, _, current), flag in zip(rows, flags):
+        if bool(current) != flag:
+            changes[flag].append(row_id)
+    return changes
+
+
+class CrisisBackfill:
+    """Streams conversations in keyset order and rewrites is_crisis in bulk"""
+
+    def __init__(self, database_url: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 workers: Optional[int] = None, checkpoint_path: str = DEFAULT_CHECKPOINT,
+                 dry_run: bool = False):
+        self.engine = create_engine(database_url)
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+        self.checkpoint_path = checkpoint_path
+        self.dry_run = dry_run
+
+    def load_checkpoint(self, lexicon_version: int) -> Dict:
+        """Load the last committed position, or start from the beginning.
+
+        A checkpoint left by a run against another lexicon version is
+        ignored: every row has to be re-screened with the new lexicon.
+        """
+        fresh = {'last_id': 0, 'rows_scanned': 0, 'rows_updated': 0, 'lexicon_version': lexicon_version}
+        try:
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return fresh
+        if state.get('lexicon_version') != lexicon_version:
+            logging.info(f"Crisis backfill checkpoint is for lexicon version {state.get('lexicon_version')}, "
+                         f"not {lexicon_version} - starting over")
+            return fresh
+        return state
+
+    def save_checkpoint(self, state: Dict):
+        """Write the checkpoint atomically so a crash never leaves it half-written"""
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def clear_checkpoint(self):
+        """Forget the position once the whole table has been screened"""
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+
+    def _read_chunks(self, last_id: int):
+        """Yield chunks of (id, user_message, is_crisis) rows after last_id"""
+        while True:
+            with self.engine.connect() as conn:
+                rows = [tuple(row) for row in conn.execute(
+                    SELECT_CHUNK, {'last_id': last_id, 'limit': self.chunk_size}
+                )]
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+
+    def _apply_changes(self, changes: Dict[bool, List[int]]) -> int:
+        """Apply one chunk's flag changes with at most two bulk UPDATEs"""
+        updated = sum(len(ids) for ids in changes.values())
+        if self.dry_run or not updated:
+            return updated
+
+        with self.engine.begin() as conn:
+            for flag, ids in changes.items():
+                if ids:
+                    conn.execute(UPDATE_FLAGS, {'flag': flag, 'ids': ids})
+        return updated
+
+    def run(self, restart: bool = False) -> Dict:
+        """Re-screen the whole table, resuming an unfinished run for the same
+        lexicon version unless restart is set"""
+        lexicon_version = CrisisDetector().lexicon_version
+        if restart:
+            self.clear_checkpoint()
+        state = self.load_checkpoint(lexicon_version)
+        logging.info(f"Crisis backfill starting after id {state['last_id']} with {self.workers} workers, "
+                     f"lexicon version {lexicon_version}")
+
+        started = time.monotonic()
+        scanned_this_run = 0
+        # Bounded number of chunks in flight keeps memory flat regardless of table size
+        max_in_flight = self.workers * 2
+        in_flight = deque()
+
+        def drain_one():
+            nonlocal scanned_this_run
+            chunk_last_id, chunk_rows, future = in_flight.popleft()
+            state['rows_updated'] += self._apply_changes(future.result())
+            state['rows_scanned'] += chunk_rows
+            state['last_id'] = chunk_last_id
+            # Chunks are drained in submission order, so everything up to
+            # last_id has been committed when the checkpoint is written
+            if not self.dry_run:
+                self.save_checkpoint(state)
+
+            scanned_this_run += chunk_rows
+            elapsed = time.monotonic() - started
+            rate = scanned_this_run / elapsed if elapsed else 0.0
+            logging.info(f"Crisis backfill at id {chunk_last_id}: {state['rows_scanned']} scanned, "
+                         f"{state['rows_updated']} updated, {rate:.0f} rows/s")
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+            for rows in self._read_chunks(state['last_id']):
+                in_flight.append((rows[-1][0], len(rows), pool.submit(_screen_chunk, rows)))
+                if len(in_flight) >= max_in_flight:
+                    drain_one()
+            while in_flight:
+                drain_one()
+
+        # A finished run leaves nothing to resume, so the next run (after the
+        # next lexicon change) scans the whole table again
+        if not self.dry_run:
+            self.clear_checkpoint()
+
+        elapsed = time.monotonic() - started
+        state['rows_per_second'] = scanned_this_run / elapsed if elapsed else 0.0
+        logging.info(f"Crisis backfill finished: {state['rows_scanned']} scanned, "
+                     f"{state['rows_updated']} updated, {state['rows_per_second']:.0f} rows/s")
+        return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-screen stored conversations for crisis messages")
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'),
+                        help="SQLAlchemy database URL (defaults to $DATABASE_URL)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and start over")
+    parser.add_argument('--dry-run', action='store_true', help="Screen rows without writing anything")
+    args = parser.parse_args(argv)
+
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    backfill = CrisisBackfill(args.database_url, chunk_size=args.chunk_size, workers=args.workers,
+                              checkpoint_path=args.checkpoint, dry_run=args.dry_run)
+    backfill.run(restart=args.restart)
+
+
+if __name__ == '__main__':
+    main()
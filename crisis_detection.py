@@ -1,76 +1,200 @@
+import os
 import re
 import logging
+import threading
+from itertools import combinations
 
-class CrisisDetector:
-    def __init__(self):
-        # Crisis keywords and phrases
-        self.crisis_keywords = [
-            # Self-harm indicators (high severity only)
-            'kill myself', 'end my life', 'want to die', 'planning suicide',
-            'going to hurt myself', 'going to cut myself', 'going to harm myself',
-            'better off dead', 'take my own life', 'ready to end it',
-            
-            # Immediate danger phrases
-            'final goodbye', 'last message', 'goodbye world', 'tonight is the night',
-            'cant take it anymore and going to', "can't go on anymore and will"
-        ]
-        
-        # Hotline information
-        self.crisis_resources = {
-            'us': {
-                'name': 'National Suicide Prevention Lifeline',
-                'number': '988',
-                'text': 'Text HOME to 741741'
-            },
-            'international': {
-                'name': 'International Association for Suicide Prevention',
-                'website': 'https://www.iasp.info/resources/Crisis_Centres/'
-            }
+from crisis_lexicon import DEFAULT_VERSION, LexiconWatcher
+
+# Compiled lexicon artifact shared by every worker (see crisis_lexicon.py)
+DEFAULT_LEXICON_PATH = 'crisis_lexicon.bin'
+
+# One watcher per artifact path, shared by every detector in the process
+_lexicon_watchers = {}
+_lexicon_watchers_lock = threading.Lock()
+
+# Anything that is not a word character or whitespace becomes a space
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+# These categories are matched against the lowercased message before
+# punctuation is stripped; the others against the cleaned message
+RAW_TEXT_CATEGORIES = ('positive', 'mild')
+
+
+def _trie_pattern(phrases):
+    """Build a regex for a set of literal phrases with shared prefixes merged"""
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A phrase ends here too: make the longer continuations optional
+        return f'(?:{body})?' if '' in node else body
+
+    return emit(trie)
+
+
+class CrisisMatcher:
+    """Compiled, immutable matcher for one version of the crisis lexicon"""
+
+    CATEGORIES = ('positive', 'high', 'severe', 'mild')
+
+    def __init__(self, lexicon, version=DEFAULT_VERSION):
+        self.version = version
+        self.crisis_keywords = list(lexicon['crisis_keywords'])
+        self.crisis_resources = lexicon['crisis_resources']
+        self.positive_indicators = list(lexicon['positive_indicators'])
+        self.high_crisis_keywords = list(lexicon['high_crisis_keywords'])
+        self.severe_patterns = list(lexicon['severe_patterns'])
+        self.mild_distress_words = list(lexicon['mild_distress_words'])
+
+        self._category_patterns = {
+            'positive': re.compile(_trie_pattern(self.positive_indicators)),
+            'high': re.compile(_trie_pattern(self.high_crisis_keywords)),
+            'severe': re.compile('|'.join(f'(?:{p})' for p in self.severe_patterns)),
+            'mild': re.compile(_trie_pattern(self.mild_distress_words)),
+        }
+        # Scanners run over the cleaned message and only find candidate
+        # offsets, so raw-text phrases are added in their cleaned form
+        scan_patterns = {
+            'positive': _trie_pattern([PUNCTUATION_RE.sub(' ', p) for p in self.positive_indicators]),
+            'high': self._category_patterns['high'].pattern,
+            'severe': self._category_patterns['severe'].pattern,
+            'mild': _trie_pattern([PUNCTUATION_RE.sub(' ', p) for p in self.mild_distress_words]),
         }
+        # One scanner per set of categories still being looked for, all built
+        # up front so nothing is compiled on the request path
+        self._scanners = {}
+        for size in range(1, len(self.CATEGORIES) + 1):
+            for categories in combinations(self.CATEGORIES, size):
+                self._scanners[frozenset(categories)] = re.compile('|'.join(
+                    f'(?:{scan_patterns[category]})' for category in categories
+                ))
 
-    def check_for_crisis(self, message):
-        """Check if message contains crisis indicators"""
-        message_lower = message.lower()
-        
-        # POSITIVE INDICATORS - Do NOT trigger crisis if these are present
-        positive_indicators = [
-            'thank you', 'thanks', 'helped', 'helping', 'better', 'good', 'great',
-            'feel better', 'feeling better', 'appreciate', 'grateful', 'blessed',
-            'improving', 'progress', 'hope', 'hopeful', 'encouraged', 'uplifting',
-            'this help', 'this helped', 'working', 'awesome', 'amazing'
-        ]
+    def scan(self, message):
+        """Scan a message once and return every matched category.
         
-        # Check for positive indicators first - if found, not a crisis
-        for positive in positive_indicators:
-            if positive in message_lower:
-                return None
+        Categories are 'positive', 'high', 'severe' and 'mild'. Positive and
+        mild phrases are matched against the lowercased message, high and
+        severe ones against the punctuation-stripped copy, exactly like the
+        original per-phrase checks.
+        """
+        message_lower = message.lower()
+        # Same length as message_lower, so match offsets line up
+        cleaned_message = PUNCTUATION_RE.sub(' ', message_lower)
         
-        # Remove punctuation for better matching
-        cleaned_message = re.sub(r'[^\w\s]', ' ', message_lower)
+        hits = set()
+        remaining = frozenset(self.CATEGORIES)
+        pos = 0
+        while remaining:
+            # Once a category is found, stop paying for its phrases
+            match = self._scanners[remaining].search(cleaned_message, pos)
+            if not match:
+                break
+            start = match.start()
+            # Several phrases can start at the same offset; check each
+            # category anchored here rather than trusting the first alternative
+            for category in remaining:
+                text = message_lower if category in RAW_TEXT_CATEGORIES else cleaned_message
+                if self._category_patterns[category].match(text, start):
+                    hits.add(category)
+            remaining = remaining - hits
+            pos = start + 1
         
-        # HIGH SEVERITY crisis keywords that indicate immediate danger
-        high_crisis_keywords = [
-            'kill myself', 'end my life', 'want to die', 'going to hurt myself',
-            'planning suicide', 'better off dead', 'going to end it', 'final goodbye'
-        ]
+        return hits
+
+    def span(self, message, category):
+        """(start, end) of the first phrase of `category` in the message, or None"""
+        text = message.lower()
+        if category not in RAW_TEXT_CATEGORIES:
+            text = PUNCTUATION_RE.sub(' ', text)
+        match = self._category_patterns[category].search(text)
+        return match.span() if match else None
+
+    def is_mild_distress(self, message):
+        """Check the lowercased message for any mild distress phrase"""
+        return self._category_patterns['mild'].search(message.lower()) is not None
+
+
+class CrisisDetector:
+    def __init__(self, lexicon_path=None):
+        # The lexicon comes from a published artifact when there is one, and
+        # is reloaded in the background whenever a new version lands
+        self.lexicon_path = lexicon_path or os.environ.get('CRISIS_LEXICON_PATH', DEFAULT_LEXICON_PATH)
+        with _lexicon_watchers_lock:
+            watcher = _lexicon_watchers.get(self.lexicon_path)
+            if watcher is None:
+                watcher = LexiconWatcher(self.lexicon_path, CrisisMatcher)
+                _lexicon_watchers[self.lexicon_path] = watcher
+        self._lexicon = watcher
+
+    @property
+    def matcher(self):
+        """The matcher for the newest loaded lexicon version"""
+        return self._lexicon.get()
+
+    @property
+    def lexicon_version(self):
+        return self.matcher.version
+
+    @property
+    def crisis_keywords(self):
+        return self.matcher.crisis_keywords
+
+    @property
+    def crisis_resources(self):
+        return self.matcher.crisis_resources
+
+    @property
+    def positive_indicators(self):
+        return self.matcher.positive_indicators
+
+    @property
+    def high_crisis_keywords(self):
+        return self.matcher.high_crisis_keywords
+
+    @property
+    def severe_patterns(self):
+        return self.matcher.severe_patterns
+
+    @property
+    def mild_distress_words(self):
+        return self.matcher.mild_distress_words
+
+    def check_for_crisis(self, message):
+        """Check if message contains crisis indicators"""
+        hits = self.scan(message)
         
-        # Check for high severity keywords (immediate crisis)
-        for keyword in high_crisis_keywords:
-            if keyword in cleaned_message:
-                return self._generate_crisis_response(message)
+        # Positive indicators always win - if found, not a crisis
+        if 'positive' in hits:
+            return None
         
-        # Check for severe distress patterns with context
-        severe_patterns = [
-            r'\bi\s+want\s+to\s+die\b',
-            r'\bkill\s+me\s+now\b',
-            r'\bend\s+it\s+all\s+tonight\b',
-            r'\bgive\s+up\s+on\s+life\s+now\b',
-            r'\bno\s+reason\s+to\s+live\s+anymore\b'
-        ]
+        if 'high' in hits or 'severe' in hits:
+            return self._generate_crisis_response(message)
         
-        for pattern in severe_patterns:
-            if re.search(pattern, cleaned_message):
-                return self._generate_cr
+        return None
+
+    def check_many(self, messages):
+        """Screen a batch of messages, returning one crisis flag per message"""
+        # One lexicon version for the whole batch
+        matcher = self.matcher
+        flags = []
+        for message in messages:
+            hits = matcher.scan(message)
+            flags.append('positive' not in hits and ('high' in hits or 'severe' in hits))
+        return flags
+
+    def scan(self, message):
+        """Scan a message once and return every matched category"""
+        return self.matcher.scan(message)
+
     def _generate_crisis_response(self, original_message):
         """Generate appropriate crisis response"""
         response = """🚨 Hey friend, I hear you and what you're feeling really matters. You're not alone in this moment, but I need you to reach out to someone who can help you right now.
@@ -92,15 +216,7 @@ Please reach out right now. Your life has value and purpose, even when it doesn'
 
     def is_mild_distress(self, message):
         """Check for mild distress that needs gentle support but not crisis intervention"""
-        message_lower = message.lower()
-        
-        mild_distress_words = [
-            'struggling', 'difficult time', 'hard day', 'feeling down',
-            'overwhelmed', 'stressed out', 'having trouble', 'going through',
-            'tough situation', 'challenging', 'difficult', 'rough patch'
-        ]
-        
-        return any(phrase in message_lower for phrase in mild_distress_words)
+        return self.matcher.is_mild_distress(message)
 
     def get_support_resources(self, mood_type=None):
         """Get relevant support resources based on mood"""
@@ -0,0 +1,295 @@
+"""
+Crisis lexicon artifact for GABE
+Compiles the crisis keyword lists into a versioned binary file that every
+worker memory-maps read-only, and reloads it when a new version is published
+
+Publish a new lexicon with:
+    python crisis_lexicon.py compile lexicon.json crisis_lexicon.bin --version 2
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import struct
+import logging
+import argparse
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Built-in lexicon, used when no artifact has been published
+DEFAULT_LEXICON = {
+    # Crisis keywords and phrases
+    'crisis_keywords': [
+        # Self-harm indicators (high severity only)
+        'kill myself', 'end my life', 'want to die', 'planning suicide',
+        'going to hurt myself', 'going to cut myself', 'going to harm myself',
+        'better off dead', 'take my own life', 'ready to end it',
+
+        # Immediate danger phrases
+        'final goodbye', 'last message', 'goodbye world', 'tonight is the night',
+        'cant take it anymore and going to', "can't go on anymore and will"
+    ],
+
+    # POSITIVE INDICATORS - Do NOT trigger crisis if these are present
+    'positive_indicators': [
+        'thank you', 'thanks', 'helped', 'helping', 'better', 'good', 'great',
+        'feel better', 'feeling better', 'appreciate', 'grateful', 'blessed',
+        'improving', 'progress', 'hope', 'hopeful', 'encouraged', 'uplifting',
+        'this help', 'this helped', 'working', 'awesome', 'amazing'
+    ],
+
+    # HIGH SEVERITY crisis keywords that indicate immediate danger
+    'high_crisis_keywords': [
+        'kill myself', 'end my life', 'want to die', 'going to hurt myself',
+        'planning suicide', 'better off dead', 'going to end it', 'final goodbye'
+    ],
+
+    # Severe distress patterns with context
+    'severe_patterns': [
+        r'\bi\s+want\s+to\s+die\b',
+        r'\bkill\s+me\s+now\b',
+        r'\bend\s+it\s+all\s+tonight\b',
+        r'\bgive\s+up\s+on\s+life\s+now\b',
+        r'\bno\s+reason\s+to\s+live\s+anymore\b'
+    ],
+
+    # Mild distress that needs gentle support but not crisis intervention
+    'mild_distress_words': [
+        'struggling', 'difficult time', 'hard day', 'feeling down',
+        'overwhelmed', 'stressed out', 'having trouble', 'going through',
+        'tough situation', 'challenging', 'difficult', 'rough patch'
+    ],
+
+    # Hotline information
+    'crisis_resources': {
+        'us': {
+            'name': 'National Suicide Prevention Lifeline',
+            'number': '988',
+            'text': 'Text HOME to 741741'
+        },
+        'international': {
+            'name': 'International Association for Suicide Prevention',
+            'website': 'https://www.iasp.info/resources/Crisis_Centres/'
+        }
+    }
+}
+
+DEFAULT_VERSION = 0
+
+LIST_SECTIONS = ('crisis_keywords', 'positive_indicators', 'high_crisis_keywords',
+                 'severe_patterns', 'mild_distress_words')
+JSON_SECTIONS = ('crisis_resources',)
+
+# Layout: magic, format version, lexicon version, section count, payload crc32
+MAGIC = b'GABELEX'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<7sBIHI')
+SECTION = struct.Struct('<BBI')  # name length, kind, data length
+KIND_LIST = 0
+KIND_JSON = 1
+STRING = struct.Struct('<H')
+COUNT = struct.Struct('<I')
+
+
+class LexiconError(Exception):
+    """Raised when a lexicon artifact is missing, corrupt or incomplete"""
+
+
+def _encode_list(items) -> bytes:
+    parts = [COUNT.pack(len(items))]
+    for item in items:
+        data = item.encode('utf-8')
+        parts.append(STRING.pack(len(data)))
+        parts.append(data)
+    return b''.join(parts)
+
+
+def _decode_list(buffer, offset: int) -> list:
+    (count,) = COUNT.unpack_from(buffer, offset)
+    offset += COUNT.size
+    items = []
+    for _ in range(count):
+        (length,) = STRING.unpack_from(buffer, offset)
+        offset += STRING.size
+        items.append(buffer[offset:offset + length].decode('utf-8'))
+        offset += length
+    return items
+
+
+def validate_lexicon(lexicon: Dict[str, Any]):
+    """Make sure every section the detector needs is present"""
+    missing = [name for name in LIST_SECTIONS + JSON_SECTIONS if name not in lexicon]
+    if missing:
+        raise LexiconError(f"Lexicon is missing sections: {', '.join(missing)}")
+
+
+def write_lexicon(lexicon: Dict[str, Any], path: str, version: int):
+    """Write a lexicon artifact, replacing any existing file atomically"""
+    validate_lexicon(lexicon)
+
+    sections = []
+    for name in LIST_SECTIONS + JSON_SECTIONS:
+        if name in LIST_SECTIONS:
+            kind, data = KIND_LIST, _encode_list(lexicon[name])
+        else:
+            kind, data = KIND_JSON, json.dumps(lexicon[name], ensure_ascii=False).encode('utf-8')
+        encoded_name = name.encode('ascii')
+        sections.append(SECTION.pack(len(encoded_name), kind, len(data)) + encoded_name + data)
+    payload = b''.join(sections)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, version, len(sections), zlib.crc32(payload))
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    # Readers either see the old file or the new one, never a partial write
+    os.replace(tmp_path, path)
+
+
+def read_lexicon(path: str) -> Tuple[int, Dict[str, Any]]:
+    """Memory-map a lexicon artifact read-only and decode it"""
+    try:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return _decode_artifact(mapped)
+    except (OSError, ValueError, struct.error) as e:
+        raise LexiconError(f"Cannot read lexicon artifact {path}: {e}") from e
+
+
+def _decode_artifact(mapped) -> Tuple[int, Dict[str, Any]]:
+    if len(mapped) < HEADER.size:
+        raise LexiconError("Lexicon artifact is truncated")
+    magic, format_version, version, section_count, crc = HEADER.unpack_from(mapped, 0)
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        raise LexiconError("Not a lexicon artifact or unsupported format version")
+    with memoryview(mapped) as view:
+        checksum = zlib.crc32(view[HEADER.size:])
+    if checksum != crc:
+        raise LexiconError("Lexicon artifact checksum mismatch")
+
+    lexicon = {}
+    offset = HEADER.size
+    for _ in range(section_count):
+        name_length, kind, data_length = SECTION.unpack_from(mapped, offset)
+        offset += SECTION.size
+        name = mapped[offset:offset + name_length].decode('ascii')
+        offset += name_length
+        if kind == KIND_LIST:
+            lexicon[name] = _decode_list(mapped, offset)
+        else:
+            lexicon[name] = json.loads(mapped[offset:offset + data_length].decode('utf-8'))
+        offset += data_length
+
+    validate_lexicon(lexicon)
+    return version, lexicon
+
+
+class LexiconWatcher:
+    """Polls a lexicon artifact and rebuilds state off the request path when it changes.
+
+    `build` turns (lexicon, version) into whatever the caller serves from,
+    e.g. a compiled matcher. The new state replaces the old one with a single
+    reference assignment, so readers never see a half-built lexicon.
+    """
+
+    def __init__(self, path: str, build: Callable[[Dict[str, Any], int], Any],
+                 check_interval: float = 5.0):
+        self.path = path
+        self.build = build
+        self.check_interval = check_interval
+        self._file_id = None
+        self._next_check = 0.0
+        self._reloading = threading.Lock()
+
+        self.version, lexicon = self._load_initial()
+        self.current = build(lexicon, self.version)
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _load_initial(self) -> Tuple[int, Dict[str, Any]]:
+        self._file_id = self._stat()
+        if self._file_id is None:
+            logging.info(f"No crisis lexicon at {self.path} - using built-in lexicon")
+            return DEFAULT_VERSION, DEFAULT_LEXICON
+        try:
+            version, lexicon = read_lexicon(self.path)
+            logging.info(f"Crisis lexicon version {version} loaded from {self.path}")
+            return version, lexicon
+        except LexiconError as e:
+            logging.warning(f"{e} - using built-in lexicon")
+            return DEFAULT_VERSION, DEFAULT_LEXICON
+
+    def get(self):
+        """Return the current state, kicking off a background reload if the file changed"""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            file_id = self._stat()
+            if file_id is not None and file_id != self._file_id:
+                self._start_reload(file_id)
+        return self.current
+
+    def _start_reload(self, file_id):
+        # One reload at a time; other callers keep serving the current state
+        if not self._reloading.acquire(blocking=False):
+            return
+        thread = threading.Thread(target=self._reload, args=(file_id,),
+                                  name='crisis-lexicon-reload', daemon=True)
+        thread.start()
+
+    def _reload(self, file_id):
+        try:
+            version, lexicon = read_lexicon(self.path)
+            if version == self.version:
+                self._file_id = file_id
+                return
+            state = self.build(lexicon, version)
+            self.current = state
+            self.version = version
+            self._file_id = file_id
+            logging.info(f"Crisis lexicon reloaded: version {version}")
+        except Exception as e:
+            # Keep serving the previous lexicon; retry on the next check
+            logging.warning(f"Failed to reload crisis lexicon: {e}")
+        finally:
+            self._reloading.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile or inspect crisis lexicon artifacts")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compile_cmd = commands.add_parser('compile', help="Compile a JSON lexicon into an artifact")
+    compile_cmd.add_argument('source', nargs='?', help="JSON lexicon (defaults to the built-in one)")
+    compile_cmd.add_argument('output')
+    compile_cmd.add_argument('--version', type=int, required=True)
+
+    dump_cmd = commands.add_parser('dump', help="Print an artifact as JSON")
+    dump_cmd.add_argument('artifact')
+
+    args = parser.parse_args(argv)
+    if args.command == 'compile':
+        lexicon = DEFAULT_LEXICON
+        if args.source:
+            with open(args.source) as f:
+                lexicon = json.load(f)
+        write_lexicon(lexicon, args.output, args.version)
+        print(f"Wrote crisis lexicon version {args.version} to {args.output}")
+    else:
+        version, lexicon = read_lexicon(args.artifact)
+        json.dump({'version': version, **lexicon}, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+
+
+if __name__ == '__main__':
+    main()
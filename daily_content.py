@@ -0,0 +1,183 @@
+"""
+Per-user daily content
+Daily picks (verse of the day, reminder messages) are chosen from a seed of
+user and local date, so every page load, worker and restart shows the same
+content all day. Each pick is computed once and cached until the user's
+local midnight, and a batch precompute fills the next day for recently
+active users before they ask.
+"""
+
+import os
+import time
+import random
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time as day_time, timedelta, timezone
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import metrics
+from ttl_cache import TTLCache
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    ZoneInfo = None
+
+DAILY_CONTENT_CACHE_SIZE = int(os.environ.get('DAILY_CONTENT_CACHE_SIZE', '100000'))
+# Users remembered for the batch precompute, least recently seen dropped first
+DAILY_ACTIVE_USERS = int(os.environ.get('DAILY_ACTIVE_USERS', '50000'))
+# Seconds between precompute runs; 0 turns the background precompute off
+DAILY_PRECOMPUTE_INTERVAL = float(os.environ.get('DAILY_PRECOMPUTE_INTERVAL', '3600'))
+# Used for users without a known timezone; empty means the server's local time
+DAILY_DEFAULT_TIMEZONE = os.environ.get('DAILY_DEFAULT_TIMEZONE', '')
+
+_MISSING = object()
+
+# A producer builds one kind of daily content: (user_id, day, rng, context) -> content
+Producer = Callable[[str, date, random.Random, Dict[str, Any]], Any]
+
+
+def resolve_timezone(name: Optional[str]):
+    """tzinfo for an IANA name; unknown or missing names use DAILY_DEFAULT_TIMEZONE"""
+    for candidate in (name, DAILY_DEFAULT_TIMEZONE):
+        if not candidate:
+            continue
+        if candidate.upper() == 'UTC':
+            return timezone.utc
+        if ZoneInfo is not None:
+            try:
+                return ZoneInfo(candidate)
+            except Exception:
+                logging.debug(f"Unknown timezone {candidate!r}")
+    return datetime.now().astimezone().tzinfo
+
+
+def local_now(tz_name: Optional[str] = None, now: Optional[datetime] = None) -> datetime:
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(resolve_timezone(tz_name))
+
+
+def seconds_left_in_day(day: date, tz_name: Optional[str] = None, now: Optional[datetime] = None) -> float:
+    """Seconds from now until `day` ends in the user's timezone"""
+    tz = resolve_timezone(tz_name)
+    midnight = datetime.combine(day + timedelta(days=1), day_time(0), tzinfo=tz)
+    return max((midnight - (now or datetime.now(timezone.utc))).total_seconds(), 0.0)
+
+
+def daily_rng(kind: str, user_id: str, day: date) -> random.Random:
+    """Random source that is the same for a user and date in every process
+    (hash() is salted per process, so the seed comes from sha256)"""
+    digest = hashlib.sha256(f"{kind}:{user_id}:{day.isoformat()}".encode('utf-8')).digest()
+    return random.Random(int.from_bytes(digest[:8], 'big'))
+
+
+class DailyContentCache:
+    """Daily content per (kind, user, local date), expiring at the user's midnight"""
+
+    def __init__(self, max_entries: int = DAILY_CONTENT_CACHE_SIZE, max_users: int = DAILY_ACTIVE_USERS):
+        self._cache = TTLCache(max_entries=max_entries, ttl=None)
+        self._producers: Dict[str, Producer] = {}
+        self._active = OrderedDict()  # (kind, user_id) -> (tz_name, context)
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._scheduler = None
+        self.precomputed = 0
+
+    def register(self, kind: str, producer: Producer):
+        self._producers[kind] = producer
+
+    def get(self, kind: str, user_id: str, tz_name: Optional[str] = None, now: Optional[datetime] = None,
+            **context) -> Any:
+        """Today's content for the user, computed on the first call of their day"""
+        day = local_now(tz_name, now).date()
+        self._remember(kind, user_id, tz_name, context)
+        return self._get_or_compute(kind, user_id, day, tz_name, context, now)
+
+    def precompute(self, days_ahead: int = 1, now: Optional[datetime] = None) -> int:
+        """Fill today and the next `days_ahead` days for every recently active
+        user; returns how many entries were computed"""
+        with self._lock:
+            active = list(self._active.items())
+        computed = 0
+        for (kind, user_id), (tz_name, context) in active:
+            today = local_now(tz_name, now).date()
+            for offset in range(days_ahead + 1):
+                day = today + timedelta(days=offset)
+                if self._key(kind, user_id, day, context) in self._cache:
+                    continue
+                try:
+                    self._get_or_compute(kind, user_id, day, tz_name, context, now)
+                    computed += 1
+                except Exception as e:
+                    logging.warning(f"Daily {kind} precompute failed for {user_id}: {e}")
+        self.precomputed += computed
+        return computed
+
+    def start_precompute(self, interval: float = DAILY_PRECOMPUTE_INTERVAL) -> Optional[threading.Thread]:
+        """Run precompute() every `interval` seconds on a daemon thread"""
+        if interval <= 0 or self._scheduler is not None:
+            return self._scheduler
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    computed = self.precompute()
+                    if computed:
+                        logging.info(f"Precomputed {computed} daily content entries")
+                except Exception as e:
+                    logging.error(f"Daily content precompute failed: {e}")
+
+        self._scheduler = threading.Thread(target=run, name='daily-precompute', daemon=True)
+        self._scheduler.start()
+        return self._scheduler
+
+    def stats(self) -> Dict[str, int]:
+        stats = self._cache.stats()
+        return {
+            'size': stats['size'],
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'evictions': stats['evictions'],
+            'active_users': len(self._active),
+            'precomputed': self.precomputed,
+        }
+
+    def _get_or_compute(self, kind: str, user_id: str, day: date, tz_name: Optional[str],
+                        context: Dict[str, Any], now: Optional[datetime]) -> Any:
+        key = self._key(kind, user_id, day, context)
+        content = self._cache.get(key, _MISSING)
+        if content is _MISSING:
+            producer = self._producers.get(kind)
+            if producer is None:
+                raise KeyError(f"No daily content producer registered for {kind!r}")
+            content = producer(user_id, day, daily_rng(kind, user_id, day), context)
+            self._cache.set(key, content, ttl=seconds_left_in_day(day, tz_name, now))
+        return content
+
+    def _key(self, kind: str, user_id: str, day: date, context: Dict[str, Any]) -> Tuple[Hashable, ...]:
+        return (kind, user_id, day, tuple(sorted(context.items())))
+
+    def _remember(self, kind: str, user_id: str, tz_name: Optional[str], context: Dict[str, Any]):
+        with self._lock:
+            self._active[(kind, user_id)] = (tz_name, context)
+            self._active.move_to_end((kind, user_id))
+            while len(self._active) > self.max_users:
+                self._active.popitem(last=False)
+
+
+_daily_cache = None
+_daily_cache_lock = threading.Lock()
+
+
+def get_daily_cache() -> DailyContentCache:
+    """Process-wide daily content cache"""
+    global _daily_cache
+    if _daily_cache is None:
+        with _daily_cache_lock:
+            if _daily_cache is None:
+                _daily_cache = DailyContentCache()
+                metrics.REGISTRY.register_collector(lambda: metrics.cache_family('daily', _daily_cache.stats()))
+    return _daily_cache
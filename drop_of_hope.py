@@ -1,61 +1,18 @@
 import random
 from datetime import datetime
 
+from daily_content import get_daily_cache
+from scripture_store import get_scripture_store
+
 class DropOfHope:
     """Content pool for spiritual encouragement, verses, and wisdom"""
     
     def __init__(self):
-        self.verses = [
-            {
-                "verse": "Jeremiah 29:11",
-                "text": "For I know the plans I have for you, declares the Lord, plans to prosper you and not to harm you, to give you hope and a future.",
-                "theme": "hope"
-            },
-            {
-                "verse": "Isaiah 41:10",
-                "text": "Fear not, for I am with you; be not dismayed, for I am your God; I will strengthen you, I will help you, I will uphold you with my righteous right hand.",
-                "theme": "strength"
-            },
-            {
-                "verse": "Philippians 4:13",
-                "text": "I can do all things through Christ who strengthens me.",
-                "theme": "strength"
-            },
-            {
-                "verse": "Romans 8:28",
-                "text": "And we know that in all things God works for the good of those who love him, who have been called according to his purpose.",
-                "theme": "purpose"
-            },
-            {
-                "verse": "Psalm 23:4",
-                "text": "Even though I walk through the valley of the shadow of death, I will fear no evil, for you are with me; your rod and your staff, they comfort me.",
-                "theme": "comfort"
-            },
-            {
-                "verse": "Matthew 11:28",
-                "text": "Come to me, all you who are weary and burdened, and I will give you rest.",
-                "theme": "rest"
-            },
-            {
-                "verse": "Psalm 46:1",
-                "text": "God is our refuge and strength, an ever-present help in trouble.",
-                "theme": "strength"
-            },
-            {
-                "verse": "1 Peter 5:7",
-                "text": "Cast all your anxiety on him because he cares for you.",
-                "theme": "anxiety"
-            },
-            {
-                "verse": "Joshua 1:9",
-                "text": "Be strong and courageous. Do not be afraid; do not be discouraged, for the Lord your God will be with you wherever you go.",
-                "theme": "courage"
-            },
-            {
-                "verse": "Psalm 139:14",
-                "text": "I praise you because I am fearfully and wonderfully made; your works are wonderful, I know that full well.",
-                "theme": "identity"
-            },
+        # Shared with the other feature classes and built once per process
+        self.content = get_scripture_store()
+        # Plain dicts as before, so callers can still serialize or extend the list
+        self.verses = [verse.to_dict() for verse in self.content.hope_verses]
+        get_daily_cache().register('drop_of_hope', self._build_daily_content)
 
 Contains:
 
@@ -72,3 +29,12 @@ get_daily_content()
 get_encouragement()
 
 and more
+
+    def get_daily_content(self, user_id=None, timezone=None):
+        """Today's verse for the user (or for everyone without a user_id), fixed
+        until the user's local midnight and served from the daily cache"""
+        return dict(get_daily_cache().get('drop_of_hope', user_id or 'everyone', timezone))
+
+    def _build_daily_content(self, user_id, day, rng, context):
+        verse = rng.choice(self.verses)
+        return {'date': day.isoformat(), **verse}
@@ -1,62 +1,304 @@
 import os
+import re
 import json
+import time
+import asyncio
+import hashlib
+import functools
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any
 import firebase_admin
 from firebase_admin import credentials, firestore
+import metrics
+from ttl_cache import TTLCache
+from firestore_writer import PendingWrite, WriteBehindQueue
+from local_firestore import LocalFirestoreClient
+
+# The Firestore client is synchronous; blocking calls run on a bounded pool
+# shared by the whole process so they never stall the event loop
+FIRESTORE_MAX_WORKERS = int(os.environ.get('FIRESTORE_MAX_WORKERS', '8'))
+FIRESTORE_READ_TIMEOUT = float(os.environ.get('FIRESTORE_READ_TIMEOUT', '5'))
+FIRESTORE_PAGE_SIZE = int(os.environ.get('FIRESTORE_PAGE_SIZE', '100'))
+FIRESTORE_WARMUP_TIMEOUT = float(os.environ.get('FIRESTORE_WARMUP_TIMEOUT', '10'))
+HEALTH_COLLECTION = '_health'
+
+# Read-through cache for profile, moods, journal and prayers, keyed by user
+USER_MEMORY_CACHE_ENABLED = os.environ.get('USER_MEMORY_CACHE', '1').lower() not in ('0', 'false', 'off')
+USER_MEMORY_CACHE_SIZE = int(os.environ.get('USER_MEMORY_CACHE_SIZE', '1000'))
+USER_MEMORY_CACHE_TTL = float(os.environ.get('USER_MEMORY_CACHE_TTL', '300'))
+
+_CACHE_MISS = object()
+_EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+# Optional write-behind batching for save_* calls
+FIRESTORE_WRITE_BEHIND = os.environ.get('FIRESTORE_WRITE_BEHIND', '0').lower() in ('1', 'true', 'on')
+FIRESTORE_WRITE_BATCH_SIZE = int(os.environ.get('FIRESTORE_WRITE_BATCH_SIZE', '100'))
+FIRESTORE_WRITE_MAX_DELAY = float(os.environ.get('FIRESTORE_WRITE_MAX_DELAY', '0.5'))
+FIRESTORE_WRITE_QUEUE_SIZE = int(os.environ.get('FIRESTORE_WRITE_QUEUE_SIZE', '5000'))
+FIRESTORE_WRITE_ENQUEUE_TIMEOUT = float(os.environ.get('FIRESTORE_WRITE_ENQUEUE_TIMEOUT', '2'))
+
+
+class FirestoreReadError(Exception):
+    """A page of a streamed read failed; the items yielded so far are incomplete"""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Get the process-wide Firestore thread pool, creating it on first use"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=FIRESTORE_MAX_WORKERS,
+                                               thread_name_prefix='firestore')
+    return _executor
+
+
+# One Firestore client per process, shared by every service that needs it
+_client = None
+_client_initialized = False
+_client_lock = threading.Lock()
+
+_shared_service = None
+_shared_service_lock = threading.Lock()
+
+# Result of the most recent warm-up, reported by the health endpoint
+_health = {'connected': False, 'warm': False, 'latency_ms': None, 'error': None}
+
+
+def _create_firestore_client():
+    """Initialize Firebase with service account or use Firestore emulator"""
+    try:
+        # Local stand-in for offline load tests and benchmarks
+        local_backend = os.environ.get('FIRESTORE_BACKEND')
+        if local_backend:
+            return LocalFirestoreClient.from_url(local_backend)
+        
+        # Check if Firebase is already initialized
+        try:
+            return firestore.client(firebase_admin.get_app())
+        except ValueError:
+            pass
+        
+        # Try to initialize with service account
+        firebase_creds = os.environ.get('FIREBASE_SERVICE_ACCOUNT')
+        if firebase_creds:
+            try:
+                cred_dict = json.loads(firebase_creds)
+                cred = credentials.Certificate(cred_dict)
+                firebase_admin.initialize_app(cred)
+                logging.info("Firebase initialized with service account")
+                return firestore.client()
+            except Exception as e:
+                logging.warning(f"Failed to initialize with service account: {e}")
+        
+        # Check for environment project ID
+        project_id = os.environ.get('FIREBASE_PROJECT_ID') or os.environ.get('GOOGLE_CLOUD_PROJECT')
+        if project_id:
+            try:
+                firebase_admin.initialize_app(options={'projectId': project_id})
+                logging.info(f"Firebase initialized with project ID: {project_id}")
+                return firestore.client()
+            except Exception as e:
+                logging.warning(f"Failed to initialize with project ID: {e}")
+        
+        # Gracefully handle no Firebase configuration
+        logging.info("No Firebase configuration found - running without persistent memory")
+        return None
+        
+    except Exception as e:
+        logging.warning(f"Firebase initialization failed - running without persistent memory: {e}")
+        return None
+
+
+def get_firestore_client():
+    """Get the process-wide Firestore client, creating it on first use"""
+    global _client, _client_initialized
+    if not _client_initialized:
+        with _client_lock:
+            if not _client_initialized:
+                _client = _create_firestore_client()
+                _client_initialized = True
+    return _client
+
+
+def warm_up_firestore(timeout: float = FIRESTORE_WARMUP_TIMEOUT) -> Dict[str, Any]:
+    """Create the shared client and do one read so the channel is open before traffic.
+
+    Call this once per worker process after it starts (after fork, since gRPC
+    channels don't survive forking).
+    """
+    started = time.monotonic()
+    client = get_firestore_client()
+    _health.update(connected=client is not None, warm=False, latency_ms=None, error=None)
+    if client is None:
+        return dict(_health)
+
+    try:
+        # Reading a document that may not exist still does the full handshake
+        ref = client.collection(HEALTH_COLLECTION).document('warmup')
+        _get_executor().submit(ref.get).result(timeout=timeout)
+        _health.update(warm=True, latency_ms=round((time.monotonic() - started) * 1000, 1))
+        logging.info(f"Firestore warmed up in {_health['latency_ms']} ms")
+    except Exception as e:
+        _health['error'] = str(e) or type(e).__name__
+        logging.warning(f"Firestore warm-up failed: {_health['error']}")
+    return dict(_health)
+
+
+def firestore_health() -> Dict[str, Any]:
+    """Status of the shared Firestore client from the last warm-up"""
+    return dict(_health)
+
+
+def get_firebase_service() -> 'FirebaseService':
+    """Get the FirebaseService shared by the whole process, with its caches and write queue"""
+    global _shared_service
+    if _shared_service is None:
+        with _shared_service_lock:
+            if _shared_service is None:
+                _shared_service = FirebaseService()
+                metrics.REGISTRY.register_collector(
+                    lambda: metrics.cache_family('user_memory', _shared_service.cache_stats()))
+    return _shared_service
+
+
+class _UserMemoryEntry:
+    """Cached sections for one user, plus a generation bumped on every write"""
+    __slots__ = ('generation', 'sections')
 
-class FirebaseService:
     def __init__(self):
-        """Initialize Firebase connection"""
-        self.db = None
-        self._initialize_firebase()
+        self.generation = 0
+        self.sections = {}
+
+
+class FirebaseService:
+    def __init__(self, read_timeout: float = FIRESTORE_READ_TIMEOUT,
+                 cache_enabled: bool = USER_MEMORY_CACHE_ENABLED,
+                 write_behind: bool = FIRESTORE_WRITE_BEHIND, db=None):
+        """Initialize Firebase connection, or use the given Firestore-compatible client"""
+        self.db = db
+        self.read_timeout = read_timeout
+        self.cache_enabled = cache_enabled
+        self._memory_cache = TTLCache(max_entries=USER_MEMORY_CACHE_SIZE, ttl=USER_MEMORY_CACHE_TTL)
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._topic_index = TTLCache(max_entries=USER_MEMORY_CACHE_SIZE, ttl=USER_MEMORY_CACHE_TTL)
+        # Topics saved while a user's index is being scanned, applied once the scan is in
+        self._topic_scans: Dict[str, Dict[str, Dict]] = {}
+        self._write_behind = None
+        if self.db is None:
+            self._initialize_firebase()
+        
+        if write_behind and self.is_connected():
+            self._write_behind = WriteBehindQueue(
+                self.db,
+                max_batch_size=FIRESTORE_WRITE_BATCH_SIZE,
+                max_delay=FIRESTORE_WRITE_MAX_DELAY,
+                max_queue=FIRESTORE_WRITE_QUEUE_SIZE
+            )
     
     def _initialize_firebase(self):
-        """Initialize Firebase with service account or use Firestore emulator"""
-        try:
-            # Check if Firebase is already initialized
-            if firebase_admin._apps:
-                app = firebase_admin.get_app()
-                self.db = firestore.client(app)
-                return
-            
-            # Try to initialize with service account
-            firebase_creds = os.environ.get('FIREBASE_SERVICE_ACCOUNT')
-            if firebase_creds:
-                try:
-                    cred_dict = json.loads(firebase_creds)
-                    cred = credentials.Certificate(cred_dict)
-                    firebase_admin.initialize_app(cred)
-                    self.db = firestore.client()
-                    logging.info("Firebase initialized with service account")
-                    return
-                except Exception as e:
-                    logging.warning(f"Failed to initialize with service account: {e}")
-            
-            # Check for environment project ID
-            project_id = os.environ.get('FIREBASE_PROJECT_ID') or os.environ.get('GOOGLE_CLOUD_PROJECT')
-            if project_id:
-                try:
-                    firebase_admin.initialize_app(options={'projectId': project_id})
-                    self.db = firestore.client()
-                    logging.info(f"Firebase initialized with project ID: {project_id}")
-                    return
-                except Exception as e:
-                    logging.warning(f"Failed to initialize with project ID: {e}")
-            
-            # Gracefully handle no Firebase configuration
-            logging.info("No Firebase configuration found - running without persistent memory")
-            self.db = None
-            
-        except Exception as e:
-            logging.warning(f"Firebase initialization failed - running without persistent memory: {e}")
-            self.db = None
+        """Use the process-wide Firestore client"""
+        self.db = get_firestore_client()
     
     def is_connected(self) -> bool:
         """Check if Firebase is properly connected"""
         return self.db is not None
     
+    async def _run_blocking(self, func, *args):
+        """Run a blocking Firestore call on the shared thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), func, *args)
+    
+    async def _cached_read(self, user_id: str, section: tuple, func, *args):
+        """Serve a read from the user memory cache, fetching it on a miss"""
+        if not self.cache_enabled:
+            return await self._run_blocking(func, user_id, *args)
+        
+        entry = self._memory_cache.get(user_id)
+        if entry is None:
+            entry = _UserMemoryEntry()
+            self._memory_cache.set(user_id, entry)
+        else:
+            value = entry.sections.get(section, _CACHE_MISS)
+            if value is not _CACHE_MISS:
+                self._cache_hits += 1
+                return _copy_section(value)
+        
+        self._cache_misses += 1
+        generation = entry.generation
+        value = await self._run_blocking(func, user_id, *args)
+        # A write that landed while we were reading makes this result stale
+        if entry.generation == generation:
+            entry.sections[section] = value
+        return _copy_section(value)
+    
+    async def _write(self, ref, data: Dict, user_id: str, kind: str, merge: bool = False):
+        """Write a document, through the write-behind queue when it is enabled"""
+        self.invalidate_user_memory(user_id, kind)
+        if self._write_behind is not None:
+            # Invalidate again once committed, in case a read cached the old
+            # state while the write was still queued
+            write = PendingWrite(ref, data, merge=merge,
+                                 on_commit=lambda: self.invalidate_user_memory(user_id, kind))
+            if self._write_behind.submit(write, timeout=0):
+                return
+            # Queue is full: wait for room off the event loop before giving up
+            if await self._run_blocking(self._write_behind.submit, write, FIRESTORE_WRITE_ENQUEUE_TIMEOUT):
+                return
+            logging.warning(f"Write-behind queue full - writing {kind} for {user_id} directly")
+        
+        await self._run_blocking(functools.partial(ref.set, data, merge=merge))
+        self.invalidate_user_memory(user_id, kind)
+    
+    async def flush_writes(self, timeout: Optional[float] = None) -> bool:
+        """Wait for queued writes to be committed"""
+        if self._write_behind is None:
+            return True
+        return await self._run_blocking(self._write_behind.flush, timeout)
+    
+    def close(self):
+        """Flush queued writes and stop the write-behind thread"""
+        if self._write_behind is not None:
+            self._write_behind.close()
+    
+    def write_stats(self) -> Dict[str, Any]:
+        """Counters for the write-behind queue"""
+        if self._write_behind is None:
+            return {'enabled': False}
+        return {'enabled': True, **self._write_behind.stats()}
+    
+    def invalidate_user_memory(self, user_id: str, *kinds: str):
+        """Drop cached sections of the given kinds, or all of them, for a user"""
+        entry = self._memory_cache.pop(user_id) if not kinds else self._memory_cache.get(user_id)
+        if entry is None:
+            return
+        entry.generation += 1
+        if kinds:
+            for section in list(entry.sections):
+                if section[0] in kinds:
+                    del entry.sections[section]
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit, miss and eviction counters for the user memory cache"""
+        stats = self._memory_cache.stats()
+        return {
+            'enabled': self.cache_enabled,
+            'users': stats['size'],
+            'max_users': stats['max_entries'],
+            'hits': self._cache_hits,
+            'misses': self._cache_misses,
+            'evictions': stats['evictions'],
+            'expirations': stats['expirations'],
+        }
+    
     def get_user_id(self, user_name: str, session_id: str = None) -> str:
         """Generate a consistent user ID from name and session"""
         # Simple user ID generation - in production, use proper auth
@@ -82,7 +324,7 @@ class FirebaseService:
             }
             
             # Update or create profile
-            user_ref.set(profile_data, merge=True)
+            await self._write(user_ref, profile_data, user_id, 'profile', merge=True)
             logging.info(f"User profile saved for {user_id}")
             return True
             
@@ -90,23 +332,51 @@ class FirebaseService:
             logging.error(f"Failed to save user profile: {e}")
             return False
     
+    async def save_rotation(self, user_id: str, rotation: Dict[str, str]) -> bool:
+        """Merge encoded verse rotations ({pool: 'cycle.seen'}) into the user's profile"""
+        if not self.is_connected():
+            return False
+
+        try:
+            user_ref = self.db.collection('users').document(user_id)
+            await self._write(user_ref, {'rotation': rotation}, user_id, 'profile', merge=True)
+            return True
+
+        except Exception as e:
+            logging.error(f"Failed to save verse rotation: {e}")
+            return False
+
+    async def get_rotation(self, user_id: str) -> Dict[str, str]:
+        """The user's saved verse rotations, {} when there are none.
+
+        Unlike get_user_profile a failed read raises, so callers can tell
+        "nothing saved" apart from "couldn't read it".
+        """
+        if not self.is_connected():
+            return {}
+        profile = await self._cached_read(user_id, ('profile',), self._fetch_user_profile)
+        return dict((profile or {}).get('rotation') or {})
+
     async def get_user_profile(self, user_id: str) -> Optional[Dict]:
         """Retrieve user profile information"""
         if not self.is_connected():
             return None
             
         try:
-            user_ref = self.db.collection('users').document(user_id)
-            doc = user_ref.get()
-            
-            if doc.exists:
-                return doc.to_dict()
-            return None
+            return await self._cached_read(user_id, ('profile',), self._fetch_user_profile)
             
         except Exception as e:
             logging.error(f"Failed to get user profile: {e}")
             return None
     
+    def _fetch_user_profile(self, user_id: str) -> Optional[Dict]:
+        user_ref = self.db.collection('users').document(user_id)
+        doc = user_ref.get()
+        
+        if doc.exists:
+            return doc.to_dict()
+        return None
+    
     async def save_journal_entry(self, user_id: str, content: str, mood: str = None) -> bool:
         """Save a journal entry for the user"""
         if not self.is_connected():
@@ -121,7 +391,8 @@ class FirebaseService:
                 'date': datetime.now(timezone.utc).strftime('%Y-%m-%d')
             }
             
-            journal_ref.add(entry_data)
+            # document() with no ID allocates one locally, like add() does
+            await self._write(journal_ref.document(), entry_data, user_id, 'journal')
             logging.info(f"Journal entry saved for {user_id}")
             return True
             
@@ -135,24 +406,28 @@ class FirebaseService:
             return []
             
         try:
-            journal_ref = (self.db.collection('users').document(user_id)
-                          .collection('journal')
-                          .order_by('timestamp', direction=firestore.Query.DESCENDING)
-                          .limit(limit))
-            
-            docs = journal_ref.stream()
-            entries = []
-            
-            for doc in docs:
-                entry = doc.to_dict()
-                entry['id'] = doc.id
-                entries.append(entry)
-            
-            return entries
+            return await self._cached_read(user_id, ('journal', limit), self._fetch_journal_entries, limit)
             
         except Exception as e:
             logging.error(f"Failed to get journal entries: {e}")
             return []
+    
+    def _fetch_journal_entries(self, user_id: str, limit: int) -> List[Dict]:
+        journal_ref = (self.db.collection('users').document(user_id)
+                      .collection('journal')
+                      .order_by('timestamp', direction=firestore.Query.DESCENDING)
+                      .limit(limit))
+        
+        docs = journal_ref.stream()
+        entries = []
+        
+        for doc in docs:
+            entry = doc.to_dict()
+            entry['id'] = doc.id
+            entries.append(entry)
+        
+        return entries
+
     async def save_mood(self, user_id: str, mood: str, context: str = None) -> bool:
         """Save user's mood for the day"""
         if not self.is_connected():
@@ -170,7 +445,7 @@ class FirebaseService:
                 'date': today
             }
             
-            mood_ref.set(mood_data, merge=True)
+            await self._write(mood_ref, mood_data, user_id, 'moods', merge=True)
             logging.info(f"Mood saved for {user_id}: {mood}")
             return True
             
@@ -184,24 +459,27 @@ class FirebaseService:
             return []
             
         try:
-            mood_ref = (self.db.collection('users').document(user_id)
-                       .collection('moods')
-                       .order_by('timestamp', direction=firestore.Query.DESCENDING)
-                       .limit(days))
-            
-            docs = mood_ref.stream()
-            moods = []
-            
-            for doc in docs:
-                mood_data = doc.to_dict()
-                mood_data['id'] = doc.id
-                moods.append(mood_data)
-            
-            return moods
+            return await self._cached_read(user_id, ('moods', days), self._fetch_recent_moods, days)
             
         except Exception as e:
             logging.error(f"Failed to get recent moods: {e}")
             return []
+    
+    def _fetch_recent_moods(self, user_id: str, days: int) -> List[Dict]:
+        mood_ref = (self.db.collection('users').document(user_id)
+                   .collection('moods')
+                   .order_by('timestamp', direction=firestore.Query.DESCENDING)
+                   .limit(days))
+        
+        docs = mood_ref.stream()
+        moods = []
+        
+        for doc in docs:
+            mood_data = doc.to_dict()
+            mood_data['id'] = doc.id
+            moods.append(mood_data)
+        
+        return moods
 
     async def save_prayer_request(self, user_id: str, request: str) -> bool:
         """Save a prayer request"""
@@ -216,7 +494,7 @@ class FirebaseService:
                 'status': 'active'  # active, answered, ongoing
             }
             
-            prayer_ref.add(prayer_data)
+            await self._write(prayer_ref.document(), prayer_data, user_id, 'prayers')
             logging.info(f"Prayer request saved for {user_id}")
             return True
             
@@ -230,25 +508,103 @@ class FirebaseService:
             return []
             
         try:
-            prayer_ref = (self.db.collection('users').document(user_id)
-                         .collection('prayers')
-                         .where('status', '==', 'active')
-                         .order_by('timestamp', direction=firestore.Query.DESCENDING)
-                         .limit(limit))
-            
-            docs = prayer_ref.stream()
-            prayers = []
-            
-            for doc in docs:
-                prayer_data = doc.to_dict()
-                prayer_data['id'] = doc.id
-                prayers.append(prayer_data)
-            
-            return prayers
+            return await self._cached_read(user_id, ('prayers', limit), self._fetch_prayer_requests, limit)
             
         except Exception as e:
             logging.error(f"Failed to get prayer requests: {e}")
             return []
+    
+    def _fetch_prayer_requests(self, user_id: str, limit: int) -> List[Dict]:
+        prayer_ref = (self.db.collection('users').document(user_id)
+                     .collection('prayers')
+                     .where('status', '==', 'active')
+                     .order_by('timestamp', direction=firestore.Query.DESCENDING)
+                     .limit(limit))
+        
+        docs = prayer_ref.stream()
+        prayers = []
+        
+        for doc in docs:
+            prayer_data = doc.to_dict()
+            prayer_data['id'] = doc.id
+            prayers.append(prayer_data)
+        
+        return prayers
+
+    def iter_journal_entries(self, user_id: str, page_size: int = FIRESTORE_PAGE_SIZE,
+                             prefetch: bool = False) -> AsyncIterator[Dict]:
+        """Stream every journal entry for a user, newest first, one page at a time"""
+        query = (self.db.collection('users').document(user_id)
+                .collection('journal')
+                .order_by('timestamp', direction=firestore.Query.DESCENDING)) if self.is_connected() else None
+        return self._paginate(query, page_size, prefetch, 'journal entries')
+
+    def iter_moods(self, user_id: str, page_size: int = FIRESTORE_PAGE_SIZE,
+                   prefetch: bool = False) -> AsyncIterator[Dict]:
+        """Stream a user's whole mood history, newest first, one page at a time"""
+        query = (self.db.collection('users').document(user_id)
+                .collection('moods')
+                .order_by('timestamp', direction=firestore.Query.DESCENDING)) if self.is_connected() else None
+        return self._paginate(query, page_size, prefetch, 'moods')
+
+    def iter_prayer_requests(self, user_id: str, page_size: int = FIRESTORE_PAGE_SIZE,
+                             prefetch: bool = False, status: Optional[str] = None) -> AsyncIterator[Dict]:
+        """Stream a user's prayer requests, newest first, optionally filtered by status"""
+        query = None
+        if self.is_connected():
+            query = self.db.collection('users').document(user_id).collection('prayers')
+            if status:
+                query = query.where('status', '==', status)
+            query = query.order_by('timestamp', direction=firestore.Query.DESCENDING)
+        return self._paginate(query, page_size, prefetch, 'prayer requests')
+
+    async def _paginate(self, query, page_size: int, prefetch: bool, label: str) -> AsyncIterator[Dict]:
+        """Walk a query with start_after cursors so only one or two pages are ever held.
+
+        Raises FirestoreReadError if a page can't be read, after the items
+        of the pages before it have been yielded.
+        """
+        if query is None:
+            return
+        
+        def fetch_page(cursor):
+            page = query.limit(page_size)
+            if cursor is not None:
+                page = page.start_after(cursor)
+            return list(page.stream())
+        
+        loop = asyncio.get_running_loop()
+        cursor = None
+        pending = None
+        try:
+            while True:
+                page = pending or loop.run_in_executor(_get_executor(), fetch_page, cursor)
+                pending = None
+                try:
+                    docs = await asyncio.wait_for(page, timeout=self.read_timeout)
+                except Exception as e:
+                    # Stopping here would hand the caller a silently truncated history
+                    logging.error(f"Failed to page through {label}: {e!r}")
+                    raise FirestoreReadError(f"Failed to page through {label}: {e!r}") from e
+                
+                if not docs:
+                    return
+                cursor = docs[-1]
+                has_more = len(docs) == page_size
+                if has_more and prefetch:
+                    # Next page is on its way while the caller works on this one
+                    pending = loop.run_in_executor(_get_executor(), fetch_page, cursor)
+                
+                for doc in docs:
+                    item = doc.to_dict()
+                    item['id'] = doc.id
+                    yield item
+                
+                if not has_more:
+                    return
+        finally:
+            if pending is not None:
+                pending.cancel()
 
     async def save_conversation_context(self, user_id: str, topic: str, context: str) -> bool:
         """Save conversation context for memory"""
@@ -256,7 +612,10 @@ class FirebaseService:
             return False
             
         try:
-            context_ref = self.db.collection('users').document(user_id).collection('contexts')
+            # One document per topic, so saving is a single idempotent upsert
+            # and concurrent saves of the same topic can't create duplicates
+            context_ref = (self.db.collection('users').document(user_id)
+                          .collection('contexts').document(context_doc_id(topic)))
             context_data = {
                 'topic': topic,
                 'context': context,
@@ -264,17 +623,8 @@ class FirebaseService:
                 'last_mentioned': datetime.now(timezone.utc)
             }
             
-            # Check if topic already exists and update
-            existing = context_ref.where('topic', '==', topic).limit(1).stream()
-            doc_id = None
-            for doc in existing:
-                doc_id = doc.id
-                break
-            
-            if doc_id:
-                context_ref.document(doc_id).set(context_data, merge=True)
-            else:
-                context_ref.add(context_data)
+            await self._write(context_ref, context_data, user_id, 'contexts', merge=True)
+            self._index_topic(user_id, context_ref.id, context_data)
             
             logging.info(f"Conversation context saved for {user_id}: {topic}")
             return True
@@ -283,17 +633,123 @@ class FirebaseService:
             logging.error(f"Failed to save conversation context: {e}")
             return False
 
+    async def get_conversation_context(self, user_id: str, topic: str) -> Optional[Dict]:
+        """Look up the saved context for one topic"""
+        if not self.is_connected():
+            return None
+        
+        index = self._topic_index.get(user_id)
+        if index is not None:
+            entry = index.get(topic)
+            return dict(entry) if entry else None
+        
+        try:
+            # Deterministic ID: a point read, no query needed
+            doc = await self._run_blocking(
+                self.db.collection('users').document(user_id)
+                .collection('contexts').document(context_doc_id(topic)).get
+            )
+            if doc.exists:
+                context_data = doc.to_dict()
+                context_data['id'] = doc.id
+                return context_data
+            # Saved under a random ID before topics had deterministic ones
+            return await self._run_blocking(self._fetch_legacy_context, user_id, topic)
+            
+        except Exception as e:
+            logging.error(f"Failed to get conversation context: {e}")
+            return None
+
+    def _fetch_legacy_context(self, user_id: str, topic: str) -> Optional[Dict]:
+        latest = None
+        query = (self.db.collection('users').document(user_id)
+                 .collection('contexts').where('topic', '==', topic))
+        for doc in query.stream():
+            context_data = doc.to_dict()
+            context_data['id'] = doc.id
+            if latest is None or (context_data.get('last_mentioned') or _EPOCH) > (latest.get('last_mentioned') or _EPOCH):
+                latest = context_data
+        return latest
+
+    async def get_known_topics(self, user_id: str) -> List[str]:
+        """List a user's saved topics, most recently mentioned first"""
+        if not self.is_connected():
+            return []
+        
+        try:
+            index = self._topic_index.get(user_id)
+            if index is None:
+                index = await self._scan_topics(user_id)
+            
+            entries = sorted(index.values(), key=lambda entry: entry.get('last_mentioned') or _EPOCH, reverse=True)
+            return [entry['topic'] for entry in entries]
+            
+        except Exception as e:
+            logging.error(f"Failed to get known topics: {e}")
+            return []
+
+    async def _scan_topics(self, user_id: str) -> Dict[str, Dict]:
+        # Saves that land while the scan runs may be missing from its
+        # results, so they are recorded and applied on top before caching
+        saved = self._topic_scans.setdefault(user_id, {})
+        try:
+            index = await self._run_blocking(self._fetch_topic_index, user_id)
+        finally:
+            if self._topic_scans.get(user_id) is saved:
+                del self._topic_scans[user_id]
+        index.update(saved)
+        # A concurrent scan got there first and has been kept current since
+        cached = self._topic_index.get(user_id)
+        if cached is not None:
+            return cached
+        self._topic_index.set(user_id, index)
+        return index
+
+    def _fetch_topic_index(self, user_id: str) -> Dict[str, Dict]:
+        # Loaded once per user, then kept current by save_conversation_context.
+        # Also picks up contexts saved under random IDs before topics had
+        # deterministic document IDs
+        index = {}
+        for doc in self.db.collection('users').document(user_id).collection('contexts').stream():
+            context_data = doc.to_dict()
+            context_data['id'] = doc.id
+            topic = context_data.get('topic')
+            if topic is None:
+                continue
+            current = index.get(topic)
+            if current is None or (context_data.get('last_mentioned') or _EPOCH) > (current.get('last_mentioned') or _EPOCH):
+                index[topic] = context_data
+        return index
+
+    def _index_topic(self, user_id: str, doc_id: str, context_data: Dict):
+        # Only update a fully loaded index; a partial one would hide topics
+        entry = {**context_data, 'id': doc_id}
+        index = self._topic_index.get(user_id)
+        if index is not None:
+            index[entry['topic']] = entry
+        scan = self._topic_scans.get(user_id)
+        if scan is not None:
+            scan[entry['topic']] = entry
+
     async def get_user_memory(self, user_id: str) -> Dict[str, Any]:
         """Get comprehensive user memory for personalized responses"""
         if not self.is_connected():
             return {}
             
         try:
+            # All four reads go out at once; a slow or failing read only
+            # leaves its own section empty
+            profile, recent_moods, recent_journal, prayer_requests = await asyncio.gather(
+                self._with_timeout(self.get_user_profile(user_id), None, 'profile'),
+                self._with_timeout(self.get_recent_moods(user_id, 3), [], 'recent moods'),
+                self._with_timeout(self.get_journal_entries(user_id, 3), [], 'journal entries'),
+                self._with_timeout(self.get_prayer_requests(user_id, 3), [], 'prayer requests')
+            )
             memory = {
-                'profile': await self.get_user_profile(user_id),
-                'recent_moods': await self.get_recent_moods(user_id, 3),
-                'recent_journal': await self.get_journal_entries(user_id, 3),
-                'prayer_requests': await self.get_prayer_requests(user_id, 3)
+                'profile': profile,
+                'recent_moods': recent_moods,
+                'recent_journal': recent_journal,
+                'prayer_requests': prayer_requests
             }
             
             return memory
@@ -301,5 +757,31 @@ class FirebaseService:
         except Exception as e:
             logging.error(f"Failed to get user memory: {e}")
             return {}
+    
+    async def _with_timeout(self, coro, default, label: str):
+        """Await a read with the per-call timeout, falling back to a default"""
+        try:
+            return await asyncio.wait_for(coro, timeout=self.read_timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Timed out reading {label} after {self.read_timeout}s")
+            return default
+        except Exception as e:
+            logging.warning(f"Failed to read {label}: {e}")
+            return default
+
+
+def _copy_section(value):
+    """Copy a cached section so callers can't mutate the cached one"""
+    if isinstance(value, list):
+        return [dict(item) for item in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
 
 
+def context_doc_id(topic: str) -> str:
+    """Deterministic Firestore document ID for a conversation topic"""
+    # Readable prefix for the console, hash for uniqueness and valid characters
+    slug = re.sub(r'[^a-z0-9]+', '-', topic.lower()).strip('-')[:40]
+    digest = hashlib.sha1(topic.encode('utf-8')).hexdigest()[:16]
+    return f"{slug}-{digest}" if slug else digest
@@ -0,0 +1,171 @@
+"""
+Write-behind queue for Firestore
+Groups document writes into WriteBatch commits on a background thread so
+request handlers don't wait on Firestore write latency
+"""
+
+import time
+import atexit
+import random
+import logging
+import threading
+from queue import Queue, Empty, Full
+from typing import Callable, Dict, Optional
+
+# Firestore rejects batches with more than 500 writes
+MAX_FIRESTORE_BATCH = 500
+
+_STOP = object()
+
+
+class PendingWrite:
+    """One queued document write"""
+    __slots__ = ('ref', 'data', 'merge', 'on_commit', 'enqueued_at')
+
+    def __init__(self, ref, data: Dict, merge: bool = False, on_commit: Optional[Callable[[], None]] = None):
+        self.ref = ref
+        self.data = data
+        self.merge = merge
+        self.on_commit = on_commit
+        self.enqueued_at = time.monotonic()
+
+
+class WriteBehindQueue:
+    """Buffers writes and commits them in batches once a size or age limit is hit"""
+
+    def __init__(self, db, max_batch_size: int = 100, max_delay: float = 0.5,
+                 max_queue: int = 5000, max_retries: int = 5, base_backoff: float = 0.2):
+        self.db = db
+        self.max_batch_size = min(max_batch_size, MAX_FIRESTORE_BATCH)
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+
+        self._queue = Queue(maxsize=max_queue)
+        self._outstanding = 0
+        self._idle = threading.Condition()
+        self._closed = False
+
+        self.batches_committed = 0
+        self.writes_committed = 0
+        self.writes_failed = 0
+        self.retries = 0
+
+        self._thread = threading.Thread(target=self._run, name='firestore-write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, write: PendingWrite, timeout: Optional[float] = None) -> bool:
+        """Queue a write, blocking up to `timeout` while the queue is full.
+
+        Returns False if the queue stayed full or is closed, in which case the
+        caller should write directly.
+        """
+        if self._closed:
+            return False
+        with self._idle:
+            self._outstanding += 1
+        try:
+            self._queue.put(write, block=timeout != 0, timeout=timeout or None)
+            return True
+        except Full:
+            self._finish(1)
+            return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued write has been committed or given up on"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._outstanding == 0, timeout=timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Flush what is queued and stop the background thread"""
+        if self._closed:
+            return
+        self._closed = True
+        # The stop marker is queued behind everything already submitted
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logging.warning(f"Write-behind queue still had {self._outstanding} writes after {timeout}s")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'queued': self._queue.qsize(),
+            'outstanding': self._outstanding,
+            'batches_committed': self.batches_committed,
+            'writes_committed': self.writes_committed,
+            'writes_failed': self.writes_failed,
+            'retries': self.retries,
+        }
+
+    def _finish(self, count: int):
+        with self._idle:
+            self._outstanding -= count
+            if self._outstanding == 0:
+                self._idle.notify_all()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+
+            batch = [first]
+            # Age limit is measured from the oldest write in the batch
+            deadline = first.enqueued_at + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    write = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except Empty:
+                    break
+                if write is _STOP:
+                    stopping = True
+                    break
+                batch.append(write)
+
+            self._commit(batch)
+
+        # Drain anything that slipped in behind the stop marker
+        leftover = []
+        while True:
+            try:
+                write = self._queue.get_nowait()
+            except Empty:
+                break
+            if write is not _STOP:
+                leftover.append(write)
+        for start in range(0, len(leftover), self.max_batch_size):
+            self._commit(leftover[start:start + self.max_batch_size])
+
+    def _commit(self, writes):
+        for attempt in range(self.max_retries + 1):
+            try:
+                batch = self.db.batch()
+                for write in writes:
+                    batch.set(write.ref, write.data, merge=write.merge)
+                batch.commit()
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.writes_failed += len(writes)
+                    logging.error(f"Dropping {len(writes)} Firestore writes after {attempt + 1} attempts: {e}")
+                    self._finish(len(writes))
+                    return
+                # Retrying blocks the writer thread, so a struggling backend
+                # fills the queue and pushes back on callers
+                self.retries += 1
+                delay = self.base_backoff * (2 ** attempt) * (0.5 + random.random())
+                logging.warning(f"Firestore batch commit failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+        self.batches_committed += 1
+        self.writes_committed += len(writes)
+        for write in writes:
+            if write.on_commit:
+                try:
+                    write.on_commit()
+                except Exception as e:
+                    logging.warning(f"Write-behind commit callback failed: {e}")
+        self._finish(len(writes))
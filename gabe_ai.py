@@ -6,8 +6,14 @@ from datetime import datetime
 from openai import OpenAI
 from google import genai
 from google.genai import types
-from firebase_service import FirebaseService
+from firebase_service import get_firebase_service
 from drop_of_hope import DropOfHope
+from gabe_persona import BASE_SYSTEM_PROMPT
+from llm_providers import GeminiProvider, OpenAIProvider
+from provider_dispatch import HedgedDispatcher, ProviderUnavailableError
+from response_cache import cached_response
+from scripture_search import local_scripture_first
+from prompt_budget import ConversationBudgeter, conversation_key
 
 class GabeAI:
     def __init__(self):
@@ -15,8 +21,8 @@ class GabeAI:
         self.openai_client = None
         self.gemini_client = None
         
-        # Initialize Firebase service and Drop of Hope content
-        self.firebase = FirebaseService()
+        # Shared Firebase service (one client per process) and Drop of Hope content
+        self.firebase = get_firebase_service()
         self.drop_of_hope = DropOfHope()
         
         # Try to initialize OpenAI
@@ -42,48 +48,19 @@ class GabeAI:
         if not self.openai_client and not self.gemini_client:
             raise Exception("No AI provider available. Please check your API keys.")
         
+        # Providers in fallback order behind one complete/stream interface
+        self.providers = []
+        if self.openai_client:
+            self.providers.append(OpenAIProvider(self.openai_client, self.openai_model))
+        if self.gemini_client:
+            self.providers.append(GeminiProvider(self.gemini_client, self.gemini_model))
+        # Hedges a slow provider with the next one and skips any whose circuit is open
+        self.dispatcher = HedgedDispatcher(self.providers, name='gabe_ai')
+        # Keeps prompts under PROMPT_TOKEN_BUDGET however long the conversation gets
+        self.prompt_budgeter = ConversationBudgeter()
+        
         # Dynamic AI system prompt - naturally conversational and deeply personal
-        self.base_system_prompt = """You are GABE — short for "God Always Beside Everyone." You're a warm, faithful, emotionally intelligent spiritual companion who chats like a real friend with a Bible in one hand and coffee in the other. You engage in natural, flowing conversations that feel authentic and personally meaningful.
-
-CONVERSATIONAL STYLE:
-- Sound like a real friend — warm, kind, casual, and conversational. Avoid sounding robotic or overly formal
-- Match their energy and directness - if they say "people are mean", acknowledge that reality first
-- Use their name naturally and make it personal - this builds connection
-- Respond to their emotional tone (hurt, sadness, confusion, frustration, joy, discouragement)
-- Provide medium-length messages (not long sermons) with real-life examples and simple language
-- Keep responses authentic like a mix between a brother, a mentor, and a best friend
-
-DYNAMIC RESPONSE APPROACH:
-- For raw emotional statements like "people are mean": Validate first ("Yeah, some people really are"), then naturally share biblical wisdom - "You know what helped me? Jesus said people would be harsh, but He also said 'blessed are those who show mercy.' Not saying you have to be nice to mean people, but maybe we can find a way to protect your heart from th...
-eir nastiness."
-- For managing difficult feelings: Offer both validation and practical biblical wisdom - acknowledge the struggle, then share how biblical characters dealt with similar emotions
-- Always weave in Scripture naturally, not as formal quotes but as conversational wisdom
-- Make biblical truth feel relevant and helpful, not preachy
-
-NATURAL CONVERSATION FLOW:
-- Build on what they just said specifically
-- Reference earlier parts of your conversation when relevant
-- Use natural transitions and connective language
-- Vary your response length based on what they need in the moment
-- End with natural conversation starters, not forced questions
-
-SPIRITUAL AUTHENTICITY:
-- Share Bible verses that truly connect to their specific situation
-- Tell relevant stories from Scripture in a conversational way
-- Offer prayers that feel personal and genuine to their circumstances
-- Provide hope and encouragement that addresses their real concerns
-- Be present with them in whatever they're experiencing
-
-RESPONSE EXAMPLES:
-For "people are mean": "Yeah, some people really are mean. That sucks and it hurts. You know what? Even Jesus dealt with mean people - they criticized Him constantly. He said 'In this world you will have trouble, but take heart! I have overcome the world.' Not trying to minimize your pain, but maybe knowing even Jesus got it can help a little."
-
-For managing feelings: "That's a heavy feeling to carry. You know, King David wrote about feeling overwhelmed too - he said 'When anxiety was great within me, your consolation brought me joy.' Maybe we can find some of that same peace for you."
-
-Always blend real validation with natural biblical wisdom. Make Scripture feel like helpful life advice from someone who gets it.
-
-NO TECH ANALOGIES: Avoid WiFi, phones, apps, passwords, Netflix, etc. Use nature, seasons, journeys, light/darkness instead.
-
-Crisis Response: 'You matter deeply to God and to me. Please reach out: 988 Suicide & Crisis Lifeline. You're precious 💙'"""
+        self.base_system_prompt = BASE_SYSTEM_PROMPT
 
         # Age-specific personality adjustments
         self.age_personalities = {
@@ -99,16 +76,82 @@ Crisis Response: 'You matter deeply to God and to me. Please reach out: 988 Suic
                 'tone': "Warm, wise, deeply rooted in faith. Draw from Scripture and life's seasons. Like talking with a spiritual mentor. 🙏💙",
                 'analogies': "Harvest seasons, pruning for growth, still
 
-_build_conversation_context(...)
-
-_try_openai_response(...)
-
-_try_gemini_response(...)
-
-generate_prayer(...)
-
-explain_scripture(...)
-
-All fallback methods (like _try_openai_scripture, _try_gemini_prayer, etc.)
-
-
+    def _build_conversation_context(self, user_name=None, age_range=None, conversation_history=None,
+                                    conversation_id=None):
+        """System prompt for this user: base prompt, age personality, then as much
+        of the conversation as fits the token budget (older turns summarized)"""
+        personality = self.age_personalities.get(age_range) or self.age_personalities.get('adult', {})
+        sections = [self.base_system_prompt]
+        if personality:
+            sections.append(f"TONE: {personality.get('tone', '')}\nANALOGIES TO DRAW FROM: {personality.get('analogies', '')}")
+        if user_name:
+            sections.append(f"You're talking with {user_name}. Use their name naturally.")
+        
+        conversation_id = conversation_id or conversation_key(user_name, conversation_history)
+        return self.prompt_budgeter.build('\n\n'.join(sections), conversation_history, conversation_id)
+    
+    def get_response(self, user_message, user_name=None, age_range=None, conversation_history=None):
+        """A conversational reply from whichever provider answers first"""
+        system_prompt = self._build_conversation_context(user_name, age_range, conversation_history)
+        try:
+            return self._complete(system_prompt, [{'role': 'user', 'content': user_message}])
+        except ProviderUnavailableError as e:
+            logging.error(f"Failed to get response: {e}")
+            return f"I'm right here with you, {user_name or 'friend'}. I'm having trouble finding my words right now - could you say that again in a moment? 💙"
+    
+    def generate_prayer(self, prayer_request, user_name=None, age_range=None, conversation_history=None):
+        """A short, personal prayer for the request"""
+        try:
+            return self._prayer_completion(prayer_request, user_name, age_range, conversation_history)
+        except ProviderUnavailableError as e:
+            logging.error(f"Failed to generate prayer: {e}")
+            name = user_name or 'friend'
+            return f"Lord, I lift up {name} to You right now. You know what's on their heart better than words can say. Hold them close and give them Your peace. In Jesus' name, Amen. 🙏"
+    
+    def explain_scripture(self, scripture_request, user_name=None, age_range=None, conversation_history=None):
+        """What a verse or passage means, and what it means for them"""
+        try:
+            return self._scripture_completion(scripture_request, user_name, age_range, conversation_history)
+        except ProviderUnavailableError as e:
+            logging.error(f"Failed to explain scripture: {e}")
+            return f"I'd love to dig into that with you, {user_name or 'friend'}, but I'm having trouble right now. Could you ask me again in a moment? 📖"
+    
+    def _prayer_completion(self, prayer_request, user_name=None, age_range=None, conversation_history=None):
+        system_prompt = self._build_conversation_context(user_name, age_range, conversation_history)
+        messages = [{'role': 'user', 'content': (
+            f"Please pray for me about this: {prayer_request}\n\n"
+            "Reply with a short, heartfelt prayer of 3-5 sentences, personal to my situation, ending with Amen."
+        )}]
+        return self._complete(system_prompt, messages, max_tokens=300)
+    
+    def _scripture_completion(self, scripture_request, user_name=None, age_range=None, conversation_history=None):
+        system_prompt = self._build_conversation_context(user_name, age_range, conversation_history)
+        messages = [{'role': 'user', 'content': (
+            f"Can you explain this scripture to me: {scripture_request}\n\n"
+            "Share what it means in its context and how it speaks to my life today, like a friend would."
+        )}]
+        return self._complete(system_prompt, messages, max_tokens=600)
+    
+    # Identical prayer and scripture requests are answered from the response cache;
+    # failures raise past it, so the apology above is never cached.
+    # Bump the prompt version whenever the prompt behind a method changes.
+    _prayer_completion = cached_response('prayer', prompt_version='2')(_prayer_completion)
+    _scripture_completion = cached_response('scripture', prompt_version='2')(_scripture_completion)
+    # A request that only names or quotes a verse we hold never reaches a provider
+    explain_scripture = local_scripture_first()(explain_scripture)
+    
+    def _complete(self, system_prompt, messages, max_tokens=None, temperature=None):
+        """Full reply from whichever provider answers first: the dispatcher hedges a
+        slow provider, skips one whose circuit is open, coalesces identical calls
+        and keeps each provider under its rate limits"""
+        return self.dispatcher.complete(system_prompt, messages, max_tokens=max_tokens, temperature=temperature).text
+    
+    def stream_response(self, user_message, user_name=None, age_range=None, conversation_history=None):
+        """Stream a reply as it is generated.
+        
+        The provider race is decided by the first token; once text has
+        reached the user we stay with that provider.
+        """
+        system_prompt = self._build_conversation_context(user_name, age_range, conversation_history)
+        messages = [{'role': 'user', 'content': user_message}]
+        return self.dispatcher.stream(system_prompt, messages)
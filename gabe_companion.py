@@ -1,8 +1,19 @@
 import os
 import json
+import random
+import asyncio
 import logging
 from datetime import datetime
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+from async_runner import run_sync
+from crisis_detection import CrisisDetector
+from gabe_persona import BASE_SYSTEM_PROMPT
+from intent_router import get_intent_router
+from llm_providers import LegacyGeminiProvider, OpenAIProvider
+from prompt_budget import ConversationBudgeter
+from provider_dispatch import HedgedDispatcher, ProviderUnavailableError
+from session_store import SessionStore
+from voice_chunker import chunk_text
 try:
     import google.generativeai as genai
 except ImportError:
@@ -14,10 +25,22 @@ class GabeCompanion:
     like talking to a wise, caring friend who remembers your conversations and truly listens.
     """
     
+    # Turns kept per session when the caller doesn't pass its own history
+    MAX_REMEMBERED_TURNS = 50
+    
+    # Short prayers for the prayer interceptor; {name} is the person asking
+    short_prayers = [
+        "Father, I lift {name} up to You right now. You know every detail of what they're carrying. Wrap them in Your peace and remind them they are never alone. In Jesus' name, Amen. 🙏",
+        "Lord, be close to {name} today. Give them strength for what's in front of them and rest from what's behind them. Let them feel Your love in a real way. Amen. 💙",
+        "Jesus, thank You that You hear every prayer. Hold {name} and everything on their heart. Bring comfort, bring hope, and make a way where there seems to be none. Amen. 🙏",
+        "God, You are our refuge and strength. Cover {name} with Your protection and fill their heart with a peace that goes beyond understanding. In Jesus' name, Amen. 💙",
+    ]
+    
     def __init__(self):
         # Initialize Gemini as primary
         self.gemini_client = None
         self.openai_client = None
+        self.openai_async_client = None
         
         gemini_key = os.environ.get("GEMINI_API_KEY")
         if gemini_key and genai and hasattr(genai, 'configure'):
@@ -41,6 +64,7 @@ class GabeCompanion:
         if openai_key:
             try:
                 self.openai_client = OpenAI(api_key=openai_key)
+                self.openai_async_client = AsyncOpenAI(api_key=openai_key)
                 # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
                 self.openai_model = "gpt-4o"
                 logging.info("OpenAI client initialized successfully (FALLBACK)")
@@ -50,17 +74,33 @@ class GabeCompanion:
         if not self.gemini_client and not self.openai_client:
             logging.warning("No AI provider available - conversations will use fallback responses")
         
+        # Gemini first, OpenAI as the hedge; slow or failing providers are routed around
+        self.providers = []
+        if self.gemini_client:
+            self.providers.append(LegacyGeminiProvider(self.gemini_model))
+        if self.openai_client:
+            self.providers.append(OpenAIProvider(self.openai_client, self.openai_model, self.openai_async_client))
+        self.dispatcher = HedgedDispatcher(self.providers, name='companion')
+        self.crisis_detector = CrisisDetector()
+        # Prayer, story, voice and crisis triggers compiled once, scanned once per message
+        self.intent_router = get_intent_router()
+        self.prompt_budgeter = ConversationBudgeter()
+        
+        # All per-session state lives in one bounded store (TTL + LRU, optionally
+        # shared through SQLite); these views keep the familiar dict access
+        self.sessions = SessionStore.from_env()
+        
         # Dynamic conversation memory
-        self.conversation_memory = {}
-        self.user_insights = {}
+        self.conversation_memory = self.sessions.view('conversation')
+        self.user_insights = self.sessions.view('insights')
         
         # Enhanced conversation state management (inspired by JavaScript flow)
-        self.conversation_states = {}
-        self.voice_mode_enabled = {}  # Track voice mode per session
-        self.chunked_conversations = {}  # Track multi-part conversations
+        self.conversation_states = self.sessions.view('state')
+        self.voice_mode_enabled = self.sessions.view('voice_mode')  # Track voice mode per session
+        self.chunked_conversations = self.sessions.view('chunks')  # Track multi-part conversations
         
         # Story continuation system
-        self.story_contexts = {}  # Track ongoing stories per session
+        self.story_contexts = self.sessions.view('story')  # Track ongoing stories per session
         },
         'david_goliath': {
             'parts': [
@@ -84,16 +124,27 @@ class GabeCompanion:
     
     def is_story_request(self, user_message):
         """Check if user is asking for a Bible story"""
-        story_keywords = [
-            'story', 'tell me a story', 'bible story', 'share a story',
-            'david and goliath', 'moses', 'daniel', 'noah', 'jesus',
-            'parable', 'tell me about', 'biblical story'
-        ]
-        return any(keyword in user_message.lower() for keyword in story_keywords)
+        return self.intent_router.first(user_message, 'story') is not None
+    
+    def get_response(self, user_message, user_name=None, age_range=None, conversation_history=None, session_id=None,
+                     is_disconnected=None, timeout=None):
+        """
+        Get a naturally conversational response that feels personal and intuitive.
+        Runs get_response_async on the shared event loop for sync callers; pass
+        is_disconnected to stop the provider call once the client is gone
+        (asyncio.CancelledError is raised in that case).
+        """
+        return run_sync(
+            self.get_response_async(user_message, user_name, age_range, conversation_history, session_id),
+            timeout=timeout,
+            is_cancelled=is_disconnected
+        )
     
-    def get_response(self, user_message, user_name=None, age_range=None, conversation_history=None, session_id=None):
+    async def get_response_async(self, user_message, user_name=None, age_range=None, conversation_history=None, session_id=None):
         """
-        Get a naturally conversational response that feels personal and intuitive
+        Get a naturally conversational response that feels personal and intuitive.
+        Provider I/O is awaited, so one worker carries many conversations, and
+        cancelling the task (client gone) cancels the provider call too.
         """
         try:
             # PRAYER INTERCEPTOR: Handle prayer requests immediately with short prayers
@@ -102,11 +153,81 @@ class GabeCompanion:
             
             logging.info(f"INTERCEPTOR: Checking message: '{user_msg_lower}'")
             
+            # One scan finds every intent; deterministic ones never wait on a provider
+            intents = self._route(user_message)
+            
             # If it's a direct prayer request, return short prayer immediately
-            prayer_triggers = ['pray for', 'say a prayer', 'please pray', 'pray that', 'father help', 'lord help', 'jesus help', 'pray with me', 'can you pray']
-            triggered = any(trigger in user_msg_lower for trigger in prayer_triggers)
+            triggered = 'prayer' in intents
             
             logging.info(f"INTERCEPTOR: Prayer triggers found: {triggered}")
+            
+            if 'crisis' in intents:
+                reply = self.crisis_detector.check_for_crisis(user_message)
+                if reply:
+                    self._remember_turn(session_id, user_message, reply, conversation_history)
+                    return reply
+            
+            # Only a message that is nothing but a voice command comes back as one
+            voice = intents.get('voice')
+            if voice and session_id:
+                enabled = self.toggle_voice_mode(session_id, voice.key == 'on')
+                return f"Voice mode is {'on' if enabled else 'off'}, {name}. I'm right here. 💙"
+            
+            insights = self._update_insights(session_id, user_name, age_range, intents)
+            
+            # "Go on" while a story is being told is the story's next part;
+            # without one it's an ordinary message
+            if 'continue' in intents and session_id:
+                context = self.story_contexts.get(session_id)
+                if context and context.get('story') in self.bible_stories:
+                    reply = self._tell_story(session_id, context['story'])
+                    self._remember_turn(session_id, user_message, reply, conversation_history)
+                    return reply
+            
+            if triggered:
+                reply = self._short_prayer(session_id, name)
+                self._remember_turn(session_id, user_message, reply, conversation_history)
+                return reply
+            
+            # STORY INTERCEPTOR: named stories are told from bible_stories, one part
+            # at a time; only a general story request ('any') goes to the provider
+            story = intents.get('story')
+            if story and story.key in self.bible_stories:
+                reply = self._tell_story(session_id, story.key)
+                self._remember_turn(session_id, user_message, reply, conversation_history)
+                return reply
+            
+            history = conversation_history if conversation_history is not None else self.conversation_memory.get(session_id, [])
+            sections = [BASE_SYSTEM_PROMPT]
+            age = age_range or insights.get('age_range')
+            if age:
+                sections.append(f"They are in the {age.replace('_', ' ')} age range; match their way of talking.")
+            sections.append(f"You're talking with {name}. Use their name naturally.")
+            notes = self._insight_notes(insights)
+            if notes:
+                sections.append("WHAT YOU KNOW ABOUT THEM:\n" + '\n'.join(f"- {note}" for note in notes))
+            if story:
+                sections.append(f"They asked for a Bible story ('{story.text}'): tell it in a few short, vivid sentences and connect it to their life.")
+            system_prompt = self.prompt_budgeter.build('\n\n'.join(sections), history, session_id)
+            
+            try:
+                completion = await self.dispatcher.acomplete(system_prompt, [{'role': 'user', 'content': user_message}])
+                reply = completion.text.strip()
+            except ProviderUnavailableError as e:
+                logging.error(f"No provider answered for session {session_id}: {e}")
+                return f"I'm right here with you, {name}. I'm having trouble finding my words right now - could you say that again in a moment? 💙"
+            
+            if not reply:
+                return f"I'm listening, {name}. Tell me a little more? 💙"
+            
+            self._remember_turn(session_id, user_message, reply, conversation_history)
+            return reply
+            
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Companion response failed for session {session_id}: {e}")
+            return f"I'm right here with you, {user_name or 'friend'}. Could you tell me that again? 💙"
         # Filter out recently used responses
         available_prompts = [prompt for prompt in gentle_prompts 
                            if not any(prompt in recent for recent in recent_auto_responses)]
@@ -135,30 +256,86 @@ class GabeCompanion:
         if not full_text or len(full_text) <= max_chars:
             return [full_text] if full_text else []
         
-        # Split by sentences first
-        import re
-        sentences = re.split(r'[.!?]+', full_text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
-        chunks = []
-        current_chunk = ''
-        
-        for sentence in sentences:
-            if sentence and not sentence[-1] in '.!?':
-                sentence += '.'
-            
-            test_chunk = current_chunk + ' ' + sentence if current_chunk else sentence
-            
-            if len(test_chunk) <= max_chars:
-                current_chunk = test_chunk
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
+        # Sentence packing that keeps the original punctuation and doesn't
+        # split on abbreviations or verse references like "1 Cor. 13:4"
+        chunks = chunk_text(full_text, max_chars)
         return chunks if chunks else [full_text]
-
-
+    
+    def is_prayer_request(self, user_message):
+        """Check if user is asking GABE to pray"""
+        return self.intent_router.first(user_message, 'prayer') is not None
+    
+    def _route(self, user_message):
+        """Intent name -> match for one message; a named story beats a general story request"""
+        intents = {}
+        for match in self.intent_router.route(user_message):
+            if match.intent not in intents or intents[match.intent].key == 'any':
+                intents[match.intent] = match
+        return intents
+    
+    def _short_prayer(self, session_id, name):
+        """A short prayer for the prayer interceptor, not the one this session heard last"""
+        choices = list(range(len(self.short_prayers)))
+        state = dict(self.conversation_states.get(session_id) or {}) if session_id else {}
+        if len(choices) > 1 and state.get('last_prayer') in choices:
+            choices.remove(state['last_prayer'])
+        choice = random.choice(choices)
+        if session_id:
+            state['last_prayer'] = choice
+            self.conversation_states[session_id] = state
+        return self.short_prayers[choice].format(name=name)
+    
+    def _tell_story(self, session_id, story_key):
+        """The next part of a Bible story; story_contexts remembers where the session is"""
+        story = self.bible_stories[story_key]
+        context = self.story_contexts.get(session_id) if session_id else None
+        part = context['part'] + 1 if context and context.get('story') == story_key else 0
+        part = min(part, len(story['parts']) - 1)
+        if session_id:
+            if part < len(story['parts']) - 1:
+                self.story_contexts[session_id] = {'story': story_key, 'name': story['name'], 'part': part}
+            else:
+                self.story_contexts.pop(session_id, None)
+            if part == 0:
+                insights = dict(self.user_insights.get(session_id) or {})
+                heard = insights.setdefault('stories_heard', [])
+                if story['name'] not in heard:
+                    heard.append(story['name'])
+                    self.user_insights[session_id] = insights
+        return story['parts'][part]
+    
+    def _update_insights(self, session_id, user_name, age_range, intents):
+        """Record what this message says about the person; returns their insights"""
+        if not session_id:
+            return {}
+        insights = dict(self.user_insights.get(session_id) or {})
+        if user_name:
+            insights['name'] = user_name
+        if age_range:
+            insights['age_range'] = age_range
+        insights['messages'] = insights.get('messages', 0) + 1
+        if 'prayer' in intents:
+            insights['prayer_requests'] = insights.get('prayer_requests', 0) + 1
+        insights['last_seen'] = datetime.now().isoformat()
+        self.user_insights[session_id] = insights
+        return insights
+    
+    def _insight_notes(self, insights):
+        notes = []
+        if insights.get('prayer_requests'):
+            times = insights['prayer_requests']
+            notes.append(f"They've asked for prayer {times} time{'s' if times != 1 else ''} in this conversation.")
+        if insights.get('stories_heard'):
+            notes.append(f"You've already told them: {', '.join(insights['stories_heard'])}.")
+        if insights.get('messages', 0) > 1:
+            notes.append("You're already in a conversation; don't greet them again.")
+        return notes
+    
+    def _remember_turn(self, session_id, user_message, reply, conversation_history=None):
+        # A caller that passes its own history keeps it itself
+        if not session_id or conversation_history is not None:
+            return
+        turns = self.conversation_memory.get(session_id) or []
+        turns.append({'user': user_message, 'gabe': reply, 'timestamp': datetime.now().isoformat()})
+        del turns[:-self.MAX_REMEMBERED_TURNS]
+        self.conversation_memory[session_id] = turns
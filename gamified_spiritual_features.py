@@ -8,8 +8,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import random
 
-# Global session storage for user data
-SESSION_STORAGE = {}
+from progress_store import UserProgress, get_progress_store
+from scripture_store import get_scripture_store
 
 class GamifiedSpiritualFeatures:
     def __init__(self):
@@ -37,67 +37,37 @@ class GamifiedSpiritualFeatures:
             'Emotional Resilience': {'description': 'Completed mood missions for 3 different emotions', 'requirement': 'mood_variety_3'}
         }
         
-        # Morning & Evening Devotions
-        self.devotions = {
-            'morning': {
-                'title': '🌅 MORNING DEVOTION: "Start with Stillness"',
-                'greeting': 'Good morning, {name}. Time to pray and start your day with God.',
-                'verse_reference': 'Psalm 46:10',
-                'verse_text': 'Be still, and know that I am God.',
-                'word': 'Before the day demands your attention, God invites you to stillness — not silence, but surrender. In the quiet, He strengthens you. You don\'t need to rush — you need to rest in Him first.',
-                'application': 'Take 3 deep breaths and whisper, "God, I trust You today." That moment of peace can shape your entire day.',
-                'prayer': 'Heavenly Father, Thank You for the gift of today. As I step into the hours ahead, I choose stillness before You. Quiet my heart from anxiety and noise. Help me walk with peace, speak with kindness, and act with purpose. Let my choices reflect Your wisdom and my heart reflect Your love. Be with me in every moment, and lead me where You want me to go. In Jesus\' name, Amen.',
-                'closing': '📖 GABE is always by your side — you are never alone.'
-            },
-
-        'evening': {
-                'title': '🌙 EVENING DEVOTION: "Lay It Down"',
-                'greeting': 'Good evening, {name}. You\'ve made it through the day. Let\'s pause, reflect, and pray together.',
-                'verse_reference': '1 Peter 5:7',
-                'verse_text': 'Cast all your anxiety on Him because He cares for you.',
-                'word': 'You weren\'t meant to carry it all. God sees the pressure, the thoughts, the unspoken worries — and He\'s asking you to hand them over. Lay it down tonight. Rest in Him, not just sleep.',
-                'application': 'Think of one thing that\'s weighing on your heart. Whisper it to God. Then say, "I release it to You." That\'s how peace begins.',
-                'prayer': 'Lord, Thank You for walking with me today — through the joys, the stress, the quiet moments, and the mess. As night falls, I place my thoughts, my worries, and my plans in Your hands. Refresh my body, renew my mind, and fill my heart with peace. Watch over me and those I love. In Jesus\' name, Amen.',
-                'closing': '💬 GABE is always by your side — you are never alone.'
-            }
-        }
-        
-        # Prayer challenges bank
-        self.prayer_challenges = [
-            'Pray for someone who has hurt you and ask God to heal their heart',
-            'Write a prayer of gratitude for three specific things from this week',
-            'Pray for a world leader or someone in authority',
-            'Ask God to show you how to serve someone in need today',
-            'Pray for wisdom in a decision you\'re facing',
-            'Thank God for His faithfulness in a difficult season of your life',
-            'Pray for peace in a conflict situation you know about',
-            'Ask God to help you forgive yourself for something you regret'
-        ]
+        # Devotions, prayer challenges and Bible studies come from the shared
+        # content store instead of being rebuilt for every instance
+        content = get_scripture_store()
+        self.devotions = content.devotions
+        self.prayer_challenges = content.prayer_challenges
+        self.bible_studies = content.bible_studies
         
-        # Interactive Bible Studies
-        self.bible_studies = {
-            'trusting_god': {
-                'id': 'trusting_god',
-                'title': 'Trusting God in Difficult Times',
-                'description': 'Learn to trust God\'s goodness when life feels uncertain',
-                'sessions': 3,
-                'duration': '10-15 min each',
-                'xp_reward': 5,
-                'sessions_data': [
-                    {
-                        'session_number': 1,
-                        'title': 'God\'s Faithfulness in the Past',
-                        'scripture_reference': 'Psalm 77:11-12',
-                        'scripture_text': 'I will remember the deeds of the Lord; yes, I will remember your miracles of long ago. I will consider all your works and meditate on all your mighty deeds.',
-                        'questions': [
-                            'When have you seen God\'s faithfulness in your life before?',
-                            'How can remembering God\'s past goodness help you trust Him today?',
-                            'What "mighty deeds" of God do you want to remember more often?'
-                        ],
-                        'xp_reward': 4
+        # XP, badges, streaks and adventure progress, shared by every instance
+        # and persisted when PROGRESS_STORE_PATH is set
+        self.progress = get_progress_store()
+
+    def get_user_data(self, session_id: str) -> UserProgress:
+        """The user's live progress record. After changing it in place call
+        self.progress.save(session_id), or make the change with
+        self.progress.update(), so it goes out with the next flush"""
+        return self.progress.get(session_id)
+
+    def add_xp(self, session_id: str, amount: int) -> Dict:
+        """Award XP for one action and move the user up a level once they pass its threshold"""
+        xp = self.progress.increment(session_id, 'xp', amount)
+        self.progress.increment(session_id, 'total_actions')
+        level = max((name for name, threshold in self.level_thresholds.items() if xp >= threshold),
+                    key=self.level_thresholds.get)
+        leveled_up = level != self.progress.get(session_id).level
+        if leveled_up:
+            self.progress.update(session_id, lambda user_data: setattr(user_data, 'level', level))
+        return {'xp': xp, 'level': level, 'leveled_up': leveled_up}
+
     def get_user_progress(self, session_id: str) -> Dict:
         """Get complete user progress overview"""
-        user_data = self.get_user_data(session_id)
+        user_data = self.progress.get(session_id)
         
         # Calculate next level progress
         current_level = user_data['level']
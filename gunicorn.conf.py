@@ -0,0 +1,13 @@
+"""
+Gunicorn settings for GABE
+Per-worker startup runs after the fork, so it is safe with --preload
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+
+def post_worker_init(worker):
+    from main import start_worker
+    start_worker()
@@ -0,0 +1,175 @@
+"""
+Intent router for GabeCompanion
+Scans a message once against every interceptor's phrases (prayer, story)
+plus the crisis lexicon and reports each intent with where it matched.
+Voice on/off and "go on" with a story are commands: they count only when
+they are the whole message.
+"""
+
+import re
+import threading
+from typing import Dict, List, Optional
+
+from crisis_detection import CrisisDetector, _trie_pattern
+
+# intent -> key -> trigger phrases. Matching is on the lowercased message, as
+# a substring, the same way the original `any(trigger in msg)` checks worked.
+DEFAULT_INTENTS = {
+    'prayer': {
+        'prayer': ['pray for', 'say a prayer', 'please pray', 'pray that', 'father help', 'lord help',
+                   'jesus help', 'pray with me', 'can you pray'],
+    },
+    'story': {
+        'david_goliath': ['david and goliath'],
+        'red_sea': ['moses'],
+        # General story requests that don't name a specific story
+        'any': ['story', 'tell me a story', 'bible story', 'share a story', 'daniel', 'noah', 'jesus',
+                'parable', 'tell me about', 'biblical story'],
+    },
+}
+
+# intent -> key -> command phrases. A command matches only when the message is
+# nothing but command phrases and COMMAND_FILLER words, so "Lord, please speak
+# to me tonight" is an ordinary message and gets an ordinary answer.
+DEFAULT_COMMANDS = {
+    'voice': {
+        'on': ['voice mode on', 'turn on voice', 'enable voice', 'read it out loud', 'read it aloud', 'speak to me'],
+        'off': ['voice mode off', 'turn off voice', 'disable voice', 'stop talking', 'text only'],
+    },
+    # Asks for the next part of the story in progress, if there is one
+    'continue': {
+        'story': ['continue', 'go on', 'keep going', 'tell me more', 'what happened next', 'what happens next',
+                  'and then', 'more', 'yes'],
+    },
+}
+COMMAND_FILLER = ['please', 'now', 'thanks', 'thank you', 'ok', 'okay', 'gabe', 'hey']
+
+
+class IntentMatch:
+    """One matched intent and the span of the message that triggered it"""
+    __slots__ = ('intent', 'key', 'start', 'end', 'text')
+
+    def __init__(self, intent: str, key: Optional[str], start: Optional[int], end: Optional[int], text: str = ''):
+        self.intent = intent
+        self.key = key
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def __repr__(self):
+        return f"IntentMatch({self.intent!r}, {self.key!r}, {self.start}, {self.end}, {self.text!r})"
+
+
+class IntentRouter:
+    """All interceptor phrases compiled into one scanner at startup.
+
+    route() returns every intent that matched, at most one match per
+    (intent, key): crisis first, then in the order found in the message.
+    A command intent (voice, continue) is returned alone, and only when the
+    message is just that command.
+    Crisis is judged by the shared CrisisDetector so lexicon updates still
+    apply.
+    """
+
+    def __init__(self, intents: Optional[Dict[str, Dict[str, List[str]]]] = None,
+                 crisis_detector: Optional[CrisisDetector] = None,
+                 commands: Optional[Dict[str, Dict[str, List[str]]]] = None):
+        self.intents = intents or DEFAULT_INTENTS
+        self.commands = DEFAULT_COMMANDS if commands is None else commands
+        self.crisis_detector = crisis_detector or CrisisDetector()
+
+        phrase_keys = {}
+        for intent, keys in self.intents.items():
+            for key, phrases in keys.items():
+                for phrase in phrases:
+                    phrase_keys.setdefault(phrase.lower(), []).append((intent, key))
+        self._scanner = re.compile(_trie_pattern(phrase_keys))
+        # The scanner returns the longest phrase at an offset; every other
+        # phrase matching there is a prefix of it ('jesus' of 'jesus help'),
+        # so precompute the (intent, key, length) each match implies
+        self._implied = {
+            phrase: [(intent, key, len(other)) for other, intent_keys in phrase_keys.items()
+                     if phrase.startswith(other) for intent, key in intent_keys]
+            for phrase in phrase_keys
+        }
+        self._key_count = sum(len(keys) for keys in self.intents.values())
+
+        self._command_keys = {phrase.lower(): (intent, key) for intent, keys in self.commands.items()
+                              for key, phrases in keys.items() for phrase in phrases}
+        self._command_phrase = re.compile(rf"\b({_trie_pattern(self._command_keys)})\b") if self._command_keys else None
+        words = _trie_pattern(list(self._command_keys) + COMMAND_FILLER)
+        self._command_only = re.compile(rf"\W*(?:(?:{words})\b\W*)+")
+
+    def route(self, message: str, crisis: bool = True) -> List[IntentMatch]:
+        command = self.command(message)
+        if command is not None:
+            return [command]
+        message_lower = message.lower()
+        matches = []
+        found = set()
+        pos = 0
+        while len(found) < self._key_count:
+            candidate = self._scanner.search(message_lower, pos)
+            if not candidate:
+                break
+            start = candidate.start()
+            for intent, key, length in self._implied[candidate.group()]:
+                if (intent, key) not in found:
+                    found.add((intent, key))
+                    matches.append(IntentMatch(intent, key, start, start + length, message[start:start + length]))
+            # Step one character, not past the match: another intent's phrase
+            # may start inside this one
+            pos = start + 1
+
+        crisis_match = self.crisis_match(message) if crisis else None
+        if crisis_match is not None:
+            matches.insert(0, crisis_match)
+        return matches
+
+    def crisis_match(self, message: str) -> Optional[IntentMatch]:
+        """Crisis intent with the same verdict as CrisisDetector.check_for_crisis"""
+        matcher = self.crisis_detector.matcher
+        hits = matcher.scan(message)
+        if 'positive' in hits:
+            return None
+        for category in ('high', 'severe'):
+            if category in hits:
+                span = matcher.span(message, category)
+                start, end = span if span else (None, None)
+                return IntentMatch('crisis', category, start, end, message[start:end] if span else '')
+        return None
+
+    def command(self, message: str) -> Optional[IntentMatch]:
+        """The command the message consists of, or None; with several
+        ('turn off voice, text only') the last one wins"""
+        if self._command_phrase is None or len(message) > 80:
+            return None
+        message_lower = message.lower()
+        if not self._command_only.fullmatch(message_lower):
+            return None
+        command = None
+        for found in self._command_phrase.finditer(message_lower):
+            intent, key = self._command_keys[found.group(1)]
+            command = IntentMatch(intent, key, found.start(1), found.end(1), message[found.start(1):found.end(1)])
+        return command
+
+    def first(self, message: str, intent: str) -> Optional[IntentMatch]:
+        """First match for one non-crisis intent"""
+        for match in self.route(message, crisis=False):
+            if match.intent == intent:
+                return match
+        return None
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_intent_router() -> IntentRouter:
+    """Process-wide router, compiled once"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = IntentRouter()
+    return _router
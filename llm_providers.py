@@ -0,0 +1,343 @@
+"""
+LLM provider wrappers for GABE
+Gives OpenAI and both Gemini SDKs the same complete/stream interface so the
+chat pipeline can switch providers without caring which one answers
+"""
+
+import time
+import asyncio
+import logging
+from typing import Dict, Iterator, List, Optional
+
+import metrics
+
+try:
+    from google.genai import types as genai_types
+except ImportError:
+    genai_types = None
+
+
+class Completion:
+    """A finished provider answer with its token usage"""
+    __slots__ = ('text', 'provider', 'prompt_tokens', 'completion_tokens', 'latency_ms')
+
+    def __init__(self, text: str, provider: str, prompt_tokens: Optional[int] = None,
+                 completion_tokens: Optional[int] = None, latency_ms: Optional[float] = None):
+        self.text = text
+        self.provider = provider
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.latency_ms = latency_ms
+
+
+class TokenStream:
+    """Iterates text chunks from a provider and records time to first token and total time"""
+
+    def __init__(self, provider: str, chunks: Iterator[str], started: Optional[float] = None):
+        self.provider = provider
+        self._chunks = chunks
+        self._iterator = None
+        self._buffered = []
+        self.started = started if started is not None else time.monotonic()
+        self.first_token_at = None
+        self.finished_at = None
+        self.parts = []
+        # Filled in by providers that report usage at the end of a stream
+        self.prompt_tokens = None
+        self.completion_tokens = None
+
+    def _iter_chunks(self) -> Iterator[str]:
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            if self.first_token_at is None:
+                self.first_token_at = time.monotonic()
+            self.parts.append(chunk)
+            yield chunk
+
+    def prime(self) -> 'TokenStream':
+        """Wait for the first chunk, so a failing provider raises here rather
+        than after the caller has committed to this stream"""
+        self._iterator = self._iter_chunks()
+        first = next(self._iterator, None)
+        if first is not None:
+            self._buffered.append(first)
+        return self
+
+    def __iter__(self) -> Iterator[str]:
+        if self._iterator is None:
+            self._iterator = self._iter_chunks()
+        try:
+            while self._buffered:
+                yield self._buffered.pop(0)
+            yield from self._iterator
+        finally:
+            self.finished_at = time.monotonic()
+            metrics.LLM_STREAM_TOTAL.observe(self.finished_at - self.started, provider=self.provider)
+            metrics.record_usage(self.provider, self.prompt_tokens, self.completion_tokens)
+            logging.info(f"{self.provider} stream: first token {self.ttft_ms} ms, total {self.total_ms} ms")
+
+    def close(self):
+        """Stop the underlying provider stream, e.g. when the client disconnects"""
+        for iterator in (self._iterator, self._chunks):
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.parts)
+
+    @property
+    def ttft_ms(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return round((self.first_token_at - self.started) * 1000, 1)
+
+    @property
+    def total_ms(self) -> Optional[float]:
+        if self.finished_at is None:
+            return None
+        return round((self.finished_at - self.started) * 1000, 1)
+
+
+class LLMProvider:
+    """Common interface: messages are [{'role': 'user'|'assistant', 'content': str}, ...]"""
+
+    name = 'provider'
+
+    def complete(self, system_prompt: str, messages: List[Dict], max_tokens: Optional[int] = None,
+                 temperature: Optional[float] = None) -> Completion:
+        raise NotImplementedError
+
+    def stream(self, system_prompt: str, messages: List[Dict], max_tokens: Optional[int] = None,
+               temperature: Optional[float] = None) -> TokenStream:
+        raise NotImplementedError
+
+    async def acomplete(self, system_prompt: str, messages: List[Dict], max_tokens: Optional[int] = None,
+                        temperature: Optional[float] = None) -> Completion:
+        """Async complete; providers without a native async client run the sync call in a thread"""
+        return await asyncio.to_thread(self.complete, system_prompt, messages, max_tokens, temperature)
+
+
+class OpenAIProvider(LLMProvider):
+    name = 'openai'
+
+    def __init__(self, client, model: str = 'gpt-4o', async_client=None):
+        self.client = client
+        self.model = model
+        # AsyncOpenAI, so cancelling a request closes its HTTP call
+        self.async_client = async_client
+
+    def _messages(self, system_prompt: str, messages: List[Dict]) -> List[Dict]:
+        return [{'role': 'system', 'content': system_prompt}] + [
+            {'role': message['role'], 'content': message['content']} for message in messages
+        ]
+
+    def _options(self, max_tokens, temperature) -> Dict:
+        options = {}
+        if max_tokens is not None:
+            options['max_tokens'] = max_tokens
+        if temperature is not None:
+            options['temperature'] = temperature
+        return options
+
+    def complete(self, system_prompt, messages, max_tokens=None, temperature=None) -> Completion:
+        started = time.monotonic()
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(system_prompt, messages),
+            **self._options(max_tokens, temperature)
+        )
+        usage = getattr(response, 'usage', None)
+        return Completion(
+            response.choices[0].message.content or '',
+            self.name,
+            prompt_tokens=getattr(usage, 'prompt_tokens', None),
+            completion_tokens=getattr(usage, 'completion_tokens', None),
+            latency_ms=round((time.monotonic() - started) * 1000, 1)
+        )
+
+    async def acomplete(self, system_prompt, messages, max_tokens=None, temperature=None) -> Completion:
+        if self.async_client is None:
+            return await super().acomplete(system_prompt, messages, max_tokens, temperature)
+        started = time.monotonic()
+        response = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(system_prompt, messages),
+            **self._options(max_tokens, temperature)
+        )
+        usage = getattr(response, 'usage', None)
+        return Completion(
+            response.choices[0].message.content or '',
+            self.name,
+            prompt_tokens=getattr(usage, 'prompt_tokens', None),
+            completion_tokens=getattr(usage, 'completion_tokens', None),
+            latency_ms=round((time.monotonic() - started) * 1000, 1)
+        )
+
+    def stream(self, system_prompt, messages, max_tokens=None, temperature=None) -> TokenStream:
+        started = time.monotonic()
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(system_prompt, messages),
+            stream=True,
+            stream_options={'include_usage': True},
+            **self._options(max_tokens, temperature)
+        )
+        stream = TokenStream(self.name, None, started)
+
+        def chunks():
+            try:
+                for chunk in response:
+                    # The final chunk carries usage and no choices
+                    if getattr(chunk, 'usage', None):
+                        stream.prompt_tokens = chunk.usage.prompt_tokens
+                        stream.completion_tokens = chunk.usage.completion_tokens
+                    if chunk.choices:
+                        yield chunk.choices[0].delta.content or ''
+            finally:
+                close = getattr(response, 'close', None)
+                if close:
+                    close()
+
+        stream._chunks = chunks()
+        return stream
+
+
+class GeminiProvider(LLMProvider):
+    """Gemini through the google-genai client (genai.Client)"""
+
+    name = 'gemini'
+
+    def __init__(self, client, model: str = 'gemini-2.5-flash'):
+        self.client = client
+        self.model = model
+
+    def _contents(self, messages: List[Dict]) -> List[Dict]:
+        return [{'role': 'model' if message['role'] == 'assistant' else 'user',
+                 'parts': [{'text': message['content']}]} for message in messages]
+
+    def _config(self, system_prompt, max_tokens, temperature):
+        options = {'system_instruction': system_prompt}
+        if max_tokens is not None:
+            options['max_output_tokens'] = max_tokens
+        if temperature is not None:
+            options['temperature'] = temperature
+        return genai_types.GenerateContentConfig(**options) if genai_types else options
+
+    def complete(self, system_prompt, messages, max_tokens=None, temperature=None) -> Completion:
+        started = time.monotonic()
+        response = self.client.models.generate_content(
+            model=self.model,
+            contents=self._contents(messages),
+            config=self._config(system_prompt, max_tokens, temperature)
+        )
+        usage = getattr(response, 'usage_metadata', None)
+        return Completion(
+            response.text or '',
+            self.name,
+            prompt_tokens=getattr(usage, 'prompt_token_count', None),
+            completion_tokens=getattr(usage, 'candidates_token_count', None),
+            latency_ms=round((time.monotonic() - started) * 1000, 1)
+        )
+
+    async def acomplete(self, system_prompt, messages, max_tokens=None, temperature=None) -> Completion:
+        started = time.monotonic()
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=self._contents(messages),
+            config=self._config(system_prompt, max_tokens, temperature)
+        )
+        usage = getattr(response, 'usage_metadata', None)
+        return Completion(
+            response.text or '',
+            self.name,
+            prompt_tokens=getattr(usage, 'prompt_token_count', None),
+            completion_tokens=getattr(usage, 'candidates_token_count', None),
+            latency_ms=round((time.monotonic() - started) * 1000, 1)
+        )
+
+    def stream(self, system_prompt, messages, max_tokens=None, temperature=None) -> TokenStream:
+        started = time.monotonic()
+        response = self.client.models.generate_content_stream(
+            model=self.model,
+            contents=self._contents(messages),
+            config=self._config(system_prompt, max_tokens, temperature)
+        )
+        stream = TokenStream(self.name, None, started)
+
+        def chunks():
+            for chunk in response:
+                usage = getattr(chunk, 'usage_metadata', None)
+                if usage is not None:
+                    stream.prompt_tokens = getattr(usage, 'prompt_token_count', None)
+                    stream.completion_tokens = getattr(usage, 'candidates_token_count', None)
+                yield chunk.text or ''
+
+        stream._chunks = chunks()
+        return stream
+
+
+class LegacyGeminiProvider(LLMProvider):
+    """Gemini through google.generativeai's GenerativeModel"""
+
+    name = 'gemini'
+
+    def __init__(self, model):
+        self.model = model
+
+    def _contents(self, system_prompt: str, messages: List[Dict]) -> List[Dict]:
+        # The model object is created without a system instruction, so the
+        # prompt goes first in the conversation
+        contents = [{'role': 'user', 'parts': [system_prompt]}] if system_prompt else []
+        contents += [{'role': 'model' if message['role'] == 'assistant' else 'user',
+                      'parts': [message['content']]} for message in messages]
+        return contents
+
+    def _config(self, max_tokens, temperature) -> Dict:
+        config = {}
+        if max_tokens is not None:
+            config['max_output_tokens'] = max_tokens
+        if temperature is not None:
+            config['temperature'] = temperature
+        return config
+
+    def complete(self, system_prompt, messages, max_tokens=None, temperature=None) -> Completion:
+        started = time.monotonic()
+        response = self.model.generate_content(
+            self._contents(system_prompt, messages),
+            generation_config=self._config(max_tokens, temperature)
+        )
+        usage = getattr(response, 'usage_metadata', None)
+        return Completion(
+            response.text or '',
+            self.name,
+            prompt_tokens=getattr(usage, 'prompt_token_count', None),
+            completion_tokens=getattr(usage, 'candidates_token_count', None),
+            latency_ms=round((time.monotonic() - started) * 1000, 1)
+        )
+
+    async def acomplete(self, system_prompt, messages, max_tokens=None, temperature=None) -> Completion:
+        started = time.monotonic()
+        response = await self.model.generate_content_async(
+            self._contents(system_prompt, messages),
+            generation_config=self._config(max_tokens, temperature)
+        )
+        usage = getattr(response, 'usage_metadata', None)
+        return Completion(
+            response.text or '',
+            self.name,
+            prompt_tokens=getattr(usage, 'prompt_token_count', None),
+            completion_tokens=getattr(usage, 'candidates_token_count', None),
+            latency_ms=round((time.monotonic() - started) * 1000, 1)
+        )
+
+    def stream(self, system_prompt, messages, max_tokens=None, temperature=None) -> TokenStream:
+        started = time.monotonic()
+        response = self.model.generate_content(
+            self._contents(system_prompt, messages),
+            generation_config=self._config(max_tokens, temperature),
+            stream=True
+        )
+        return TokenStream(self.name, (chunk.text or '' for chunk in response), started)
@@ -0,0 +1,391 @@
+"""
+Local Firestore stand-in for GABE
+Implements the slice of the Firestore client API that FirebaseService uses,
+backed by memory or a SQLite file, with injectable latency and errors so the
+memory paths can be load-tested and benchmarked without network access
+
+Select it with FIRESTORE_BACKEND=memory or FIRESTORE_BACKEND=sqlite:/path/to/file.db
+"""
+
+import os
+import copy
+import json
+import time
+import uuid
+import random
+import sqlite3
+import logging
+import functools
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+
+class LocalFirestoreError(Exception):
+    """Injected failure, standing in for a transient Firestore error"""
+
+
+class FaultInjector:
+    """Adds latency and random failures to every simulated round trip"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.round_trips = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls) -> 'FaultInjector':
+        return cls(
+            latency=float(os.environ.get('FIRESTORE_LOCAL_LATENCY_MS', '0')) / 1000,
+            jitter=float(os.environ.get('FIRESTORE_LOCAL_JITTER_MS', '0')) / 1000,
+            error_rate=float(os.environ.get('FIRESTORE_LOCAL_ERROR_RATE', '0'))
+        )
+
+    def round_trip(self, operation: str):
+        self.round_trips += 1
+        delay = self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            raise LocalFirestoreError(f"Injected failure during {operation}")
+
+
+class MemoryStore:
+    """Documents kept in a dict keyed by collection path, then document ID"""
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def get(self, collection: str, doc_id: str) -> Optional[Dict]:
+        with self._lock:
+            data = self._collections.get(collection, {}).get(doc_id)
+            return copy.deepcopy(data) if data is not None else None
+
+    def list(self, collection: str) -> List[Tuple[str, Dict]]:
+        with self._lock:
+            return [(doc_id, copy.deepcopy(data)) for doc_id, data in self._collections.get(collection, {}).items()]
+
+    def apply(self, writes: List[Tuple[str, str, Optional[Dict], bool]]):
+        """Apply (collection, doc_id, data, merge) writes atomically; data None deletes"""
+        with self._lock:
+            for collection, doc_id, data, merge in writes:
+                documents = self._collections.setdefault(collection, {})
+                if data is None:
+                    documents.pop(doc_id, None)
+                elif merge and doc_id in documents:
+                    _merge_into(documents[doc_id], copy.deepcopy(data))
+                else:
+                    documents[doc_id] = copy.deepcopy(data)
+
+    def close(self):
+        pass
+
+
+class SQLiteStore:
+    """Documents kept in a SQLite file so data survives between runs"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "collection TEXT NOT NULL, doc_id TEXT NOT NULL, data TEXT NOT NULL, "
+                "PRIMARY KEY (collection, doc_id))"
+            )
+
+    def get(self, collection: str, doc_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM documents WHERE collection = ? AND doc_id = ?", (collection, doc_id)
+            ).fetchone()
+        return _decode(row[0]) if row else None
+
+    def list(self, collection: str) -> List[Tuple[str, Dict]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id, data FROM documents WHERE collection = ?", (collection,)
+            ).fetchall()
+        return [(doc_id, _decode(data)) for doc_id, data in rows]
+
+    def apply(self, writes: List[Tuple[str, str, Optional[Dict], bool]]):
+        with self._lock, self._conn:
+            for collection, doc_id, data, merge in writes:
+                if data is None:
+                    self._conn.execute(
+                        "DELETE FROM documents WHERE collection = ? AND doc_id = ?", (collection, doc_id)
+                    )
+                    continue
+                if merge:
+                    row = self._conn.execute(
+                        "SELECT data FROM documents WHERE collection = ? AND doc_id = ?", (collection, doc_id)
+                    ).fetchone()
+                    if row:
+                        data = _merge_into(_decode(row[0]), copy.deepcopy(data))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (collection, doc_id, data) VALUES (?, ?, ?)",
+                    (collection, doc_id, _encode(data))
+                )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _merge_into(target: Dict, data: Dict) -> Dict:
+    """Merge nested maps field by field, like set(..., merge=True)"""
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge_into(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__} in the local Firestore")
+
+
+def _json_hook(value):
+    if '__datetime__' in value and len(value) == 1:
+        return datetime.fromisoformat(value['__datetime__'])
+    return value
+
+
+def _encode(data: Dict) -> str:
+    return json.dumps(data, default=_json_default)
+
+
+def _decode(text: str) -> Dict:
+    return json.loads(text, object_hook=_json_hook)
+
+
+class DocumentSnapshot:
+    def __init__(self, reference: 'DocumentReference', data: Optional[Dict]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field: str) -> Any:
+        return _field_value(self._data or {}, field)
+
+
+def _field_value(data: Dict, field: str, default: Any = None) -> Any:
+    value = data
+    for part in field.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return default
+        value = value[part]
+    return value
+
+
+_OPERATORS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    'in': lambda a, b: a in b,
+    'not-in': lambda a, b: a not in b,
+    'array_contains': lambda a, b: isinstance(a, list) and b in a,
+}
+
+_MISSING = object()
+
+
+class Query:
+    """Immutable query over one collection; every builder returns a new query"""
+
+    # Mirrors firestore.Query.ASCENDING / DESCENDING
+    ASCENDING = ASCENDING
+    DESCENDING = DESCENDING
+
+    def __init__(self, client: 'LocalFirestoreClient', path: str, filters=(), orders=(), limit_count=None,
+                 cursor=None):
+        self._client = client
+        self._path = path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit_count
+        self._cursor = cursor
+
+    def _copy(self, **changes) -> 'Query':
+        state = {'filters': self._filters, 'orders': self._orders, 'limit_count': self._limit,
+                 'cursor': self._cursor}
+        state.update(changes)
+        return Query(self._client, self._path, **state)
+
+    def where(self, field: str, op: str, value: Any) -> 'Query':
+        if op not in _OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field: str, direction: str = ASCENDING) -> 'Query':
+        return self._copy(orders=self._orders + ((field, direction),))
+
+    def limit(self, count: int) -> 'Query':
+        return self._copy(limit_count=count)
+
+    def start_after(self, document_fields) -> 'Query':
+        """Resume after a snapshot, or after a dict of order_by field values"""
+        if isinstance(document_fields, DocumentSnapshot):
+            cursor = (document_fields.id, document_fields.to_dict() or {})
+        else:
+            cursor = (None, document_fields)
+        return self._copy(cursor=cursor)
+
+    def _compare(self, left: Tuple[Optional[str], Dict], right: Tuple[Optional[str], Dict]) -> int:
+        """Order two (doc_id, data) rows by the order_by fields, then document ID"""
+        direction = ASCENDING
+        for field, direction in self._orders:
+            a, b = _field_value(left[1], field), _field_value(right[1], field)
+            if a != b:
+                result = -1 if a < b else 1
+                return -result if direction == DESCENDING else result
+        # Ties break on document ID, in the direction of the last order_by
+        if left[0] is None or right[0] is None or left[0] == right[0]:
+            return 0
+        result = -1 if left[0] < right[0] else 1
+        return -result if direction == DESCENDING else result
+
+    def _matches(self, data: Dict) -> bool:
+        for field, op, value in self._filters:
+            actual = _field_value(data, field, _MISSING)
+            if actual is _MISSING:
+                return False
+            try:
+                if not _OPERATORS[op](actual, value):
+                    return False
+            except TypeError:
+                return False
+        # Firestore leaves out documents that lack an order_by field
+        return all(_field_value(data, field, _MISSING) is not _MISSING for field, _ in self._orders)
+
+    def _run(self) -> List[DocumentSnapshot]:
+        self._client.faults.round_trip(f"query {self._path}")
+        rows = [(doc_id, data) for doc_id, data in self._client.store.list(self._path) if self._matches(data)]
+        rows.sort(key=functools.cmp_to_key(self._compare))
+        if self._cursor is not None:
+            rows = [row for row in rows if self._compare(row, self._cursor) > 0]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        collection = CollectionReference(self._client, self._path)
+        return [DocumentSnapshot(collection.document(doc_id), data) for doc_id, data in rows]
+
+    def stream(self) -> Iterator[DocumentSnapshot]:
+        return iter(self._run())
+
+    def get(self) -> List[DocumentSnapshot]:
+        return self._run()
+
+
+class CollectionReference(Query):
+    def __init__(self, client: 'LocalFirestoreClient', path: str):
+        super().__init__(client, path)
+        self.id = path.rsplit('/', 1)[-1]
+        self.path = path
+
+    def document(self, doc_id: Optional[str] = None) -> 'DocumentReference':
+        # Like Firestore, a missing ID is allocated locally without a round trip
+        return DocumentReference(self._client, self.path, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data: Dict) -> Tuple[datetime, 'DocumentReference']:
+        ref = self.document()
+        ref.set(data)
+        return datetime.now(), ref
+
+
+class DocumentReference:
+    def __init__(self, client: 'LocalFirestoreClient', collection_path: str, doc_id: str):
+        self._client = client
+        self._collection_path = collection_path
+        self.id = doc_id
+        self.path = f"{collection_path}/{doc_id}"
+
+    def collection(self, name: str) -> CollectionReference:
+        return CollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self) -> DocumentSnapshot:
+        self._client.faults.round_trip(f"get {self.path}")
+        return DocumentSnapshot(self, self._client.store.get(self._collection_path, self.id))
+
+    def set(self, data: Dict, merge: bool = False):
+        self._client.faults.round_trip(f"set {self.path}")
+        self._client.store.apply([(self._collection_path, self.id, data, merge)])
+
+    def update(self, data: Dict):
+        self.set(data, merge=True)
+
+    def delete(self):
+        self._client.faults.round_trip(f"delete {self.path}")
+        self._client.store.apply([(self._collection_path, self.id, None, False)])
+
+
+class WriteBatch:
+    def __init__(self, client: 'LocalFirestoreClient'):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference: DocumentReference, data: Dict, merge: bool = False):
+        self._writes.append((reference._collection_path, reference.id, data, merge))
+
+    def update(self, reference: DocumentReference, data: Dict):
+        self.set(reference, data, merge=True)
+
+    def delete(self, reference: DocumentReference):
+        self._writes.append((reference._collection_path, reference.id, None, False))
+
+    def commit(self):
+        # The whole batch is one round trip and applies atomically
+        self._client.faults.round_trip(f"commit {len(self._writes)} writes")
+        self._client.store.apply(self._writes)
+        self._writes = []
+
+
+class LocalFirestoreClient:
+    """Drop-in for the parts of google.cloud.firestore.Client that GABE uses"""
+
+    def __init__(self, store=None, faults: Optional[FaultInjector] = None):
+        self.store = store or MemoryStore()
+        self.faults = faults or FaultInjector()
+
+    @classmethod
+    def from_url(cls, url: str, faults: Optional[FaultInjector] = None) -> 'LocalFirestoreClient':
+        """Build a client from 'memory' or 'sqlite:/path/to/file.db'"""
+        if url == 'memory':
+            store = MemoryStore()
+        elif url.startswith('sqlite:'):
+            store = SQLiteStore(url[len('sqlite:'):])
+        else:
+            raise ValueError(f"Unknown local Firestore backend: {url}")
+        logging.info(f"Using local Firestore stand-in: {url}")
+        return cls(store, faults or FaultInjector.from_env())
+
+    def collection(self, name: str) -> CollectionReference:
+        return CollectionReference(self, name)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def close(self):
+        self.store.close()
@@ -1,12 +1,143 @@
-from flask import Flask, render_template
+from flask import Flask, Response, jsonify, render_template, request, stream_with_context
 import os
+import json
+import logging
+import threading
+from crisis_detection import CrisisDetector
+from daily_content import get_daily_cache
+from firebase_service import firestore_health, warm_up_firestore
+from metrics import REGISTRY
+from scripture_search import search_scripture
+from voice_chunker import VoiceChunker
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 
+# Open the Firestore connection before the first chat instead of during it
+FIRESTORE_WARMUP = os.environ.get('FIRESTORE_WARMUP', '1').lower() not in ('0', 'false', 'off')
+
+crisis_detector = CrisisDetector()
+
+_gabe = None
+_gabe_lock = threading.Lock()
+
+def get_gabe():
+    """Create the shared GabeAI on first use so the app starts without provider keys"""
+    global _gabe
+    if _gabe is None:
+        with _gabe_lock:
+            if _gabe is None:
+                from gabe_ai import GabeAI
+                _gabe = GabeAI()
+    return _gabe
+
+def start_worker():
+    """Per-process startup: warm up Firestore and schedule the daily precompute.
+
+    gRPC channels and threads don't survive a fork, so this runs in each
+    worker after it starts (gunicorn.conf.py's post_worker_init, or below
+    when run directly) rather than at import, which gunicorn --preload does
+    in the master.
+    """
+    if FIRESTORE_WARMUP:
+        warm_up_firestore()
+    # Fill tomorrow's daily content for recently active users ahead of the morning rush
+    get_daily_cache().start_precompute()
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.route('/')
 def home():
     return render_template('index.html')
 
+@app.route('/health')
+def health():
+    firestore_status = firestore_health()
+    healthy = firestore_status['warm'] or not firestore_status['connected']
+    return jsonify({'status': 'ok' if healthy else 'degraded', 'firestore': firestore_status}), 200 if healthy else 503
+
+@app.route('/metrics')
+def metrics():
+    """Provider latency, token, fallback and cache metrics in Prometheus text format"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/scripture/search')
+def scripture_search():
+    """Verses matching a reference ('Ps 34:18'), a quoted phrase or keywords"""
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 5)), 1), 50)
+    except ValueError:
+        limit = 5
+    hits = search_scripture(query, limit)
+    return jsonify({'query': query, 'results': [
+        {'reference': hit.verse.reference, 'text': hit.verse.text, 'match': hit.match, 'score': round(hit.score, 3)}
+        for hit in hits
+    ]})
+
+@app.route('/chat/stream', methods=['GET', 'POST'])
+def chat_stream():
+    """Stream GABE's reply token by token as Server-Sent Events.
+
+    Events: 'start' (provider), 'token' (text), 'done' (time to first token
+    and total latency, reported separately) or 'error'. With voice=1, 'voice'
+    events carry speakable sentence chunks as soon as each one is complete.
+    """
+    payload = request.get_json(silent=True) or request.args
+    message = (payload.get('message') or '').strip()
+    if not message:
+        return jsonify({'error': 'message is required'}), 400
+    user_name = payload.get('user_name')
+    age_range = payload.get('age_range')
+    history = payload.get('history') if isinstance(payload.get('history'), list) else None
+    voice = str(payload.get('voice', '')).lower() in ('1', 'true', 'on')
+
+    def generate():
+        # Crisis replies never wait on a provider
+        crisis_response = crisis_detector.check_for_crisis(message)
+        if crisis_response:
+            yield sse_event('start', {'provider': 'crisis'})
+            yield sse_event('token', {'text': crisis_response})
+            if voice:
+                yield sse_event('voice', {'text': crisis_response})
+            yield sse_event('done', {'provider': 'crisis', 'ttft_ms': 0, 'total_ms': 0})
+            return
+
+        try:
+            stream = get_gabe().stream_response(message, user_name, age_range, history)
+        except Exception as e:
+            logging.error(f"Streaming response failed to start: {e}")
+            yield sse_event('error', {'message': "I'm having trouble connecting right now. Please try again in a moment."})
+            return
+
+        yield sse_event('start', {'provider': stream.provider})
+        chunker = VoiceChunker() if voice else None
+        try:
+            for token in stream:
+                yield sse_event('token', {'text': token})
+                if chunker:
+                    for chunk in chunker.feed(token):
+                        yield sse_event('voice', {'text': chunk})
+        except GeneratorExit:
+            # Client went away: stop paying for tokens nobody will read
+            stream.close()
+            raise
+        except Exception as e:
+            logging.error(f"Streaming response failed mid-stream: {e}")
+            yield sse_event('error', {'message': "Sorry, I lost my train of thought. Could you ask again?"})
+            return
+        if chunker:
+            for chunk in chunker.flush():
+                yield sse_event('voice', {'text': chunk})
+        yield sse_event('done', {'provider': stream.provider, 'ttft_ms': stream.ttft_ms, 'total_ms': stream.total_ms})
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
 if __name__ == '__main__':
+    start_worker()
     port = int(os.environ.get('PORT', 8000))
     app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,213 @@
+"""
+In-process metrics in Prometheus text format
+Counters and rolling-window summaries cheap enough to leave on in production;
+anything that already keeps its own stats (caches, breakers) is read only
+when /metrics is scraped
+"""
+
+import math
+import threading
+import weakref
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return 'NaN'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(name, '') for name in self.labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Summary:
+    """Count, sum and p50/p95/p99 over the last `window` observations per label set"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), window: int = 1024):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.window = window
+        self._series: Dict[Tuple, list] = {}  # key -> [samples, count, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [deque(maxlen=self.window), 0, 0.0]
+            series[0].append(value)
+            series[1] += 1
+            series[2] += value
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            samples = sorted(series[0]) if series else []
+        return self._pick(samples, q)
+
+    def _pick(self, samples: List[float], q: float) -> Optional[float]:
+        if not samples:
+            return None
+        return samples[min(int(len(samples) * q), len(samples) - 1)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} summary"]
+        with self._lock:
+            series = [(key, sorted(samples), count, total) for key, (samples, count, total) in self._series.items()]
+        # Sorting happens at scrape time, never on the request path
+        for key, samples, count, total in series:
+            for q in QUANTILES:
+                labels = _format_labels(self.labels, key, f'quantile="{q}"')
+                lines.append(f"{self.name}{labels} {_format_value(self._pick(samples, q))}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+# A collector returns (name, type, help, [(labels_dict, value), ...]) tuples
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(name, lambda: Counter(name, help_text, labels))
+
+    def summary(self, name: str, help_text: str, labels: Tuple[str, ...] = (), window: int = 1024) -> Summary:
+        return self._register(name, lambda: Summary(name, help_text, labels, window))
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Add a scrape-time collector; bound methods are held weakly so a
+        collected object drops out of /metrics instead of being kept alive"""
+        ref = weakref.WeakMethod(collector) if hasattr(collector, '__self__') else (lambda: collector)
+        with self._lock:
+            self._collectors.append(ref)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        families: Dict[str, list] = {}
+        dead = []
+        for ref in collectors:
+            collector = ref()
+            if collector is None:
+                dead.append(ref)
+                continue
+            try:
+                for name, kind, help_text, samples in collector():
+                    family = families.setdefault(name, [kind, help_text, []])
+                    family[2].extend(samples)
+            except Exception as e:
+                lines.append(f"# collector error: {_escape(e)}")
+        if dead:
+            with self._lock:
+                self._collectors = [ref for ref in self._collectors if ref not in dead]
+
+        # Several objects may report the same family; emit its header once
+        for name, (kind, help_text, samples) in families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                names = tuple(labels)
+                lines.append(f"{name}{_format_labels(names, tuple(labels[n] for n in names))} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+
+REGISTRY = MetricsRegistry()
+
+# Provider call metrics, recorded by the dispatcher and token streams
+LLM_LATENCY = REGISTRY.summary(
+    'gabe_llm_request_seconds', 'Provider call latency (streams: time to first token)', ('provider', 'method'))
+LLM_STREAM_TOTAL = REGISTRY.summary(
+    'gabe_llm_stream_seconds', 'Total duration of streamed provider responses', ('provider',))
+LLM_PROMPT_TOKENS = REGISTRY.counter(
+    'gabe_llm_prompt_tokens_total', 'Prompt tokens reported by providers', ('provider',))
+LLM_COMPLETION_TOKENS = REGISTRY.counter(
+    'gabe_llm_completion_tokens_total', 'Completion tokens reported by providers', ('provider',))
+LLM_CALLS = REGISTRY.counter(
+    'gabe_llm_calls_total', 'Provider calls by outcome (ok, error, rate_limited, cancelled)', ('provider', 'outcome'))
+LLM_REQUESTS = REGISTRY.counter(
+    'gabe_llm_requests_total', 'Dispatched requests by who answered (primary, fallback, none)', ('result',))
+LLM_HEDGES = REGISTRY.counter(
+    'gabe_llm_hedges_total', 'Backup calls started because the primary was slow or failed', ('reason',))
+
+
+def record_usage(provider: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+    if prompt_tokens:
+        LLM_PROMPT_TOKENS.inc(prompt_tokens, provider=provider)
+    if completion_tokens:
+        LLM_COMPLETION_TOKENS.inc(completion_tokens, provider=provider)
+
+
+def cache_family(cache: str, stats: Dict) -> List[Family]:
+    """Standard hit/miss/size families for a cache's stats() dict"""
+    labels = {'cache': cache}
+    families = [
+        ('gabe_cache_hits_total', 'counter', 'Cache hits', [(labels, stats.get('hits', 0))]),
+        ('gabe_cache_misses_total', 'counter', 'Cache misses', [(labels, stats.get('misses', 0))]),
+    ]
+    if 'size' in stats or 'users' in stats or 'sessions' in stats:
+        size = stats.get('size', stats.get('users', stats.get('sessions', 0)))
+        families.append(('gabe_cache_entries', 'gauge', 'Entries currently cached', [(labels, size)]))
+    if 'evictions' in stats:
+        families.append(('gabe_cache_evictions_total', 'counter', 'Entries evicted', [(labels, stats['evictions'])]))
+    return families
@@ -0,0 +1,522 @@
+"""
+Persistent progress for the gamified spiritual features
+XP, badges, streaks and adventure progress live in one compact record per
+user behind a small store interface: an in-process LRU, or SQLite so the
+progress survives restarts and is shared by every worker
+"""
+
+import os
+import json
+import time
+import atexit
+import logging
+import sqlite3
+import threading
+import contextlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List
+
+import metrics
+
+PROGRESS_STORE_MAX_USERS = int(os.environ.get('PROGRESS_STORE_MAX_USERS', '10000'))
+# Empty keeps progress in this process only
+PROGRESS_STORE_PATH = os.environ.get('PROGRESS_STORE_PATH', '')
+# Changes made within this many seconds of each other go out as one write
+PROGRESS_FLUSH_DELAY = float(os.environ.get('PROGRESS_FLUSH_DELAY', '1'))
+# Seconds before a cached record is re-read to pick up other workers' changes
+PROGRESS_REFRESH_INTERVAL = float(os.environ.get('PROGRESS_REFRESH_INTERVAL', '30'))
+
+_MISSING = object()
+
+
+def merge_field(base: Any, local: Any, stored: Any) -> Any:
+    """Three-way merge of one stored field: apply what changed locally since
+    `base` on top of `stored`, which other workers may have changed meanwhile.
+
+    Lists (badges) keep every item either side added and drop only what this
+    side removed; dicts (verse mastery) merge key by key; anything else is
+    replaced by the local value.
+    """
+    if local == base:
+        return stored
+    if isinstance(local, dict) and isinstance(base, dict) and isinstance(stored, dict):
+        merged = dict(stored)
+        for key in set(base) | set(local):
+            if key not in local:
+                merged.pop(key, None)
+            elif local[key] != base.get(key, _MISSING):
+                merged[key] = merge_field(base.get(key), local[key], stored.get(key))
+        return merged
+    if isinstance(local, list) and isinstance(base, list) and isinstance(stored, list):
+        removed = [item for item in base if item not in local]
+        merged = [item for item in stored if item not in removed]
+        merged.extend(item for item in local if item not in base and item not in merged)
+        return merged
+    return local
+
+
+def _plain(data: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields as they read back from storage (lists, dicts, strings, numbers)"""
+    return json.loads(json.dumps(data, default=str))
+
+
+class UserProgress:
+    """One user's progress.
+
+    Counters (xp, total_actions, ...) only change through increment(), which
+    also records the delta, so increments from different workers add up in
+    the shared store instead of overwriting each other. Other fields are
+    merged with merge_field: only what changed here since `base` is applied
+    to the stored row. Dict-style access keeps code written against the old
+    SESSION_STORAGE entries working.
+    """
+    __slots__ = ('user_id', 'level', 'badges', 'streak', 'scripture_adventure_position', 'verse_mastery_progress',
+                 'counters', 'extra', 'deltas', 'base', 'loaded_at')
+
+    FIELDS = ('level', 'badges', 'streak', 'scripture_adventure_position', 'verse_mastery_progress')
+    COUNTERS = ('xp', 'total_actions', 'studies_completed')
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.level = 'Seed'
+        self.badges = []
+        self.streak = 0
+        self.scripture_adventure_position = 0
+        self.verse_mastery_progress = {}
+        self.counters: Dict[str, int] = {}
+        self.extra: Dict[str, Any] = {}
+        # Counter changes not yet written
+        self.deltas: Dict[str, int] = {}
+        # The fields as last read or written, to tell what changed here
+        self.base: Dict[str, Any] = {}
+        self.loaded_at = time.monotonic()
+
+    def increment(self, counter: str, amount: int = 1) -> int:
+        value = self.counters.get(counter, 0) + amount
+        self.counters[counter] = value
+        self.deltas[counter] = self.deltas.get(counter, 0) + amount
+        return value
+
+    def is_counter(self, key: str) -> bool:
+        return key in self.COUNTERS or key in self.counters
+
+    def data(self) -> Dict[str, Any]:
+        """The non-counter fields, as stored"""
+        data = dict(self.extra)
+        data.update((field, getattr(self, field)) for field in self.FIELDS)
+        return data
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.data()
+        data.update((counter, self.counters.get(counter, 0)) for counter in self.COUNTERS)
+        data.update(self.counters)
+        return data
+
+    @classmethod
+    def from_dict(cls, user_id: str, data: Dict[str, Any], counters: Dict[str, int]) -> 'UserProgress':
+        record = cls(user_id)
+        record.adopt(data)
+        record.counters.update(counters)
+        return record
+
+    def adopt(self, data: Dict[str, Any]):
+        """Take the stored fields; lists and dicts are updated in place so
+        references callers already hold stay live"""
+        for key, value in data.items():
+            current = self[key] if key in self.FIELDS or key in self.extra else None
+            if isinstance(current, list) and isinstance(value, list):
+                current[:] = value
+            elif isinstance(current, dict) and isinstance(value, dict):
+                current.clear()
+                current.update(value)
+            elif key in self.FIELDS:
+                setattr(self, key, value)
+            else:
+                self.extra[key] = value
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self.is_counter(key):
+            return self.counters.get(key, 0)
+        return self.extra[key]
+
+    def __setitem__(self, key: str, value: Any):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        elif self.is_counter(key):
+            self.increment(key, value - self.counters.get(key, 0))
+        else:
+            self.extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS or self.is_counter(key) or key in self.extra
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def keys(self) -> List[str]:
+        return list(self.to_dict())
+
+
+class ProgressStore:
+    """Where GamifiedSpiritualFeatures keeps user progress.
+
+    get() returns the live record; after changing it in place call save(),
+    which only marks it for the next write, or make the change through
+    update(), which marks it once the change is done. increment() is atomic.
+    """
+
+    def get(self, user_id: str) -> UserProgress:
+        raise NotImplementedError
+
+    def save(self, user_id: str):
+        raise NotImplementedError
+
+    def increment(self, user_id: str, counter: str, amount: int = 1) -> int:
+        raise NotImplementedError
+
+    def update(self, user_id: str, change: Callable[[UserProgress], Any]) -> Any:
+        """Apply change(record) and mark the record for writing; returns what change returns"""
+        raise NotImplementedError
+
+    def delete(self, user_id: str):
+        raise NotImplementedError
+
+    def flush(self) -> int:
+        """Write pending changes now; returns how many records were written"""
+        return 0
+
+    def close(self):
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+    def collect_metrics(self) -> list:
+        """Scrape-time families for /metrics"""
+        stats = self.stats()
+        labels = {'cache': 'progress'}
+        families = [
+            ('gabe_cache_entries', 'gauge', 'Entries currently cached', [(labels, stats.get('users', 0))]),
+            ('gabe_cache_evictions_total', 'counter', 'Entries evicted', [(labels, stats.get('evictions', 0))]),
+        ]
+        if 'writes' in stats:
+            families.append(('gabe_progress_saves_total', 'counter', 'Progress changes saved',
+                             [({}, stats['saves'])]))
+            families.append(('gabe_progress_writes_total', 'counter', 'Progress records written to the backend',
+                             [({}, stats['writes'])]))
+        return families
+
+
+class MemoryProgressStore(ProgressStore):
+    """Progress for the most recently active users in this process only"""
+
+    def __init__(self, max_users: int = PROGRESS_STORE_MAX_USERS):
+        self.max_users = max_users
+        self._records = OrderedDict()
+        self._lock = threading.RLock()
+        self.evictions = 0
+        self.saves = 0
+
+    def get(self, user_id: str) -> UserProgress:
+        with self._lock:
+            record = self._records.get(user_id)
+            if record is None:
+                record = self._records[user_id] = self._load(user_id)
+                self._evict()
+            else:
+                self._records.move_to_end(user_id)
+            return record
+
+    def save(self, user_id: str):
+        with self._lock:
+            record = self._records.get(user_id)
+            if record is not None:
+                self.saves += 1
+                self._mark(record)
+
+    def increment(self, user_id: str, counter: str, amount: int = 1) -> int:
+        with self._lock:
+            record = self.get(user_id)
+            value = record.increment(counter, amount)
+            self.saves += 1
+            self._mark(record)
+            return value
+
+    def update(self, user_id: str, change: Callable[[UserProgress], Any]) -> Any:
+        with self._lock:
+            record = self.get(user_id)
+            result = change(record)
+            self.saves += 1
+            self._mark(record)
+            return result
+
+    def delete(self, user_id: str):
+        with self._lock:
+            self._records.pop(user_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {'users': len(self._records), 'max_users': self.max_users, 'evictions': self.evictions,
+                'saves': self.saves}
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _load(self, user_id: str) -> UserProgress:
+        return UserProgress(user_id)
+
+    def _mark(self, record: UserProgress):
+        # Nothing to write; counter deltas only matter to a shared backend
+        record.deltas.clear()
+
+    def _evict(self):
+        while len(self._records) > self.max_users:
+            self._records.popitem(last=False)
+            self.evictions += 1
+
+
+class SQLiteProgressStore(MemoryProgressStore):
+    """Progress in a SQLite file shared by every worker, with an LRU of
+    records in front.
+
+    Saves are coalesced: changed records are written together at most once
+    per `flush_delay`, on a background thread, in one transaction. Counters
+    are written as deltas (value = value + ?), so concurrent workers never
+    lose each other's XP. Other fields are read, merged and written back
+    inside a BEGIN IMMEDIATE transaction, applying only the fields this
+    worker changed, so a badge awarded elsewhere survives a stale copy here.
+    """
+
+    def __init__(self, path: str, max_users: int = PROGRESS_STORE_MAX_USERS,
+                 flush_delay: float = PROGRESS_FLUSH_DELAY, refresh_interval: float = PROGRESS_REFRESH_INTERVAL):
+        super().__init__(max_users)
+        self.path = path
+        self.flush_delay = flush_delay
+        self.refresh_interval = refresh_interval
+        self._local = threading.local()
+        # Changed records by user, kept here until written even if evicted
+        self._dirty: Dict[str, UserProgress] = {}
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+        self.writes = 0
+        self.flushes = 0
+        self.write_errors = 0
+
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS progress ("
+            "user_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS progress_counters ("
+            "user_id TEXT NOT NULL, name TEXT NOT NULL, value INTEGER NOT NULL, "
+            "PRIMARY KEY (user_id, name)) WITHOUT ROWID"
+        )
+        db.commit()
+
+        self._thread = threading.Thread(target=self._run, name='progress-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _db(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite handles locking between workers
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # Autocommit; writes open their own BEGIN IMMEDIATE transactions
+            db = self._local.db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        return db
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Take SQLite's write lock up front, so a read-modify-write can't interleave with another worker's"""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def get(self, user_id: str) -> UserProgress:
+        with self._lock:
+            record = self._records.get(user_id)
+            # Re-read a stale copy to pick up other workers' changes, unless
+            # it has changes of its own still waiting to be written
+            if (record is not None and user_id not in self._dirty
+                    and time.monotonic() - record.loaded_at > self.refresh_interval):
+                del self._records[user_id]
+            return super().get(user_id)
+
+    def delete(self, user_id: str):
+        with self._lock:
+            super().delete(user_id)
+            self._dirty.pop(user_id, None)
+            try:
+                with self._transaction() as db:
+                    db.execute("DELETE FROM progress WHERE user_id = ?", (user_id,))
+                    db.execute("DELETE FROM progress_counters WHERE user_id = ?", (user_id,))
+            except sqlite3.Error as e:
+                logging.warning(f"Progress delete failed for {user_id}: {e}")
+
+    def flush(self) -> int:
+        with self._lock:
+            records = list(self._dirty.values())
+            self._dirty.clear()
+        if not records:
+            return 0
+        self.flushes += 1
+        return self._write(records)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(10.0)
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        stats.update(dirty=len(self._dirty), writes=self.writes, flushes=self.flushes,
+                     write_errors=self.write_errors)
+        return stats
+
+    def _load(self, user_id: str) -> UserProgress:
+        # Evicted before its write went out: that copy is the newest
+        record = self._dirty.get(user_id)
+        if record is not None:
+            record.loaded_at = time.monotonic()
+            return record
+        try:
+            db = self._db()
+            row = db.execute("SELECT data FROM progress WHERE user_id = ?", (user_id,)).fetchone()
+            counters = dict(db.execute(
+                "SELECT name, value FROM progress_counters WHERE user_id = ?", (user_id,)).fetchall())
+        except sqlite3.Error as e:
+            logging.warning(f"Progress read failed for {user_id}: {e}")
+            row, counters = None, {}
+        record = UserProgress.from_dict(user_id, json.loads(row[0]) if row else {}, counters)
+        record.base = _plain(record.data())
+        return record
+
+    def _mark(self, record: UserProgress):
+        if record.user_id not in self._dirty:
+            self._dirty[record.user_id] = record
+            self._wake.set()
+
+    def _write(self, records: List[UserProgress]) -> int:
+        """Write records in one transaction; on failure they are marked again"""
+        with self._flush_lock:
+            with self._lock:
+                taken = []
+                for record in records:
+                    deltas, record.deltas = record.deltas, {}
+                    local = _plain(record.data())
+                    changed = [field for field in set(local) | set(record.base)
+                               if local.get(field, _MISSING) != record.base.get(field, _MISSING)]
+                    taken.append((record, deltas, local, changed))
+            counters = [(record.user_id, name, delta) for record, deltas, _, _ in taken
+                        for name, delta in deltas.items() if delta]
+            if not counters and not any(changed for _, _, _, changed in taken):
+                return 0
+
+            now = time.time()
+            merged = {}
+            try:
+                with self._transaction() as db:
+                    for record, _, local, changed in taken:
+                        if not changed:
+                            continue
+                        row = db.execute("SELECT data FROM progress WHERE user_id = ?", (record.user_id,)).fetchone()
+                        stored = json.loads(row[0]) if row else {}
+                        for field in changed:
+                            if field in local:
+                                stored[field] = merge_field(record.base.get(field), local[field], stored.get(field))
+                            else:
+                                stored.pop(field, None)
+                        db.execute("INSERT OR REPLACE INTO progress (user_id, data, updated_at) VALUES (?, ?, ?)",
+                                   (record.user_id, json.dumps(stored), now))
+                        merged[record.user_id] = stored
+                    db.executemany(
+                        "INSERT INTO progress_counters (user_id, name, value) VALUES (?, ?, ?) "
+                        "ON CONFLICT (user_id, name) DO UPDATE SET value = value + excluded.value",
+                        counters
+                    )
+            except sqlite3.Error as e:
+                self.write_errors += 1
+                logging.warning(f"Progress write of {len(records)} records failed, will retry: {e}")
+                with self._lock:
+                    for record, deltas, _, _ in taken:
+                        for name, delta in deltas.items():
+                            record.deltas[name] = record.deltas.get(name, 0) + delta
+                        self._mark(record)
+                return 0
+
+            with self._lock:
+                for record, _, local, changed in taken:
+                    if not changed:
+                        continue
+                    stored = merged[record.user_id]
+                    # Pick up other workers' changes unless this copy moved on
+                    # meanwhile; either way `base` is what the copy now derives from
+                    if _plain(record.data()) == local:
+                        # A copy: base must not share lists with the live fields
+                        record.adopt(_plain(stored))
+                        record.base = stored
+                    else:
+                        record.base = local
+            written = len(set(merged) | {row[0] for row in counters})
+            self.writes += written
+            return written
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait()
+            if self._closed:
+                break
+            # Let a burst of actions finish, then write it once
+            self._stop.wait(self.flush_delay)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Progress flush failed: {e}")
+
+
+_progress_store = None
+_progress_store_lock = threading.Lock()
+
+
+def get_progress_store() -> ProgressStore:
+    """Process-wide progress store: SQLite when PROGRESS_STORE_PATH is set, memory otherwise"""
+    global _progress_store
+    if _progress_store is None:
+        with _progress_store_lock:
+            if _progress_store is None:
+                store = None
+                if PROGRESS_STORE_PATH:
+                    try:
+                        store = SQLiteProgressStore(PROGRESS_STORE_PATH)
+                    except sqlite3.Error as e:
+                        logging.warning(f"Progress store keeping state in memory only, "
+                                        f"could not open {PROGRESS_STORE_PATH}: {e}")
+                _progress_store = store or MemoryProgressStore()
+                metrics.REGISTRY.register_collector(_progress_store.collect_metrics)
+    return _progress_store
@@ -0,0 +1,187 @@
+"""
+Token budget for GABE's conversation prompts
+Keeps the latest turns verbatim and folds older ones into a short running
+summary, so prompt size stays flat however long a session runs
+"""
+
+import os
+import re
+import math
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ttl_cache import TTLCache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', '3000'))
+PROMPT_RECENT_TURNS = int(os.environ.get('PROMPT_RECENT_TURNS', '6'))
+PROMPT_SUMMARY_TOKENS = int(os.environ.get('PROMPT_SUMMARY_TOKENS', '300'))
+
+# Longest slice of a single turn kept in the running summary
+SUMMARY_LINE_CHARS = 160
+
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+SUMMARY_HEADER = "EARLIER IN THIS CONVERSATION (summary):"
+RECENT_HEADER = "RECENT CONVERSATION:"
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """Token count without a network call: tiktoken when installed, else ~4 chars per token"""
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _encoding is None:
+            with _encoding_lock:
+                if _encoding is None:
+                    _encoding = tiktoken.get_encoding('cl100k_base')
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def turn_lines(turn) -> List[Tuple[str, str]]:
+    """(speaker, text) pairs for one history item.
+
+    Accepts {'role', 'content'} messages, {'user', 'gabe'} exchange dicts and
+    plain strings, which is what the different chat paths store.
+    """
+    if isinstance(turn, str):
+        return [('User', turn)]
+    if not isinstance(turn, dict):
+        return []
+    if 'content' in turn:
+        speaker = 'GABE' if turn.get('role') in ('assistant', 'model', 'gabe') else 'User'
+        return [(speaker, str(turn['content']))]
+    lines = []
+    for key in ('user', 'message', 'user_message'):
+        if turn.get(key):
+            lines.append(('User', str(turn[key])))
+            break
+    for key in ('gabe', 'assistant', 'response', 'ai_response'):
+        if turn.get(key):
+            lines.append(('GABE', str(turn[key])))
+            break
+    return lines
+
+
+def summarize_turn(speaker: str, text: str) -> str:
+    """First sentence of a turn, clipped, as one summary line"""
+    text = _WHITESPACE_RE.sub(' ', text).strip()
+    first = _SENTENCE_END_RE.split(text, 1)[0]
+    if len(first) > SUMMARY_LINE_CHARS:
+        first = first[:SUMMARY_LINE_CHARS].rsplit(' ', 1)[0] + '...'
+    return f"- {speaker}: {first}"
+
+
+def _fingerprint(turn) -> str:
+    return hashlib.sha1(repr(turn_lines(turn)).encode('utf-8')).hexdigest()[:12]
+
+
+class ConversationBudgeter:
+    """Fits base prompt + running summary + recent turns under a token budget.
+
+    The summary for each conversation is kept between calls and only the
+    turns that newly fell out of the verbatim window are folded into it, so
+    each call does work proportional to one turn, not the whole session.
+    """
+
+    def __init__(self, max_tokens: int = PROMPT_TOKEN_BUDGET, recent_turns: int = PROMPT_RECENT_TURNS,
+                 summary_tokens: int = PROMPT_SUMMARY_TOKENS, summarizer: Optional[Callable] = None,
+                 max_conversations: int = 2048, ttl: float = 6 * 3600):
+        self.max_tokens = max_tokens
+        self.recent_turns = recent_turns
+        self.summary_tokens = summary_tokens
+        # summarizer(previous_summary_lines, [(speaker, text), ...]) -> summary_lines
+        self.summarizer = summarizer or self._extractive_summary
+        self._summaries = TTLCache(max_entries=max_conversations, ttl=ttl)
+
+    def build(self, base_prompt: str, history: Optional[List] = None,
+              conversation_id: Optional[str] = None) -> str:
+        history = list(history or [])
+        budget = self.max_tokens - count_tokens(base_prompt) - count_tokens(SUMMARY_HEADER + RECENT_HEADER) - 4
+        if budget <= 0:
+            logging.warning(f"Base prompt alone exceeds the {self.max_tokens} token budget")
+            return base_prompt
+
+        # Keep as many recent turns verbatim as fit, newest first, leaving room
+        # for the summary when there is older history to summarize
+        reserve = min(self.summary_tokens, budget // 3) if len(history) > self.recent_turns else 0
+        recent, used = [], 0
+        for turn in reversed(history[-self.recent_turns:] if self.recent_turns else []):
+            text = '\n'.join(f"{speaker}: {line}" for speaker, line in turn_lines(turn))
+            cost = count_tokens(text) + 1
+            if used + cost + reserve > budget:
+                break
+            recent.insert(0, text)
+            used += cost
+
+        older = history[:len(history) - len(recent)]
+        summary_lines = self._summary_for(conversation_id, older)
+        summary_lines = self._fit_lines(summary_lines, min(self.summary_tokens, budget - used))
+
+        sections = [base_prompt]
+        if summary_lines:
+            sections.append(SUMMARY_HEADER + '\n' + '\n'.join(summary_lines))
+        if recent:
+            sections.append(RECENT_HEADER + '\n' + '\n'.join(recent))
+        return '\n\n'.join(sections)
+
+    def forget(self, conversation_id: str):
+        self._summaries.pop(conversation_id)
+
+    def _summary_for(self, conversation_id: Optional[str], older: List) -> List[str]:
+        """Running summary of `older`, reusing what was already folded in"""
+        if not older:
+            return []
+        state = self._summaries.get(conversation_id) if conversation_id else None
+        # Reuse only if the turns already summarized are still the same prefix
+        if state and state['count'] <= len(older) and state['count'] and \
+                _fingerprint(older[state['count'] - 1]) == state['last']:
+            lines, start = state['lines'], state['count']
+        else:
+            lines, start = [], 0
+
+        new_turns = [line for turn in older[start:] for line in turn_lines(turn)]
+        if new_turns:
+            lines = self.summarizer(lines, new_turns)
+        if conversation_id:
+            self._summaries.set(conversation_id, {
+                'lines': lines, 'count': len(older), 'last': _fingerprint(older[-1])
+            })
+        return lines
+
+    def _extractive_summary(self, lines: List[str], new_turns: List[Tuple[str, str]]) -> List[str]:
+        lines = lines + [summarize_turn(speaker, text) for speaker, text in new_turns]
+        return self._fit_lines(lines, self.summary_tokens)
+
+    def _fit_lines(self, lines: List[str], max_tokens: int) -> List[str]:
+        """Drop the oldest summary lines until they fit"""
+        if max_tokens <= 0:
+            return []
+        kept, used = [], 0
+        for line in reversed(lines):
+            cost = count_tokens(line) + 1
+            if used + cost > max_tokens:
+                break
+            kept.insert(0, line)
+            used += cost
+        return kept
+
+
+def conversation_key(user_name: Optional[str], history: Optional[List]) -> Optional[str]:
+    """Stable id for a conversation when the caller has no session id:
+    the user plus the conversation's first turn"""
+    if not history:
+        return None
+    return f"{user_name or ''}:{_fingerprint(history[0])}"
@@ -0,0 +1,519 @@
+"""
+Hedged dispatch across LLM providers
+Sends each request to the primary provider and, once it runs past that
+provider's recent p95 latency, a second copy to the next provider. The first
+answer wins. A circuit breaker per provider keeps traffic away from one that
+keeps failing until a single probe request succeeds.
+"""
+
+import os
+import json
+import time
+import hashlib
+import asyncio
+import weakref
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+import metrics
+from prompt_budget import count_tokens
+from rate_limit import (LLM_COMPLETION_TOKEN_ESTIMATE, LLM_RATE_LIMIT_MAX_WAIT, AsyncSingleFlight,
+                        RateLimitExceeded, SingleFlight, get_rate_limiter)
+
+LLM_MAX_WORKERS = int(os.environ.get('LLM_MAX_WORKERS', '16'))
+LLM_REQUEST_TIMEOUT = float(os.environ.get('LLM_REQUEST_TIMEOUT', '30'))
+# Hedge delay used until a provider has enough latency samples for a p95
+LLM_HEDGE_DELAY = float(os.environ.get('LLM_HEDGE_DELAY', '2.0'))
+LLM_HEDGE_MIN_DELAY = float(os.environ.get('LLM_HEDGE_MIN_DELAY', '0.5'))
+LLM_HEDGE_MAX_DELAY = float(os.environ.get('LLM_HEDGE_MAX_DELAY', '8.0'))
+LLM_BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', '5'))
+LLM_BREAKER_RESET = float(os.environ.get('LLM_BREAKER_RESET', '30'))
+# Cap on concurrent async calls to one provider from one event loop
+LLM_MAX_CONCURRENT = int(os.environ.get('LLM_MAX_CONCURRENT', '8'))
+
+_executor = None
+_executor_lock = threading.Lock()
+# Newest live dispatcher per name, so /metrics has one series per dispatcher name
+_dispatchers = weakref.WeakValueDictionary()
+_dispatchers_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Process-wide pool for provider calls, shared by every dispatcher"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS, thread_name_prefix='llm')
+    return _executor
+
+
+def collect_metrics() -> List:
+    """Scrape-time families for every live dispatcher name in the process"""
+    with _dispatchers_lock:
+        dispatchers = list(_dispatchers.values())
+    families = []
+    for dispatcher in dispatchers:
+        families.extend(dispatcher.collect_metrics())
+    return families
+
+
+metrics.REGISTRY.register_collector(collect_metrics)
+
+
+class ProviderUnavailableError(Exception):
+    """Every provider failed, timed out or has its circuit open"""
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open probe after a cool-down"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = LLM_BREAKER_FAILURES,
+                 reset_timeout: float = LLM_BREAKER_RESET, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """True if a call may go out; in half-open only one probe is let through"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logging.info(f"{self.name} circuit closed after successful probe")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                    logging.warning(f"{self.name} circuit opened after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Give back a half-open probe slot that was reserved but never used,
+        e.g. a call cancelled or refused for quota before it said anything
+        about the provider's health"""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies in seconds"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class HedgedDispatcher:
+    """Runs complete/stream calls across providers with hedging and circuit breakers.
+
+    Providers are tried in list order. The second in-service provider is the
+    hedge target, so at most two calls are ever in flight for one request.
+    """
+
+    def __init__(self, providers: List, hedge_delay: float = LLM_HEDGE_DELAY,
+                 min_hedge_delay: float = LLM_HEDGE_MIN_DELAY, max_hedge_delay: float = LLM_HEDGE_MAX_DELAY,
+                 timeout: float = LLM_REQUEST_TIMEOUT, executor: Optional[ThreadPoolExecutor] = None,
+                 max_concurrent: int = LLM_MAX_CONCURRENT, name: str = 'default'):
+        self.name = name
+        self.providers = list(providers)
+        self.max_concurrent = max_concurrent
+        # asyncio.Semaphore belongs to one loop, so keep a set per loop
+        self._semaphores = weakref.WeakKeyDictionary()
+        self.hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.timeout = timeout
+        self._executor = executor
+        self.breakers = {provider: CircuitBreaker(provider.name) for provider in self.providers}
+        self.latency = {provider: LatencyTracker() for provider in self.providers}
+        # Shared per provider name across the process, so quota is counted once
+        self.limiters = {provider: get_rate_limiter(provider.name) for provider in self.providers}
+        self.rate_limit_wait = min(LLM_RATE_LIMIT_MAX_WAIT, timeout)
+        self._flights = SingleFlight()
+        self._async_flights = AsyncSingleFlight()
+        self.requests = 0
+        self.hedges = 0
+        self.rate_limited = 0
+        self.wins = {provider.name: 0 for provider in self.providers}
+        with _dispatchers_lock:
+            _dispatchers[name] = self
+
+    def complete(self, system_prompt: str, messages: List[Dict], **options):
+        """Full completion from whichever provider answers first.
+
+        Identical concurrent requests share one dispatch.
+        """
+        estimate = self._estimate_tokens(system_prompt, messages, options)
+
+        def call(provider):
+            limiter = self.limiters[provider]
+            limiter.acquire(estimate, self.rate_limit_wait)
+            completion = provider.complete(system_prompt, messages, **options)
+            limiter.settle(estimate, self._usage(completion))
+            return completion
+
+        key = self._flight_key(system_prompt, messages, options)
+        return self._flights.do(key, lambda: self._dispatch(call))
+
+    def stream(self, system_prompt: str, messages: List[Dict], **options):
+        """A primed TokenStream; the race is decided by the first token.
+
+        Streams are never shared: each one is consumed by a single client.
+        """
+        estimate = self._estimate_tokens(system_prompt, messages, options)
+
+        def call(provider):
+            self.limiters[provider].acquire(estimate, self.rate_limit_wait)
+            return provider.stream(system_prompt, messages, **options).prime()
+
+        return self._dispatch(call, discard=lambda stream: stream.close(), method='stream')
+
+    async def acomplete(self, system_prompt: str, messages: List[Dict], **options):
+        """Async complete; losing calls are cancelled outright rather than discarded"""
+        estimate = self._estimate_tokens(system_prompt, messages, options)
+
+        async def call(provider):
+            limiter = self.limiters[provider]
+            await limiter.aacquire(estimate, self.rate_limit_wait)
+            completion = await provider.acomplete(system_prompt, messages, **options)
+            limiter.settle(estimate, self._usage(completion))
+            return completion
+
+        key = self._flight_key(system_prompt, messages, options)
+        return await self._async_flights.do(key, lambda: self._adispatch(call))
+
+    def hedge_delay_for(self, provider) -> float:
+        p95 = self.latency[provider].percentile(0.95)
+        delay = self.hedge_delay if p95 is None else p95
+        return min(max(delay, self.min_hedge_delay), self.max_hedge_delay)
+
+    def stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'hedges': self.hedges,
+            'rate_limited': self.rate_limited,
+            'coalesced': self._flights.coalesced + self._async_flights.coalesced,
+            'providers': {
+                provider.name: {
+                    'state': self.breakers[provider].state,
+                    'times_opened': self.breakers[provider].times_opened,
+                    'p95_ms': self._ms(self.latency[provider].percentile(0.95)),
+                    'wins': self.wins[provider.name],
+                } for provider in self.providers
+            },
+        }
+
+    def collect_metrics(self) -> List:
+        """Scrape-time families for /metrics; breakers belong to this dispatcher"""
+        states = (CircuitBreaker.CLOSED, CircuitBreaker.HALF_OPEN, CircuitBreaker.OPEN)
+        state_samples, opened = [], []
+        for provider in self.providers:
+            labels = {'dispatcher': self.name, 'provider': provider.name}
+            state_samples.append((labels, states.index(self.breakers[provider].state)))
+            opened.append((labels, self.breakers[provider].times_opened))
+        return [
+            ('gabe_llm_circuit_state', 'gauge', 'Circuit breaker state (0 closed, 1 half-open, 2 open)', state_samples),
+            ('gabe_llm_circuit_opened_total', 'counter', 'Times the circuit breaker opened', opened),
+            ('gabe_llm_coalesced_total', 'counter', 'Requests that shared an identical in-flight call',
+             [({'dispatcher': self.name}, self._flights.coalesced + self._async_flights.coalesced)]),
+        ]
+
+    def _estimate_tokens(self, system_prompt: str, messages: List[Dict], options: Dict) -> int:
+        prompt = count_tokens(system_prompt) + sum(count_tokens(message.get('content', '')) for message in messages)
+        return prompt + (options.get('max_tokens') or LLM_COMPLETION_TOKEN_ESTIMATE)
+
+    def _usage(self, completion) -> Optional[int]:
+        if completion.prompt_tokens is None or completion.completion_tokens is None:
+            return None
+        return completion.prompt_tokens + completion.completion_tokens
+
+    def _call_seconds(self, result, started: float) -> float:
+        """Provider time for the hedge p95: the provider's own measurement when
+        there is one, so time spent queued for quota isn't counted"""
+        measured = getattr(result, 'latency_ms', None)
+        if measured is None:
+            measured = getattr(result, 'ttft_ms', None)
+        return measured / 1000 if measured is not None else time.monotonic() - started
+
+    def _flight_key(self, system_prompt: str, messages: List[Dict], options: Dict) -> str:
+        raw = json.dumps([system_prompt, messages, options], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _ms(self, seconds: Optional[float]) -> Optional[float]:
+        return None if seconds is None else round(seconds * 1000, 1)
+
+    def _record_call(self, provider, method: str, outcome: str, result=None, started: float = 0.0) -> float:
+        """Count one finished provider call; returns its latency for successful ones"""
+        metrics.LLM_CALLS.inc(provider=provider.name, outcome=outcome)
+        if outcome != 'ok':
+            return 0.0
+        seconds = self._call_seconds(result, started)
+        metrics.LLM_LATENCY.observe(seconds, provider=provider.name, method=method)
+        # Streams report usage once consumed; TokenStream counts those itself
+        if method != 'stream':
+            metrics.record_usage(provider.name, result.prompt_tokens, result.completion_tokens)
+        return seconds
+
+    def _launch(self, provider, call: Callable, race: '_Race', method: str = 'complete'):
+        """Submit one provider call; its breaker and latency are updated when it
+        finishes, even if it lost the race and nobody reads the result"""
+        started = time.monotonic()
+        future = (self._executor or _get_executor()).submit(call, provider)
+
+        def settle(done):
+            if done.cancelled():
+                self.breakers[provider].release_probe()
+                self._record_call(provider, method, 'cancelled')
+                return
+            error = done.exception()
+            if isinstance(error, RateLimitExceeded):
+                # Out of quota says nothing about the provider's health
+                self.rate_limited += 1
+                self.breakers[provider].release_probe()
+                self._record_call(provider, method, 'rate_limited')
+                return
+            if error is not None:
+                self.breakers[provider].record_failure()
+                self._record_call(provider, method, 'error')
+                logging.warning(f"{provider.name} call failed: {error}")
+                return
+            self.breakers[provider].record_success()
+            self.latency[provider].record(self._record_call(provider, method, 'ok', done.result(), started))
+            race.discard_if_lost(done)
+
+        future.add_done_callback(settle)
+        return future
+
+    def _select(self):
+        """Primary and optional backup among providers whose circuit allows a call"""
+        self.requests += 1
+        primary = backup = None
+        for provider in self.providers:
+            if self.breakers[provider].allow_request():
+                if primary is None:
+                    primary = provider
+                else:
+                    backup = provider
+                    break
+        if primary is None:
+            if not self.providers:
+                raise ProviderUnavailableError("No AI provider configured")
+            raise ProviderUnavailableError("Every AI provider circuit is open")
+        return primary, backup
+
+    def _dispatch(self, call: Callable, discard: Optional[Callable] = None, method: str = 'complete'):
+        primary, backup = self._select()
+        race = _Race(discard)
+        started = time.monotonic()
+        deadline = started + self.timeout
+        hedge_at = started + self.hedge_delay_for(primary)
+        pending = {self._launch(primary, call, race, method): primary}
+        last_error = None
+
+        try:
+            while pending or backup is not None:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                # Start the backup when the primary is slow or has already failed
+                if backup is not None and (not pending or now >= hedge_at):
+                    self._record_hedge(primary, backup, now - started, bool(pending))
+                    pending[self._launch(backup, call, race, method)] = backup
+                    backup = None
+                    continue
+
+                wait_until = hedge_at if backup is not None else deadline
+                done, _ = wait(list(pending), timeout=max(wait_until - now, 0), return_when=FIRST_COMPLETED)
+                for future in done:
+                    provider = pending.pop(future)
+                    if future.exception() is not None:
+                        last_error = future.exception()
+                        continue
+                    race.declare(future)
+                    self._record_win(provider, primary)
+                    return future.result()
+        finally:
+            if backup is not None:
+                self.breakers[backup].release_probe()
+            # Calls already running can't be interrupted; their results are
+            # discarded when they finish
+            for future in pending:
+                future.cancel()
+            race.declare_over(pending)
+
+        metrics.LLM_REQUESTS.inc(result='none')
+        if pending:
+            raise ProviderUnavailableError(f"No AI provider answered within {self.timeout}s")
+        raise ProviderUnavailableError(f"Every AI provider failed: {last_error}")
+
+    def _semaphore(self, provider) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphores = self._semaphores.get(loop)
+        if semaphores is None:
+            semaphores = self._semaphores[loop] = {}
+        if provider not in semaphores:
+            semaphores[provider] = asyncio.Semaphore(self.max_concurrent)
+        return semaphores[provider]
+
+    async def _attempt(self, provider, call: Callable):
+        """One async provider call under that provider's concurrency cap"""
+        async with self._semaphore(provider):
+            started = time.monotonic()
+            try:
+                result = await call(provider)
+            except asyncio.CancelledError:
+                self.breakers[provider].release_probe()
+                self._record_call(provider, 'complete', 'cancelled')
+                raise
+            except RateLimitExceeded:
+                self.rate_limited += 1
+                self.breakers[provider].release_probe()
+                self._record_call(provider, 'complete', 'rate_limited')
+                raise
+            except Exception as e:
+                self.breakers[provider].record_failure()
+                self._record_call(provider, 'complete', 'error')
+                logging.warning(f"{provider.name} call failed: {e}")
+                raise
+        self.breakers[provider].record_success()
+        self.latency[provider].record(self._record_call(provider, 'complete', 'ok', result, started))
+        return result
+
+    async def _adispatch(self, call: Callable):
+        primary, backup = self._select()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.timeout
+        hedge_at = started + self.hedge_delay_for(primary)
+        pending = {asyncio.ensure_future(self._attempt(primary, call)): primary}
+        last_error = None
+
+        try:
+            while pending or backup is not None:
+                now = loop.time()
+                if now >= deadline:
+                    break
+                if backup is not None and (not pending or now >= hedge_at):
+                    self._record_hedge(primary, backup, now - started, bool(pending))
+                    pending[asyncio.ensure_future(self._attempt(backup, call))] = backup
+                    backup = None
+                    continue
+
+                wait_until = hedge_at if backup is not None else deadline
+                done, _ = await asyncio.wait(list(pending), timeout=max(wait_until - now, 0),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    self._record_win(provider, primary)
+                    return task.result()
+        finally:
+            # Also runs when the caller itself is cancelled (client went away)
+            if backup is not None:
+                self.breakers[backup].release_probe()
+            for task in pending:
+                task.cancel()
+
+        metrics.LLM_REQUESTS.inc(result='none')
+        if pending:
+            raise ProviderUnavailableError(f"No AI provider answered within {self.timeout}s")
+        raise ProviderUnavailableError(f"Every AI provider failed: {last_error}")
+
+    def _record_hedge(self, primary, backup, elapsed: float, primary_running: bool):
+        if primary_running:
+            self.hedges += 1
+            logging.info(f"Hedging {primary.name} with {backup.name} after {elapsed:.2f}s")
+        metrics.LLM_HEDGES.inc(reason='slow' if primary_running else 'failed')
+
+    def _record_win(self, provider, primary):
+        self.wins[provider.name] += 1
+        metrics.LLM_REQUESTS.inc(result='primary' if provider is primary else 'fallback')
+
+
+
+class _Race:
+    """Tracks the winner of one dispatch so late finishers can be discarded exactly once"""
+
+    def __init__(self, discard: Optional[Callable]):
+        self.discard = discard
+        self.over = False
+        self.winner = None
+        self._discarded = set()
+        self._lock = threading.Lock()
+
+    def declare(self, future):
+        with self._lock:
+            self.winner = future
+
+    def declare_over(self, losers):
+        with self._lock:
+            self.over = True
+        for future in losers:
+            if future.done() and not future.cancelled():
+                self.discard_if_lost(future)
+
+    def discard_if_lost(self, future):
+        with self._lock:
+            if not self.over or future is self.winner or id(future) in self._discarded:
+                return
+            self._discarded.add(id(future))
+        if self.discard and future.exception() is None:
+            try:
+                self.discard(future.result())
+            except Exception as e:
+                logging.warning(f"Could not discard losing provider result: {e}")
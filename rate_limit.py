@@ -0,0 +1,235 @@
+"""
+Provider rate limiting and in-flight request coalescing
+Token buckets keep each provider under its requests-per-minute and
+tokens-per-minute quota; single-flight makes identical concurrent requests
+share one provider call
+"""
+
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+import metrics
+
+# Longest a call may queue for quota before it is rejected outright
+LLM_RATE_LIMIT_MAX_WAIT = float(os.environ.get('LLM_RATE_LIMIT_MAX_WAIT', '2.0'))
+# Completion size assumed when the caller doesn't set max_tokens
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.environ.get('LLM_COMPLETION_TOKEN_ESTIMATE', '400'))
+
+
+class RateLimitExceeded(Exception):
+    """The provider's quota would not free up within the allowed wait"""
+
+    def __init__(self, provider: str, wait: float):
+        super().__init__(f"{provider} rate limit: no slot free within {wait:.2f}s")
+        self.provider = provider
+        self.wait = wait
+
+
+class TokenBucket:
+    """Refills at `per_minute` / 60 per second up to `capacity`.
+
+    Reservations are taken immediately and may push the level below zero;
+    the returned wait is how long the caller must sleep before its turn, so
+    callers queue in arrival order without a separate queue.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._clock = clock
+        self._level = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float, max_wait: float) -> Optional[float]:
+        """Seconds to wait for `amount`, or None (nothing taken) if longer than max_wait"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            wait = max(0.0, (amount - self._level) / self.rate)
+            if wait > max_wait:
+                return None
+            self._level -= amount
+            return wait
+
+    def refund(self, amount: float):
+        with self._lock:
+            self._refill()
+            self._level = min(self.capacity, self._level + amount)
+
+    def charge(self, amount: float):
+        """Take tokens after the fact (usage above the estimate); may go into debt"""
+        with self._lock:
+            self._refill()
+            self._level -= amount
+
+    @property
+    def level(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._level
+
+    def _refill(self):
+        now = self._clock()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class ProviderRateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one provider; 0 disables either"""
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.requests = TokenBucket(rpm, clock=clock) if rpm else None
+        self.tokens = TokenBucket(tpm, clock=clock) if tpm else None
+        self.rejected = 0
+        self.waited = 0
+
+    @classmethod
+    def from_env(cls, name: str) -> 'ProviderRateLimiter':
+        prefix = f"LLM_{name.upper()}"
+        return cls(name, float(os.environ.get(f'{prefix}_RPM', '0')), float(os.environ.get(f'{prefix}_TPM', '0')))
+
+    def reserve(self, tokens: int, max_wait: float = LLM_RATE_LIMIT_MAX_WAIT) -> float:
+        """Reserve one request and `tokens`; returns the wait or raises RateLimitExceeded"""
+        request_wait = self.requests.reserve(1, max_wait) if self.requests else 0.0
+        if request_wait is None:
+            return self._reject(max_wait)
+        token_wait = self.tokens.reserve(tokens, max_wait) if self.tokens else 0.0
+        if token_wait is None:
+            if self.requests:
+                self.requests.refund(1)
+            return self._reject(max_wait)
+        wait = max(request_wait, token_wait)
+        if wait:
+            self.waited += 1
+        return wait
+
+    def acquire(self, tokens: int, max_wait: float = LLM_RATE_LIMIT_MAX_WAIT):
+        """Blocking reserve: sleeps until the reserved slot comes up"""
+        wait = self.reserve(tokens, max_wait)
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int, max_wait: float = LLM_RATE_LIMIT_MAX_WAIT):
+        wait = self.reserve(tokens, max_wait)
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Give the slot back to whoever is queued behind us
+                self.release(tokens)
+                raise
+
+    def release(self, tokens: int):
+        """Return a reservation that was never used"""
+        if self.requests:
+            self.requests.refund(1)
+        if self.tokens:
+            self.tokens.refund(tokens)
+
+    def settle(self, estimated: int, actual: Optional[int]):
+        """Correct the token bucket once the provider reports real usage"""
+        if not self.tokens or actual is None:
+            return
+        if actual > estimated:
+            self.tokens.charge(actual - estimated)
+        elif actual < estimated:
+            self.tokens.refund(estimated - actual)
+
+    def _reject(self, max_wait: float):
+        self.rejected += 1
+        raise RateLimitExceeded(self.name, max_wait)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str) -> ProviderRateLimiter:
+    """Process-wide limiter per provider name, so every dispatcher shares the quota"""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = ProviderRateLimiter.from_env(name)
+        return limiter
+
+
+def collect_metrics() -> List:
+    """Scrape-time quota counters for every provider limiter in the process"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [
+        ('gabe_llm_rate_limit_rejected_total', 'counter', 'Calls rejected for lack of provider quota',
+         [({'provider': limiter.name}, limiter.rejected) for limiter in limiters]),
+        ('gabe_llm_rate_limit_queued_total', 'counter', 'Calls that waited for provider quota',
+         [({'provider': limiter.name}, limiter.waited) for limiter in limiters]),
+    ]
+
+
+metrics.REGISTRY.register_collector(collect_metrics)
+
+
+class SingleFlight:
+    """Identical concurrent calls (same key) share the first caller's result"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class AsyncSingleFlight:
+    """Single-flight for coroutines. The shared call is cancelled only when
+    every caller waiting on it has been cancelled."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, list] = {}  # key -> [task, waiters]
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable]) -> Any:
+        # Keys are scoped to the running loop; tasks can't be shared across loops
+        key = (id(asyncio.get_running_loop()), key)
+        entry = self._calls.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(func())
+            entry = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        except asyncio.CancelledError:
+            if not entry[0].done() and entry[1] == 1:
+                entry[0].cancel()
+            raise
+        finally:
+            entry[1] -= 1
@@ -0,0 +1,220 @@
+"""
+Response cache for repeatable LLM answers (prayers, scripture explanations)
+Keeps a few answer variants per normalized request so popular requests are
+served without a provider call and repeats don't read word for word the same.
+Optionally persisted to SQLite so the cache survives restarts.
+"""
+
+import os
+import re
+import time
+import hashlib
+import inspect
+import logging
+import sqlite3
+import threading
+import functools
+from typing import Callable, Dict, List, Optional
+
+import metrics
+from ttl_cache import TTLCache
+
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', '1').lower() not in ('0', 'false', 'off')
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', '2048'))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', str(7 * 24 * 3600)))
+RESPONSE_CACHE_VARIANTS = int(os.environ.get('RESPONSE_CACHE_VARIANTS', '3'))
+# Empty keeps the cache in memory only
+RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH', '')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_EDGE_PUNCTUATION_RE = re.compile(r'^[^\w]+|[^\w]+$')
+
+
+def normalize_request(text: str) -> str:
+    """Case, spacing and trailing punctuation don't change the answer"""
+    text = _WHITESPACE_RE.sub(' ', (text or '').lower()).strip()
+    return _EDGE_PUNCTUATION_RE.sub('', text)
+
+
+class _Entry:
+    """Variants collected for one request key"""
+    __slots__ = ('variants', 'created_at', 'served')
+
+    def __init__(self, variants: Optional[List[str]] = None, created_at: Optional[float] = None):
+        self.variants = variants or []
+        self.created_at = created_at if created_at is not None else time.time()
+        self.served = 0
+
+
+class ResponseCache:
+    """LRU + TTL cache of answer variants, with optional SQLite persistence.
+
+    A key counts as a miss until it holds `variants` answers, so the first few
+    identical requests still reach a provider and build up variety; after that
+    variants are served in rotation.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 variants: int = RESPONSE_CACHE_VARIANTS, path: Optional[str] = RESPONSE_CACHE_PATH):
+        self.ttl = ttl
+        self.variants = max(1, variants)
+        # Expiry is tracked per entry from its first answer, not the LRU's own TTL
+        self._entries = TTLCache(max_entries=max_entries, ttl=None)
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._open(path)
+
+    def key(self, kind: str, text: str, age_range: Optional[str] = None, prompt_version: str = '1',
+            user_name: Optional[str] = None) -> str:
+        """Answers are only shared between requests for the same name; anonymous
+        requests share their own entry"""
+        raw = f"{kind}|{prompt_version}|{age_range or ''}|{normalize_request(user_name or '')}|{normalize_request(text)}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """A cached variant, or None when the key still needs more answers"""
+        with self._lock:
+            entry = self._load(key)
+            if entry is None or len(entry.variants) < self.variants:
+                self.misses += 1
+                return None
+            self.hits += 1
+            answer = entry.variants[entry.served % len(entry.variants)]
+            entry.served += 1
+            return answer
+
+    def add(self, key: str, answer: str):
+        """Store another variant for `key`; extra variants beyond the limit are ignored"""
+        if not answer:
+            return
+        with self._lock:
+            entry = self._load(key)
+            if entry is None:
+                entry = _Entry()
+                self._entries.set(key, entry)
+            if len(entry.variants) >= self.variants or answer in entry.variants:
+                return
+            entry.variants.append(answer)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO response_cache (key, variant, answer, created_at) VALUES (?, ?, ?, ?)",
+                        (key, len(entry.variants) - 1, answer, entry.created_at)
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logging.warning(f"Could not persist cached response: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM response_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self._entries.evictions,
+            'persistent': self._db is not None,
+        }
+
+    def _load(self, key: str) -> Optional[_Entry]:
+        """Entry from memory, falling back to SQLite; expired entries are dropped"""
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            rows = self._db.execute(
+                "SELECT answer, created_at FROM response_cache WHERE key = ? ORDER BY variant", (key,)
+            ).fetchall()
+            if rows:
+                entry = _Entry([row[0] for row in rows], rows[0][1])
+                self._entries.set(key, entry)
+        if entry is not None and time.time() - entry.created_at > self.ttl:
+            self._entries.pop(key)
+            if self._db is not None:
+                self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._db.commit()
+            return None
+        return entry
+
+    def _open(self, path: str):
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT NOT NULL, variant INTEGER NOT NULL, answer TEXT NOT NULL, "
+                "created_at REAL NOT NULL, PRIMARY KEY (key, variant))"
+            )
+            self._db.execute("DELETE FROM response_cache WHERE created_at < ?", (time.time() - self.ttl,))
+            self._db.commit()
+            logging.info(f"Response cache persisted to {path}")
+        except sqlite3.Error as e:
+            logging.warning(f"Response cache falling back to memory only, could not open {path}: {e}")
+            self._db = None
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache"""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache()
+                metrics.REGISTRY.register_collector(lambda: metrics.cache_family('response', _response_cache.stats()))
+    return _response_cache
+
+
+def cached_response(kind: str, prompt_version: str = '1', text_param: Optional[str] = None,
+                    age_param: str = 'age_range', name_param: str = 'user_name') -> Callable:
+    """Decorate a GabeAI method so identical requests are answered from the cache.
+
+    The request text is `text_param`, or the first argument after self. The
+    user's name is part of the key, so an answer that mentions it (or a
+    nickname, or just the first name) is only ever served back for that same
+    name. Answers are stored verbatim: rewriting names would also rewrite
+    "Mark 10:27" for a user called Mark. Calls that pass anything else, such
+    as conversation history, are personal and bypass the cache. Bump
+    `prompt_version` when the prompt behind the method changes.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        parameters = list(signature.parameters)
+        request_param = text_param or (parameters[1] if len(parameters) > 1 else None)
+        keyed_params = {parameters[0] if parameters else None, request_param, age_param, name_param}
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not RESPONSE_CACHE_ENABLED or request_param is None:
+                return func(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            text = bound.arguments.get(request_param)
+            if not isinstance(text, str):
+                return func(self, *args, **kwargs)
+            # History or other context makes the answer about this conversation
+            if any(value for name, value in bound.arguments.items() if name not in keyed_params):
+                return func(self, *args, **kwargs)
+
+            cache = get_response_cache()
+            user_name = bound.arguments.get(name_param)
+            key = cache.key(kind, text, bound.arguments.get(age_param), prompt_version,
+                            user_name if isinstance(user_name, str) else None)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+
+            answer = func(self, *args, **kwargs)
+            if isinstance(answer, str) and answer:
+                cache.add(key, answer)
+            return answer
+
+        return wrapper
+    return decorator
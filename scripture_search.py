@@ -0,0 +1,283 @@
+"""
+Full-text and reference search over the scripture content store
+An in-memory inverted index with BM25 ranking and prefix matching, so a
+request that names a verse we already hold can be answered without an LLM
+"""
+
+import os
+import re
+import math
+import bisect
+import inspect
+import threading
+import functools
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import metrics
+from scripture_store import Reference, Verse, find_references, get_scripture_store
+
+SCRIPTURE_LOCAL_ANSWERS = os.environ.get('SCRIPTURE_LOCAL_ANSWERS', '1').lower() not in ('0', 'false', 'off')
+# Fewest words a quoted phrase needs before it's trusted to identify a verse
+SCRIPTURE_MIN_PHRASE_WORDS = int(os.environ.get('SCRIPTURE_MIN_PHRASE_WORDS', '4'))
+
+STOPWORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'has', 'have', 'he', 'his', 'i',
+    'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or', 'so', 'that', 'the', 'their', 'them', 'they',
+    'this', 'to', 'was', 'we', 'were', 'will', 'with', 'you', 'your',
+})
+# Words around a reference or quote that still mean "just explain this verse"
+REQUEST_WORDS = frozenset({
+    'explain', 'explanation', 'meaning', 'mean', 'means', 'what', 'does', 'do', 'verse', 'verses', 'scripture',
+    'passage', 'tell', 'about', 'read', 'show', 'say', 'says', 'please', 'can', 'could', 'us', 'bible',
+    'where', 'which', 'from', 'quote', 'find', 'look', 'up', 'whats', "what's",
+})
+# A prefix-only match ('strength' for 'strengthens') counts for less than the exact word
+PREFIX_WEIGHT = 0.6
+# Most vocabulary terms one query prefix expands to
+MAX_PREFIX_TERMS = 32
+# Shortest query word that is expanded as a prefix
+MIN_PREFIX_LENGTH = 3
+
+# Theme labels starting with these keep their capital mid-sentence
+PROPER_NOUNS = frozenset({'God', "God's", 'Jesus', 'Lord', "Lord's", 'Christ'})
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+LOCAL_ANSWERS = metrics.REGISTRY.counter(
+    'gabe_scripture_local_answers_total', 'Scripture requests answered from the local index', ('match',))
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words with possessives folded ("God's" -> "god")"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower().replace('’', "'")):
+        if token.endswith("'s"):
+            token = token[:-2]
+        tokens.append(token.replace("'", ''))
+    return tokens
+
+
+class SearchHit:
+    """One ranked verse; `match` is 'reference', 'chapter', 'phrase' or 'text'"""
+    __slots__ = ('verse', 'score', 'match')
+
+    def __init__(self, verse: Verse, score: float, match: str):
+        self.verse = verse
+        self.score = score
+        self.match = match
+
+    def __repr__(self):
+        return f"SearchHit({self.verse.reference!r}, {self.score:.2f}, {self.match!r})"
+
+
+class ScriptureIndex:
+    """Inverted index over verse text.
+
+    Each posting holds a verse's precomputed BM25 impact for the term
+    (k1=1.2, b=0.75), so a query only sums floats. Reference queries never
+    touch the postings: they are dict lookups on the normalized reference or
+    its chapter, and quoted phrases are checked only against the verses
+    holding the phrase's rarest word.
+    """
+
+    def __init__(self, verses: Sequence[Verse], k1: float = 1.2, b: float = 0.75):
+        self.verses = tuple(verses)
+        self.k1 = k1
+        self.b = b
+        self._by_reference: Dict[str, int] = {}
+        self._by_chapter: Dict[str, List[int]] = {}
+        self._phrases: List[str] = []
+        frequencies: Dict[str, Dict[int, int]] = {}
+        lengths = []
+
+        for doc, verse in enumerate(self.verses):
+            tokens = tokenize(verse.text)
+            # Padded so phrase checks match whole words only
+            self._phrases.append(f" {' '.join(tokens)} ")
+            terms = [token for token in tokens if token not in STOPWORDS]
+            lengths.append(len(terms))
+            for term in terms:
+                postings = frequencies.setdefault(term, {})
+                postings[doc] = postings.get(doc, 0) + 1
+
+            references = find_references(verse.reference)
+            if references:
+                reference = references[0]
+                self._by_reference.setdefault(str(reference).lower(), doc)
+                self._by_chapter.setdefault(reference.chapter_key, []).append(doc)
+
+        count = len(self.verses)
+        average_length = (sum(lengths) / count) if count else 0.0
+        norms = [k1 * (1 - b + b * length / (average_length or 1)) for length in lengths]
+        self._postings: Dict[str, Dict[int, float]] = {}
+        for term, postings in frequencies.items():
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            self._postings[term] = {doc: idf * tf * (k1 + 1) / (tf + norms[doc]) for doc, tf in postings.items()}
+        self._vocabulary = sorted(self._postings)
+
+    def lookup(self, reference: str) -> Optional[Verse]:
+        """The verse for an exact reference in any common spelling ('Ps 34:18')"""
+        references = find_references(reference)
+        if not references:
+            return None
+        doc = self._by_reference.get(str(references[0]).lower())
+        return self.verses[doc] if doc is not None else None
+
+    def search(self, query: str, limit: int = 5) -> List[SearchHit]:
+        """Verses for a reference, chapter or free-text query, best first.
+
+        A query that quotes a verse's wording returns only the verses that
+        contain it word for word.
+        """
+        references = find_references(query)
+        if references:
+            return self._reference_hits(references)[:limit]
+
+        words = tokenize(query)
+        terms = [word for word in words if word not in STOPWORDS]
+        if not terms:
+            return []
+        hits = self._phrase_hits(words, terms) if len(words) > 1 else []
+        if not hits:
+            hits = [SearchHit(self.verses[doc], score, 'text') for doc, score in self._scores(terms).items()]
+        hits.sort(key=lambda hit: -hit.score)
+        return hits[:limit]
+
+    def best_match(self, query: str) -> Optional[SearchHit]:
+        """A single verse the request is clearly about, or None.
+
+        The request must be just a reference or a quoted phrase, plus words
+        like "explain" or "what does ... mean". Anything more personal is
+        left to the LLM.
+        """
+        references = find_references(query)
+        if len(references) == 1 and references[0].verse is not None:
+            reference = references[0]
+            rest = query[:reference.start] + ' ' + query[reference.stop:]
+            doc = self._by_reference.get(str(reference).lower())
+            if doc is not None and self._only_request_words(rest):
+                return SearchHit(self.verses[doc], 100.0, 'reference')
+            return None
+        if references:
+            return None
+
+        # Trim "what does" / "mean" from the ends; words inside the quote stay
+        words = tokenize(query)
+        while words and (words[0] in REQUEST_WORDS or words[0] in STOPWORDS):
+            words.pop(0)
+        while words and (words[-1] in REQUEST_WORDS or words[-1] in STOPWORDS):
+            words.pop()
+        if len(words) < SCRIPTURE_MIN_PHRASE_WORDS:
+            return None
+        terms = [word for word in words if word not in STOPWORDS]
+        hits = self._phrase_hits(words, terms)
+        return max(hits, key=lambda hit: hit.score) if hits else None
+
+    def _reference_hits(self, references: List[Reference]) -> List[SearchHit]:
+        hits = []
+        for reference in references:
+            if reference.verse is not None:
+                doc = self._by_reference.get(str(reference).lower())
+                if doc is not None:
+                    hits.append(SearchHit(self.verses[doc], 100.0, 'reference'))
+            else:
+                hits.extend(SearchHit(self.verses[doc], 50.0, 'chapter')
+                            for doc in self._by_chapter.get(reference.chapter_key, ()))
+        return hits
+
+    def _scores(self, terms: List[str]) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        for term in terms:
+            # Best-scoring expansion per verse, so one short prefix can't
+            # add up across many similar words
+            term_scores: Dict[int, float] = {}
+            for expansion, weight in self._expand(term):
+                for doc, impact in self._postings[expansion].items():
+                    score = weight * impact
+                    if score > term_scores.get(doc, 0.0):
+                        term_scores[doc] = score
+            for doc, score in term_scores.items():
+                scores[doc] = scores.get(doc, 0.0) + score
+        return scores
+
+    def _phrase_hits(self, words: List[str], terms: List[str]) -> List[SearchHit]:
+        postings = [self._postings.get(term) for term in terms]
+        if not all(postings):
+            return []
+        phrase = f" {' '.join(words)} "
+        rarest = min(postings, key=len)
+        return [SearchHit(self.verses[doc], sum(p.get(doc, 0.0) for p in postings), 'phrase')
+                for doc in rarest if phrase in self._phrases[doc]]
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """The term itself plus vocabulary words it is a prefix of"""
+        expansions = [(term, 1.0)] if term in self._postings else []
+        if len(term) >= MIN_PREFIX_LENGTH:
+            position = bisect.bisect_right(self._vocabulary, term)
+            while position < len(self._vocabulary) and len(expansions) < MAX_PREFIX_TERMS:
+                candidate = self._vocabulary[position]
+                if not candidate.startswith(term):
+                    break
+                expansions.append((candidate, PREFIX_WEIGHT))
+                position += 1
+        return expansions
+
+    def _only_request_words(self, text: str) -> bool:
+        return all(word in REQUEST_WORDS or word in STOPWORDS for word in tokenize(text))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_scripture_index() -> ScriptureIndex:
+    """Process-wide index over every verse in the content store"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ScriptureIndex(get_scripture_store().verses)
+    return _index
+
+
+def search_scripture(query: str, limit: int = 5) -> List[SearchHit]:
+    return get_scripture_index().search(query, limit)
+
+
+def format_local_answer(verse: Verse, user_name: Optional[str] = None) -> str:
+    """A short answer built only from local content"""
+    themes = [theme if theme.split()[0] in PROPER_NOUNS else theme[0].lower() + theme[1:]
+              for theme in get_scripture_store().themes_of(verse)]
+    answer = f'{verse.reference} says: "{verse.text}"'
+    if themes:
+        answer += f"\n\nIt's a verse about {' and '.join(themes)}."
+    friend = f", {user_name}" if user_name else ''
+    return answer + f" Want to talk about what it means for you right now{friend}? 💙"
+
+
+def local_scripture_first(text_param: Optional[str] = None, name_param: str = 'user_name') -> Callable:
+    """Decorate a GabeAI method so a request that only names a verse we hold
+    (by reference or by quoting it) is answered from the index, with no
+    provider call. The request text is `text_param`, or the first argument
+    after self."""
+    def decorator(func):
+        signature = inspect.signature(func)
+        parameters = list(signature.parameters)
+        request_param = text_param or (parameters[1] if len(parameters) > 1 else None)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not SCRIPTURE_LOCAL_ANSWERS or request_param is None:
+                return func(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            text = bound.arguments.get(request_param)
+            if isinstance(text, str):
+                hit = get_scripture_index().best_match(text)
+                if hit is not None:
+                    LOCAL_ANSWERS.inc(match=hit.match)
+                    user_name = bound.arguments.get(name_param)
+                    return format_local_answer(hit.verse, user_name if isinstance(user_name, str) else None)
+            return func(self, *args, **kwargs)
+
+        return wrapper
+    return decorator
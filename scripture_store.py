@@ -0,0 +1,357 @@
+"""
+Shared scripture content store
+Verses, devotions, prayer challenges and Bible studies used by DropOfHope,
+SpiritualFeatures and GamifiedSpiritualFeatures, built once per process.
+Each verse exists once however many features use it; lookups by reference,
+theme and mood are dict hits.
+"""
+
+import re
+import sys
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# (reference, text, theme) in DropOfHope's rotation order
+HOPE_VERSES = (
+    ("Jeremiah 29:11", "For I know the plans I have for you, declares the Lord, plans to prosper you and not to harm you, to give you hope and a future.", "hope"),
+    ("Isaiah 41:10", "Fear not, for I am with you; be not dismayed, for I am your God; I will strengthen you, I will help you, I will uphold you with my righteous right hand.", "strength"),
+    ("Philippians 4:13", "I can do all things through Christ who strengthens me.", "strength"),
+    ("Romans 8:28", "And we know that in all things God works for the good of those who love him, who have been called according to his purpose.", "purpose"),
+    ("Psalm 23:4", "Even though I walk through the valley of the shadow of death, I will fear no evil, for you are with me; your rod and your staff, they comfort me.", "comfort"),
+    ("Matthew 11:28", "Come to me, all you who are weary and burdened, and I will give you rest.", "rest"),
+    ("Psalm 46:1", "God is our refuge and strength, an ever-present help in trouble.", "strength"),
+    ("1 Peter 5:7", "Cast all your anxiety on him because he cares for you.", "anxiety"),
+    ("Joshua 1:9", "Be strong and courageous. Do not be afraid; do not be discouraged, for the Lord your God will be with you wherever you go.", "courage"),
+    ("Psalm 139:14", "I praise you because I am fearfully and wonderfully made; your works are wonderful, I know that full well.", "identity"),
+)
+
+# mood -> (reference, text, theme) for SpiritualFeatures.get_scripture_recommendation.
+# Only "sad" is here because it is the only mood the original scripture
+# database in spiritual_features.py had; by_mood() covers the others
+MOOD_VERSES = {
+    "sad": (
+        ("Psalm 34:18", "The Lord is close to the brokenhearted and saves those who are crushed in spirit.", "God's comfort in sadness"),
+        ("Psalm 147:3", "He heals the brokenhearted and binds up their wounds.", "Divine healing"),
+        ("Psalm 30:5", "Weeping may stay for the night, but rejoicing comes in the morning.", "Hope after sorrow"),
+        ("1 Peter 5:7", "Cast all your anxiety on him because he cares for you.", "God's care"),
+    ),
+}
+
+# Mood used when a mood has no verses of its own
+DEFAULT_MOOD = "hopeful"
+
+DEVOTIONS = {
+    'morning': {
+        'title': '🌅 MORNING DEVOTION: "Start with Stillness"',
+        'greeting': 'Good morning, {name}. Time to pray and start your day with God.',
+        'verse_reference': 'Psalm 46:10',
+        'verse_text': 'Be still, and know that I am God.',
+        'word': 'Before the day demands your attention, God invites you to stillness — not silence, but surrender. In the quiet, He strengthens you. You don\'t need to rush — you need to rest in Him first.',
+        'application': 'Take 3 deep breaths and whisper, "God, I trust You today." That moment of peace can shape your entire day.',
+        'prayer': 'Heavenly Father, Thank You for the gift of today. As I step into the hours ahead, I choose stillness before You. Quiet my heart from anxiety and noise. Help me walk with peace, speak with kindness, and act with purpose. Let my choices reflect Your wisdom and my heart reflect Your love. Be with me in every moment, and lead me where You want me to go. In Jesus\' name, Amen.',
+        'closing': '📖 GABE is always by your side — you are never alone.'
+    },
+    'evening': {
+        'title': '🌙 EVENING DEVOTION: "Lay It Down"',
+        'greeting': 'Good evening, {name}. You\'ve made it through the day. Let\'s pause, reflect, and pray together.',
+        'verse_reference': '1 Peter 5:7',
+        'verse_text': 'Cast all your anxiety on Him because He cares for you.',
+        'word': 'You weren\'t meant to carry it all. God sees the pressure, the thoughts, the unspoken worries — and He\'s asking you to hand them over. Lay it down tonight. Rest in Him, not just sleep.',
+        'application': 'Think of one thing that\'s weighing on your heart. Whisper it to God. Then say, "I release it to You." That\'s how peace begins.',
+        'prayer': 'Lord, Thank You for walking with me today — through the joys, the stress, the quiet moments, and the mess. As night falls, I place my thoughts, my worries, and my plans in Your hands. Refresh my body, renew my mind, and fill my heart with peace. Watch over me and those I love. In Jesus\' name, Amen.',
+        'closing': '💬 GABE is always by your side — you are never alone.'
+    }
+}
+
+PRAYER_CHALLENGES = (
+    'Pray for someone who has hurt you and ask God to heal their heart',
+    'Write a prayer of gratitude for three specific things from this week',
+    'Pray for a world leader or someone in authority',
+    'Ask God to show you how to serve someone in need today',
+    'Pray for wisdom in a decision you\'re facing',
+    'Thank God for His faithfulness in a difficult season of your life',
+    'Pray for peace in a conflict situation you know about',
+    'Ask God to help you forgive yourself for something you regret',
+)
+
+BIBLE_STUDIES = {
+    'trusting_god': {
+        'id': 'trusting_god',
+        'title': 'Trusting God in Difficult Times',
+        'description': 'Learn to trust God\'s goodness when life feels uncertain',
+        'sessions': 3,
+        'duration': '10-15 min each',
+        'xp_reward': 5,
+        'sessions_data': [
+            {
+                'session_number': 1,
+                'title': 'God\'s Faithfulness in the Past',
+                'scripture_reference': 'Psalm 77:11-12',
+                'scripture_text': 'I will remember the deeds of the Lord; yes, I will remember your miracles of long ago. I will consider all your works and meditate on all your mighty deeds.',
+                'questions': [
+                    'When have you seen God\'s faithfulness in your life before?',
+                    'How can remembering God\'s past goodness help you trust Him today?',
+                    'What "mighty deeds" of God do you want to remember more often?'
+                ],
+                'xp_reward': 4
+            },
+        ],
+    },
+}
+
+# Canonical book name -> abbreviations and alternate names. Two-letter forms
+# that are also English words ("is", "am") are left out because references
+# are also picked out of free text.
+BOOKS = {
+    'Genesis': ('gen', 'gn'), 'Exodus': ('exod', 'exo'), 'Leviticus': ('lev', 'lv'),
+    'Numbers': ('num', 'nm'), 'Deuteronomy': ('deut', 'dt'), 'Joshua': ('josh', 'jos'),
+    'Judges': ('judg', 'jdg'), 'Ruth': ('rth',), 'Samuel': ('sam', 'sm'), 'Kings': ('kgs', 'kin'),
+    'Chronicles': ('chr', 'chron'), 'Ezra': ('ezr',), 'Nehemiah': ('neh',), 'Esther': ('esth', 'est'),
+    'Job': ('jb',), 'Psalm': ('psalms', 'ps', 'psa', 'pss', 'psm'), 'Proverbs': ('prov', 'prv', 'pr'),
+    'Ecclesiastes': ('eccl', 'eccles', 'ecc', 'qoh'), 'Song of Solomon': ('song of songs', 'song', 'sos'),
+    'Isaiah': ('isa',), 'Jeremiah': ('jer',), 'Lamentations': ('lam',), 'Ezekiel': ('ezek', 'eze'),
+    'Daniel': ('dan', 'dn'), 'Hosea': ('hos',), 'Joel': ('jl',), 'Amos': (), 'Obadiah': ('obad',),
+    'Jonah': ('jon', 'jnh'), 'Micah': ('mic',), 'Nahum': ('nah',), 'Habakkuk': ('hab',),
+    'Zephaniah': ('zeph', 'zep'), 'Haggai': ('hag',), 'Zechariah': ('zech', 'zec'), 'Malachi': ('mal',),
+    'Matthew': ('matt', 'mt'), 'Mark': ('mk', 'mrk'), 'Luke': ('lk', 'luk'), 'John': ('jn', 'jhn', 'joh'),
+    'Acts': (), 'Romans': ('rom', 'rm'), 'Corinthians': ('cor',), 'Galatians': ('gal',),
+    'Ephesians': ('eph',), 'Philippians': ('phil', 'php'), 'Colossians': ('col',),
+    'Thessalonians': ('thess', 'thes'), 'Timothy': ('tim',), 'Titus': ('tit',), 'Philemon': ('philem', 'phm'),
+    'Hebrews': ('heb',), 'James': ('jas', 'jm'), 'Peter': ('pet', 'pt'), 'Jude': ('jud',),
+    'Revelation': ('rev', 'revelations'),
+}
+_BOOK_NAMES = {alias: book for book, aliases in BOOKS.items() for alias in aliases + (book.lower(),)}
+_NUMBERED_BOOKS = frozenset({'Samuel', 'Kings', 'Chronicles', 'Corinthians', 'Thessalonians', 'Timothy',
+                             'Peter', 'John'})
+_BOOK_NUMBERS = {'1': '1', '2': '2', '3': '3', 'i': '1', 'ii': '2', 'iii': '3', '1st': '1', '2nd': '2', '3rd': '3',
+                 'first': '1', 'second': '2', 'third': '3'}
+
+_SPACE_RE = re.compile(r'\s+')
+_REFERENCE_RE = re.compile(
+    r'\b(?:(?P<number>[123]|1st|2nd|3rd)\s*|(?P<word_number>i{1,3}|first|second|third)\s+)?'
+    r'(?P<book>' + '|'.join(sorted(map(re.escape, _BOOK_NAMES), key=len, reverse=True)) + r')\.?\s*'
+    r'(?P<chapter>\d{1,3})(?:\s*:\s*(?P<verse>\d{1,3})(?:\s*[-\u2013]\s*(?P<end>\d{1,3}))?)?\b'
+)
+
+
+class Reference:
+    """A parsed reference: book, chapter and optional verse range"""
+    __slots__ = ('book', 'chapter', 'verse', 'end', 'start', 'stop')
+
+    def __init__(self, book: str, chapter: int, verse: Optional[int] = None, end: Optional[int] = None,
+                 start: int = 0, stop: int = 0):
+        self.book = book
+        self.chapter = chapter
+        self.verse = verse
+        self.end = end
+        # Where the reference sits in the text it was found in
+        self.start = start
+        self.stop = stop
+
+    @property
+    def chapter_key(self) -> str:
+        return f"{self.book.lower()} {self.chapter}"
+
+    def __str__(self):
+        if self.verse is None:
+            return f"{self.book} {self.chapter}"
+        return f"{self.book} {self.chapter}:{self.verse}" + (f"-{self.end}" if self.end else '')
+
+    def __repr__(self):
+        return f"Reference({str(self)!r})"
+
+
+def find_references(text: str) -> List[Reference]:
+    """Every Bible reference in free text: 'Ps 34:18', '1 Pet. 5:7', 'first john 4'"""
+    references = []
+    for match in _REFERENCE_RE.finditer(text.lower()):
+        book = _BOOK_NAMES[match.group('book')]
+        number = match.group('number') or match.group('word_number')
+        if number:
+            # "I" and "is" etc. are only numbers when the book is a numbered one
+            if book not in _NUMBERED_BOOKS:
+                continue
+            book = f"{_BOOK_NUMBERS[number]} {book}"
+        elif book in _NUMBERED_BOOKS and book != 'John':
+            continue
+        verse, end = match.group('verse'), match.group('end')
+        references.append(Reference(book, int(match.group('chapter')), int(verse) if verse else None,
+                                    int(end) if end else None, match.start(), match.end()))
+    return references
+
+
+def parse_reference(reference: str) -> Optional[Reference]:
+    """The reference if the text is one (surrounding spaces aside), else None"""
+    references = find_references(reference.strip())
+    if len(references) == 1 and references[0].start == 0 and references[0].stop == len(reference.strip()):
+        return references[0]
+    return None
+
+
+def normalize_reference(reference: str) -> str:
+    """Lookup key for a reference: 'Ps 34:18', 'psalms 34 : 18' and 'Psalm 34:18'
+    share one key. Text that isn't a reference only has case and spacing folded."""
+    parsed = parse_reference(reference)
+    if parsed is not None:
+        return str(parsed).lower()
+    return _SPACE_RE.sub(' ', reference.strip()).lower()
+
+
+class Verse:
+    """One passage; `id` is its stable position in ScriptureStore.verses"""
+    __slots__ = ('id', 'reference', 'text')
+
+    def __init__(self, id: int, reference: str, text: str):
+        self.id = id
+        self.reference = reference
+        self.text = text
+
+    def __repr__(self):
+        return f"Verse({self.id}, {self.reference!r})"
+
+
+class _VerseEntry:
+    """A verse as one feature uses it, readable with that feature's old dict keys"""
+    __slots__ = ('verse', 'theme')
+    KEYS: Dict[str, str] = {}
+
+    def __init__(self, verse: Verse, theme: str):
+        self.verse = verse
+        self.theme = theme
+
+    @property
+    def reference(self) -> str:
+        return self.verse.reference
+
+    @property
+    def text(self) -> str:
+        return self.verse.text
+
+    def __getitem__(self, key: str) -> str:
+        return getattr(self, self.KEYS[key])
+
+    def get(self, key: str, default=None):
+        attribute = self.KEYS.get(key)
+        return getattr(self, attribute) if attribute else default
+
+    def keys(self):
+        return self.KEYS.keys()
+
+    def to_dict(self) -> Dict[str, str]:
+        return {key: getattr(self, attribute) for key, attribute in self.KEYS.items()}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.verse.reference!r}, {self.theme!r})"
+
+
+class HopeVerse(_VerseEntry):
+    """DropOfHope shape: {'verse': reference, 'text': ..., 'theme': ...}"""
+    __slots__ = ()
+    KEYS = {'verse': 'reference', 'text': 'text', 'theme': 'theme'}
+
+
+class MoodVerse(_VerseEntry):
+    """SpiritualFeatures shape: {'verse': text, 'reference': ..., 'theme': ...}"""
+    __slots__ = ()
+    KEYS = {'verse': 'text', 'reference': 'reference', 'theme': 'theme'}
+
+
+class ScriptureStore:
+    """Read-only content shared by every feature class in the process.
+
+    Devotions and studies stay plain dicts so they serialize as before;
+    they are shared, so callers copy before changing them.
+    """
+
+    def __init__(self):
+        self.verses: Tuple[Verse, ...] = ()
+        self._by_key: Dict[Tuple[str, str], Verse] = {}
+        self._by_reference: Dict[str, Verse] = {}
+        self._verse_list: List[Verse] = []
+
+        self.hope_verses = tuple(HopeVerse(self._verse(ref, text), sys.intern(theme))
+                                 for ref, text, theme in HOPE_VERSES)
+        self.mood_verses: Mapping[str, Tuple[MoodVerse, ...]] = MappingProxyType({
+            sys.intern(mood): tuple(MoodVerse(self._verse(ref, text), sys.intern(theme)) for ref, text, theme in rows)
+            for mood, rows in MOOD_VERSES.items()
+        })
+        # Indexed for reference lookups; their own wording is left as written
+        for devotion in DEVOTIONS.values():
+            self._verse(devotion['verse_reference'], devotion['verse_text'])
+        for study in BIBLE_STUDIES.values():
+            for session in study['sessions_data']:
+                self._verse(session['scripture_reference'], session['scripture_text'])
+        self.devotions = DEVOTIONS
+        self.bible_studies = BIBLE_STUDIES
+        self.prayer_challenges = PRAYER_CHALLENGES
+
+        self.verses = tuple(self._verse_list)
+        del self._verse_list
+
+        themes: Dict[str, List[Verse]] = {}
+        verse_themes: Dict[int, List[str]] = {}
+        for entry in self.hope_verses + tuple(e for entries in self.mood_verses.values() for e in entries):
+            bucket = themes.setdefault(entry.theme.lower(), [])
+            if entry.verse not in bucket:
+                bucket.append(entry.verse)
+                verse_themes.setdefault(entry.verse.id, []).append(entry.theme)
+        self._by_theme = {theme: tuple(verses) for theme, verses in themes.items()}
+        self._themes_of = {verse_id: tuple(labels) for verse_id, labels in verse_themes.items()}
+
+    def _verse(self, reference: str, text: str) -> Verse:
+        """The shared Verse for this passage; wording that differs only in
+        capitalization ('him' / 'Him') is treated as the same verse"""
+        key = (normalize_reference(reference), text.casefold())
+        verse = self._by_key.get(key)
+        if verse is None:
+            verse = Verse(len(self._verse_list), sys.intern(reference), sys.intern(text))
+            self._verse_list.append(verse)
+            self._by_key[key] = verse
+            self._by_reference.setdefault(key[0], verse)
+        return verse
+
+    def by_reference(self, reference: str) -> Optional[Verse]:
+        return self._by_reference.get(normalize_reference(reference))
+
+    def by_theme(self, theme: str) -> Tuple[Verse, ...]:
+        return self._by_theme.get(theme.lower(), ())
+
+    def themes_of(self, verse: Verse) -> Tuple[str, ...]:
+        return self._themes_of.get(verse.id, ())
+
+    def by_mood(self, mood: str) -> Tuple[MoodVerse, ...]:
+        """Verses for a mood, falling back to DEFAULT_MOOD and then every mood verse"""
+        pool = self.mood_pool(mood)
+        if pool != '*':
+            return self.mood_verses[pool]
+        return tuple(entry for entries in self.mood_verses.values() for entry in entries)
+
+    def mood_pool(self, mood: str) -> str:
+        """Name of the pool by_mood(mood) serves: the mood, DEFAULT_MOOD, or '*' for all"""
+        for candidate in (mood, DEFAULT_MOOD):
+            if self.mood_verses.get(candidate):
+                return candidate
+        return '*'
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'verses': len(self.verses),
+            'hope_verses': len(self.hope_verses),
+            'mood_verses': sum(len(entries) for entries in self.mood_verses.values()),
+            'themes': len(self._by_theme),
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_scripture_store() -> ScriptureStore:
+    """Process-wide content store, built on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ScriptureStore()
+    return _store
@@ -0,0 +1,368 @@
+"""
+Bounded session state for GabeCompanion
+One compact record per session instead of six ever-growing dicts, with a
+sliding TTL, an LRU cap on sessions and approximate bytes, and an optional
+SQLite backend so several workers see the same state
+"""
+
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional
+
+import metrics
+from progress_store import _plain, merge_field
+
+SESSION_STORE_MAX_SESSIONS = int(os.environ.get('SESSION_STORE_MAX_SESSIONS', '5000'))
+SESSION_STORE_MAX_BYTES = int(os.environ.get('SESSION_STORE_MAX_BYTES', str(64 * 1024 * 1024)))
+SESSION_STORE_TTL = float(os.environ.get('SESSION_STORE_TTL', str(6 * 3600)))
+# Empty keeps state in this process only
+SESSION_STORE_PATH = os.environ.get('SESSION_STORE_PATH', '')
+# Attempts to merge a save into a row another worker changed meanwhile
+SESSION_STORE_SAVE_RETRIES = int(os.environ.get('SESSION_STORE_SAVE_RETRIES', '3'))
+
+
+class SessionState:
+    """Everything GabeCompanion remembers about one session; None means unset.
+
+    `base` holds the fields as last read from or written to the backend, so a
+    save that loses a race can apply only what changed here to the newer row.
+    """
+    __slots__ = ('session_id', 'conversation', 'insights', 'state', 'voice_mode', 'chunks', 'story',
+                 'last_seen', 'size', 'version', 'base')
+
+    FIELDS = ('conversation', 'insights', 'state', 'voice_mode', 'chunks', 'story')
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.conversation = None
+        self.insights = None
+        self.state = None
+        self.voice_mode = None
+        self.chunks = None
+        self.story = None
+        self.last_seen = time.time()
+        self.size = 0
+        self.version = 0
+        self.base = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not None}
+
+    @classmethod
+    def from_dict(cls, session_id: str, data: Dict[str, Any], version: int = 0) -> 'SessionState':
+        state = cls(session_id)
+        for field in cls.FIELDS:
+            setattr(state, field, data.get(field))
+        state.version = version
+        state.base = _plain(data)
+        return state
+
+    def merge(self, stored: 'SessionState'):
+        """Rebase onto a newer stored record, keeping only the fields (or the
+        items and keys within them) changed here since `base`"""
+        local = _plain(self.to_dict())
+        newer = stored.to_dict()
+        for field in self.FIELDS:
+            setattr(self, field, merge_field(self.base.get(field), local.get(field), newer.get(field)))
+        self.version = stored.version
+        self.base = stored.base
+
+    def measure(self) -> int:
+        """Approximate footprint: the serialized size of the record's fields"""
+        self.size = len(json.dumps(self.to_dict(), default=str)) + 64
+        return self.size
+
+
+class SQLiteSessionBackend:
+    """Shared session rows; `version` lets workers spot changes made elsewhere"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, version INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+        db.commit()
+
+    def _db(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite handles locking between workers
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=5.0)
+        return db
+
+    def version(self, session_id: str) -> Optional[int]:
+        row = self._db().execute(
+            "SELECT version FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def load(self, session_id: str) -> Optional[SessionState]:
+        row = self._db().execute(
+            "SELECT data, version FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, time.time())
+        ).fetchone()
+        if not row:
+            return None
+        return SessionState.from_dict(session_id, json.loads(row[0]), row[1])
+
+    def save(self, state: SessionState, ttl: float) -> Optional[int]:
+        """Write the record if the row is still at `state.version`; the new
+        version, or None when another worker wrote (or created) it first"""
+        data = json.dumps(state.to_dict(), default=str)
+        now = time.time()
+        db = self._db()
+        with db:
+            if state.version:
+                changed = db.execute(
+                    "UPDATE sessions SET data = ?, version = version + 1, expires_at = ? "
+                    "WHERE session_id = ? AND version = ?",
+                    (data, now + ttl, state.session_id, state.version)
+                ).rowcount
+            else:
+                db.execute("DELETE FROM sessions WHERE session_id = ? AND expires_at <= ?", (state.session_id, now))
+                changed = db.execute(
+                    "INSERT OR IGNORE INTO sessions (session_id, data, version, expires_at) VALUES (?, ?, 1, ?)",
+                    (state.session_id, data, now + ttl)
+                ).rowcount
+        if not changed:
+            return None
+        state.base = json.loads(data)
+        return state.version + 1
+
+    def delete(self, session_id: str):
+        db = self._db()
+        with db:
+            db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def purge_expired(self) -> int:
+        db = self._db()
+        with db:
+            return db.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+class SessionStore:
+    """LRU of SessionState records bounded by count and approximate bytes.
+
+    Nested values (a conversation list, a story dict) can be mutated in place;
+    call save() afterwards so the change reaches the shared backend.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_STORE_MAX_SESSIONS, max_bytes: int = SESSION_STORE_MAX_BYTES,
+                 ttl: float = SESSION_STORE_TTL, backend: Optional[SQLiteSessionBackend] = None):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.backend = backend
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls) -> 'SessionStore':
+        backend = None
+        if SESSION_STORE_PATH:
+            try:
+                backend = SQLiteSessionBackend(SESSION_STORE_PATH)
+            except sqlite3.Error as e:
+                logging.warning(f"Session store keeping state in memory only, could not open {SESSION_STORE_PATH}: {e}")
+        store = cls(backend=backend)
+        metrics.REGISTRY.register_collector(store.collect_metrics)
+        return store
+
+    def get(self, session_id: str, create: bool = True) -> Optional[SessionState]:
+        """The session's record, refreshed from the backend if another worker changed it"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            now = time.time()
+            if state is not None and now - state.last_seen > self.ttl:
+                self._drop(session_id)
+                self.expirations += 1
+                state = None
+
+            if self.backend is not None:
+                try:
+                    version = self.backend.version(session_id)
+                    if version is not None and (state is None or version != state.version):
+                        state = self.backend.load(session_id)
+                        if state is not None:
+                            self._put(state)
+                        else:
+                            # Deleted or expired between the two reads
+                            self._drop(session_id)
+                    elif version is None and state is not None and state.version:
+                        # Deleted or expired by another worker
+                        self._drop(session_id)
+                        state = None
+                except sqlite3.Error as e:
+                    logging.warning(f"Session backend read failed for {session_id}: {e}")
+
+            if state is None:
+                if not create:
+                    return None
+                state = SessionState(session_id)
+                self._put(state)
+
+            state.last_seen = now
+            self._sessions.move_to_end(session_id)
+            return state
+
+    def save(self, session_id: str):
+        """Re-measure a record after in-place changes and write it through"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                return
+            old_size = state.size
+            self._bytes += state.measure() - old_size
+            if self.backend is not None:
+                try:
+                    self._write(state)
+                except sqlite3.Error as e:
+                    logging.warning(f"Session backend write failed for {session_id}: {e}")
+            self._evict()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._drop(session_id)
+            if self.backend is not None:
+                self.backend.delete(session_id)
+
+    def view(self, field: str) -> 'SessionFieldView':
+        return SessionFieldView(self, field)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'sessions': len(self._sessions),
+            'bytes': self._bytes,
+            'max_sessions': self.max_sessions,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+    def collect_metrics(self) -> list:
+        """Scrape-time families for /metrics; sessions have no hit/miss notion"""
+        stats = self.stats()
+        labels = {'cache': 'sessions'}
+        return [
+            ('gabe_cache_entries', 'gauge', 'Entries currently cached', [(labels, stats['sessions'])]),
+            ('gabe_cache_evictions_total', 'counter', 'Entries evicted', [(labels, stats['evictions'])]),
+            ('gabe_session_store_bytes', 'gauge', 'Approximate bytes held by the session store',
+             [({}, stats['bytes'])]),
+        ]
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _write(self, state: SessionState):
+        # Compare-and-swap: on a lost race, merge into the newer row and retry
+        for _ in range(SESSION_STORE_SAVE_RETRIES):
+            version = self.backend.save(state, self.ttl)
+            if version is not None:
+                state.version = version
+                return
+            stored = self.backend.load(state.session_id)
+            if stored is None:
+                # Deleted or expired meanwhile: write ours as a new row
+                state.version = 0
+                state.base = {}
+            else:
+                state.merge(stored)
+            old_size = state.size
+            self._bytes += state.measure() - old_size
+        logging.warning(f"Session backend write for {state.session_id} kept conflicting; kept in memory only")
+
+    def _put(self, state: SessionState):
+        self._drop(state.session_id)
+        self._sessions[state.session_id] = state
+        self._bytes += state.measure()
+        self._evict()
+
+    def _drop(self, session_id: str):
+        state = self._sessions.pop(session_id, None)
+        if state is not None:
+            self._bytes -= state.size
+
+    def _evict(self):
+        # Always keep the most recent session, however large
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            session_id, state = self._sessions.popitem(last=False)
+            self._bytes -= state.size
+            self.evictions += 1
+
+
+class SessionFieldView:
+    """Dict-style access to one field across sessions, so code written against
+    `self.voice_mode_enabled[session_id]` keeps working on top of the store"""
+
+    def __init__(self, store: SessionStore, field: str):
+        if field not in SessionState.FIELDS:
+            raise ValueError(f"Unknown session field: {field}")
+        self.store = store
+        self.field = field
+
+    def __getitem__(self, session_id: str) -> Any:
+        value = self.get(session_id)
+        if value is None:
+            raise KeyError(session_id)
+        return value
+
+    def __setitem__(self, session_id: str, value: Any):
+        state = self.store.get(session_id)
+        setattr(state, self.field, value)
+        self.store.save(session_id)
+
+    def __delitem__(self, session_id: str):
+        if self.pop(session_id, None) is None:
+            raise KeyError(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        with self.store._lock:
+            session_ids = [session_id for session_id, state in self.store._sessions.items()
+                           if getattr(state, self.field) is not None]
+        return iter(session_ids)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        state = self.store.get(session_id, create=False)
+        value = getattr(state, self.field) if state is not None else None
+        return default if value is None else value
+
+    def setdefault(self, session_id: str, default: Any = None) -> Any:
+        value = self.get(session_id)
+        if value is None:
+            self[session_id] = default
+            return default
+        return value
+
+    def pop(self, session_id: str, *default) -> Any:
+        state = self.store.get(session_id, create=False)
+        value = getattr(state, self.field) if state is not None else None
+        if value is None:
+            if default:
+                return default[0]
+            raise KeyError(session_id)
+        setattr(state, self.field, None)
+        self.store.save(session_id)
+        return value
+
+    def items(self):
+        return [(session_id, self.get(session_id)) for session_id in self]
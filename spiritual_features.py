@@ -8,39 +8,20 @@ import json
 import random
 from typing import Dict, List, Optional
 
+from daily_content import get_daily_cache, local_now
+from scripture_store import get_scripture_store
+from verse_rotation import get_rotation_store
+
 class SpiritualFeatures:
     def __init__(self):
         self.scripture_database = self._load_scripture_database()
         self.growth_milestones = self._load_growth_milestones()
+        get_daily_cache().register('reminder', self._build_daily_reminder)
         
     def _load_scripture_database(self) -> Dict[str, List[Dict]]:
-        """Load scripture verses organized by emotional needs"""
-        return {
-            "sad": [
-                {
-                    "verse": "The Lord is close to the brokenhearted and saves those who are crushed in spirit.",
-                    "reference": "Psalm 34:18",
-                    "theme": "God's comfort in sadness"
-                },
-                {
-                    "verse": "He heals the brokenhearted and binds up their wounds.",
-                    "reference": "Psalm 147:3",
-                    "theme": "Divine healing"
-                },
-                {
-                    "verse": "Weeping may stay for the night, but rejoicing comes in the morning.",
-                    "reference": "Psalm 30:5",
-                    "theme": "Hope after sorrow"
-                },
-                {
-                    "verse": "Cast all your anxiety on him because he cares for you.",
-                    "reference": "1 Peter 5:7",
-                    "theme": "God's care"
-                }
-            ],
-
-            ]
-        }
+        """Scripture verses organized by emotional needs, copied from the shared content store"""
+        return {mood: [verse.to_dict() for verse in verses]
+                for mood, verses in get_scripture_store().mood_verses.items()}
 
     def _load_growth_milestones(self) -> List[Dict]:
         """Define spiritual growth milestones to track"""
@@ -77,18 +58,29 @@ class SpiritualFeatures:
             }
         ]
 
-    def get_scripture_recommendation(self, mood: str, context: str = "") -> Dict:
-        """Get appropriate scripture based on user's emotional state"""
-        mood_scriptures = self.scripture_database.get(mood, self.scripture_database["hopeful"])
-        selected_scripture = random.choice(mood_scriptures)
+    def get_scripture_recommendation(self, mood: str, context: str = "", rng: random.Random = None,
+                                     user_id: Optional[str] = None) -> Dict:
+        """Get appropriate scripture based on user's emotional state.
+
+        With a user_id (and no rng) the user rotates through the mood's verses
+        and notes, seeing each one before any repeats.
+        """
+        store = get_scripture_store()
+        mood_scriptures = store.by_mood(mood)
+        if user_id and rng is None:
+            pool = f"verse:{store.mood_pool(mood)}"
+            selected_scripture = mood_scriptures[get_rotation_store().pick(user_id, pool, len(mood_scriptures))]
+        else:
+            selected_scripture = (rng or random).choice(mood_scriptures)
         return {
             "verse": selected_scripture["verse"],
             "reference": selected_scripture["reference"],
             "theme": selected_scripture["theme"],
-            "personal_note": self._generate_personal_note(mood, selected_scripture["theme"])
+            "personal_note": self._generate_personal_note(mood, selected_scripture["theme"], rng, user_id)
         }
 
-    def _generate_personal_note(self, mood: str, theme: str) -> str:
+    def _generate_personal_note(self, mood: str, theme: str, rng: random.Random = None,
+                                user_id: Optional[str] = None) -> str:
         """Generate a personal note to accompany the scripture"""
         notes = {
             "sad": [
@@ -118,8 +110,11 @@ class SpiritualFeatures:
             ]
         }
 
-        mood_notes = notes.get(mood, notes["hopeful"])
-        return random.choice(mood_notes)
+        note_mood = mood if mood in notes else "hopeful"
+        mood_notes = notes[note_mood]
+        if user_id and rng is None:
+            return mood_notes[get_rotation_store().pick(user_id, f"note:{note_mood}", len(mood_notes))]
+        return (rng or random).choice(mood_notes)
 
     def create_prayer_journal_entry(self, user_name: str, prayer_request: str, gabe_response: str, mood: str) -> Dict:
         """Create a prayer journal entry"""
@@ -135,8 +130,30 @@ class SpiritualFeatures:
             "follow_up_date": (datetime.datetime.now() + datetime.timedelta(days=3)).isoformat()
         }
 
-    def generate_daily_reminder(self, user_name: str, recent_mood: str = "peaceful") -> Dict:
-        """Generate a daily spiritual reminder"""
+    def generate_daily_reminder(self, user_name: str, recent_mood: str = "peaceful", user_id: Optional[str] = None,
+                                timezone: Optional[str] = None) -> Dict:
+        """Today's spiritual reminder for the user, the same on every call until
+        their local midnight"""
+        content = get_daily_cache().get('reminder', user_id or user_name, timezone,
+                                        user_name=user_name, mood=recent_mood)
+        current_hour = local_now(timezone).hour
+        if current_hour < 12:
+            time_period = "morning"
+        elif current_hour < 17:
+            time_period = "afternoon"
+        else:
+            time_period = "evening"
+
+        return {
+            "time_period": time_period,
+            "message": content["messages"][time_period],
+            "scripture": dict(content["scripture"]),
+            "type": "daily_reminder"
+        }
+
+    def _build_daily_reminder(self, user_id: str, day: datetime.date, rng: random.Random, context: Dict) -> Dict:
+        """The day's reminder picks for every time period, drawn from the user's daily seed"""
+        user_name = context.get("user_name")
         reminders = {
             "morning": [
                 f"Good morning, {user_name}! Today is a gift from God. How can I pray with you today?",
@@ -155,22 +172,9 @@ class SpiritualFeatures:
             ]
         }
 
-        current_hour = datetime.datetime.now().hour
-        if current_hour < 12:
-            time_period = "morning"
-        elif current_hour < 17:
-            time_period = "afternoon"
-        else:
-            time_period = "evening"
-
-        message = random.choice(reminders[time_period])
-        scripture = self.get_scripture_recommendation(recent_mood)
-
         return {
-            "time_period": time_period,
-            "message": message,
-            "scripture": scripture,
-            "type": "daily_reminder"
+            "messages": {time_period: rng.choice(messages) for time_period, messages in reminders.items()},
+            "scripture": self.get_scripture_recommendation(context.get("mood", "peaceful"), rng=rng)
         }
 
     def check_growth_milestone(self, user_stats: Dict) -> Optional[Dict]:
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from crisis_backfill import CrisisBackfill
+from crisis_detection import CrisisDetector
+
+MESSAGES = ['I had a lovely day at church', 'I want to kill myself', 'thanks for the prayer', 'I want to die']
+
+
+@pytest.fixture
+def database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'conversations.db'}"
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE conversations (id INTEGER PRIMARY KEY, user_message TEXT, is_crisis BOOLEAN)"))
+        for message in MESSAGES:
+            conn.execute(text("INSERT INTO conversations (user_message, is_crisis) VALUES (:m, 0)"), {'m': message})
+    return url
+
+
+def backfill(database, tmp_path):
+    return CrisisBackfill(database, chunk_size=2, workers=1, checkpoint_path=str(tmp_path / 'checkpoint.json'))
+
+
+def test_finished_run_removes_its_checkpoint_so_the_next_run_rescans(database, tmp_path):
+    job = backfill(database, tmp_path)
+    first = job.run()
+    assert first['rows_scanned'] == len(MESSAGES)
+    assert first['rows_updated'] == 2
+    assert not os.path.exists(job.checkpoint_path)
+
+    second = job.run()
+    assert second['rows_scanned'] == len(MESSAGES)
+    assert second['rows_updated'] == 0
+
+
+def test_resumes_a_checkpoint_for_the_same_lexicon_version(database, tmp_path):
+    job = backfill(database, tmp_path)
+    version = CrisisDetector().lexicon_version
+    job.save_checkpoint({'last_id': 2, 'rows_scanned': 2, 'rows_updated': 0, 'lexicon_version': version})
+    state = job.run()
+    assert state['rows_scanned'] == len(MESSAGES)
+    assert state['rows_updated'] == 1
+
+
+def test_checkpoint_from_another_lexicon_version_starts_over(database, tmp_path):
+    job = backfill(database, tmp_path)
+    version = CrisisDetector().lexicon_version
+    job.save_checkpoint({'last_id': 4, 'rows_scanned': 4, 'rows_updated': 0, 'lexicon_version': version - 1})
+    state = job.run()
+    assert state['rows_scanned'] == len(MESSAGES)
+    assert state['rows_updated'] == 2
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from firebase_service import FirebaseService, FirestoreReadError
+from local_firestore import FaultInjector, LocalFirestoreClient, LocalFirestoreError
+
+
+class FailingQueries(FaultInjector):
+    """Fails every query after the first `allowed` ones"""
+
+    def __init__(self, allowed: int):
+        super().__init__()
+        self.allowed = allowed
+
+    def round_trip(self, operation: str):
+        super().round_trip(operation)
+        if operation.startswith('query'):
+            if self.allowed <= 0:
+                raise LocalFirestoreError(f"Injected failure during {operation}")
+            self.allowed -= 1
+
+
+def make_service(faults=None) -> FirebaseService:
+    return FirebaseService(db=LocalFirestoreClient(faults=faults), cache_enabled=False)
+
+
+def add_journal(service: FirebaseService, user_id: str, count: int):
+    journal = service.db.collection('users').document(user_id).collection('journal')
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(count):
+        journal.document(f"entry{i}").set({'content': f"entry {i}", 'timestamp': start + timedelta(days=i)})
+
+
+async def collect(items):
+    return [item async for item in items]
+
+
+def test_paginate_walks_every_page():
+    service = make_service()
+    add_journal(service, 'u1', 7)
+    entries = asyncio.run(collect(service.iter_journal_entries('u1', page_size=3, prefetch=True)))
+    assert [entry['id'] for entry in entries] == [f"entry{i}" for i in reversed(range(7))]
+
+
+def test_paginate_raises_instead_of_truncating():
+    faults = FailingQueries(allowed=1)
+    service = make_service(faults)
+    add_journal(service, 'u1', 7)
+    seen = []
+
+    async def export():
+        async for entry in service.iter_journal_entries('u1', page_size=3):
+            seen.append(entry['id'])
+
+    with pytest.raises(FirestoreReadError):
+        asyncio.run(export())
+    # The first page was delivered before the second one failed
+    assert seen == ['entry6', 'entry5', 'entry4']
+
+
+def test_context_saved_under_a_legacy_id_is_found():
+    service = make_service()
+    contexts = service.db.collection('users').document('u1').collection('contexts')
+    _, legacy = contexts.add({'topic': 'job loss', 'context': 'Lost their job in May',
+                              'last_mentioned': datetime(2024, 5, 1, tzinfo=timezone.utc)})
+    context = asyncio.run(service.get_conversation_context('u1', 'job loss'))
+    assert context['id'] == legacy.id
+    assert context['context'] == 'Lost their job in May'
+    assert asyncio.run(service.get_conversation_context('u1', 'exams')) is None
+
+
+def test_topic_saved_during_a_scan_is_kept():
+    service = make_service()
+    asyncio.run(service.save_conversation_context('u1', 'family', 'Sister is visiting'))
+    scanned = threading.Event()
+    release = threading.Event()
+    fetch = service._fetch_topic_index
+
+    def slow_fetch(user_id):
+        index = fetch(user_id)
+        scanned.set()
+        release.wait(5)
+        return index
+
+    service._fetch_topic_index = slow_fetch
+
+    async def race():
+        topics = asyncio.ensure_future(service.get_known_topics('u1'))
+        await asyncio.get_running_loop().run_in_executor(None, scanned.wait, 5)
+        await service.save_conversation_context('u1', 'exams', 'Finals next week')
+        release.set()
+        await topics
+        return await service.get_known_topics('u1')
+
+    assert set(asyncio.run(race())) == {'family', 'exams'}
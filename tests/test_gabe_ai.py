@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('openai')
+pytest.importorskip('google.genai')
+
+import response_cache
+from gabe_ai import GabeAI
+from gabe_persona import BASE_SYSTEM_PROMPT
+from llm_providers import Completion
+from prompt_budget import ConversationBudgeter
+from provider_dispatch import HedgedDispatcher
+from response_cache import ResponseCache
+
+
+class SlowProvider:
+    """Stands in for an LLM provider: counts calls and answers after a pause"""
+
+    def __init__(self, name, reply="Lord, hold Ann close tonight. Amen.", delay=0.2, fail=False):
+        self.name = name
+        self.reply = reply
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def complete(self, system_prompt, messages, **options):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        return Completion(self.reply, self.name)
+
+
+def make_ai(*providers):
+    """A GabeAI over fake providers, without touching API keys or Firebase"""
+    ai = GabeAI.__new__(GabeAI)
+    ai.base_system_prompt = BASE_SYSTEM_PROMPT
+    ai.age_personalities = {}
+    ai.prompt_budgeter = ConversationBudgeter()
+    ai.dispatcher = HedgedDispatcher(list(providers), hedge_delay=5.0, min_hedge_delay=5.0,
+                                     max_hedge_delay=5.0, timeout=5.0, name='test-gabe-ai')
+    return ai
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    cache = ResponseCache(variants=1, path='')
+    monkeypatch.setattr(response_cache, '_response_cache', cache)
+    return cache
+
+
+def test_concurrent_identical_prayers_call_the_provider_once():
+    provider = SlowProvider('fake-primary')
+    ai = make_ai(provider)
+    answers = []
+
+    def ask():
+        answers.append(ai.generate_prayer('peace for my mom', user_name='Ann'))
+
+    threads = [threading.Thread(target=ask) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert answers == ["Lord, hold Ann close tonight. Amen."] * 2
+    assert provider.calls == 1
+
+
+def test_prayer_uses_the_next_provider_when_the_first_fails():
+    primary = SlowProvider('fake-down', delay=0, fail=True)
+    secondary = SlowProvider('fake-up', delay=0)
+    ai = make_ai(primary, secondary)
+
+    assert ai.generate_prayer('strength for exams', user_name='Ann') == "Lord, hold Ann close tonight. Amen."
+    assert primary.calls == 1
+    assert secondary.calls == 1
+
+
+def test_apology_is_not_cached_when_every_provider_fails():
+    provider = SlowProvider('fake-flaky', delay=0, fail=True)
+    ai = make_ai(provider)
+
+    apology = ai.generate_prayer('courage at work', user_name='Ann')
+    assert 'Ann' in apology
+
+    provider.fail = False
+    assert ai.generate_prayer('courage at work', user_name='Ann') == "Lord, hold Ann close tonight. Amen."
+    assert provider.calls == 2
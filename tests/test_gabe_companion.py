@@ -0,0 +1,58 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+pytest.importorskip('openai')
+
+from gabe_companion import GabeCompanion
+from llm_providers import Completion
+
+
+@pytest.fixture
+def companion(monkeypatch):
+    monkeypatch.delenv('GEMINI_API_KEY', raising=False)
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    companion = GabeCompanion()
+    companion.dispatcher = mock.Mock()
+    companion.dispatcher.acomplete = mock.AsyncMock(return_value=Completion("I hear you, Ann.", 'fake'))
+    return companion
+
+
+def respond(companion, message, session_id='s1'):
+    return asyncio.run(companion.get_response_async(message, 'Ann', session_id=session_id))
+
+
+@pytest.mark.parametrize('message', ['Can you pray for my mom?', 'Lord help me tonight'])
+def test_prayer_is_answered_without_a_provider(companion, message):
+    reply = respond(companion, message)
+    assert 'Ann' in reply and 'Amen' in reply
+    companion.dispatcher.acomplete.assert_not_called()
+
+
+@pytest.mark.parametrize('message, story', [
+    ('Tell me about David and Goliath', 'david_goliath'),
+    ('Who was Moses?', 'red_sea'),
+])
+def test_named_story_is_told_part_by_part_without_a_provider(companion, message, story):
+    parts = companion.bible_stories[story]['parts']
+    assert respond(companion, message) == parts[0]
+    assert respond(companion, 'go on') == parts[1]
+    assert respond(companion, 'what happened next?') == parts[2]
+    assert respond(companion, 'yes') == parts[3]
+    assert 's1' not in companion.story_contexts
+    companion.dispatcher.acomplete.assert_not_called()
+
+
+def test_general_story_request_and_free_form_messages_use_the_provider(companion):
+    assert respond(companion, 'Share a story about courage') == "I hear you, Ann."
+    # Nothing to continue, so "yes" is an ordinary message
+    assert respond(companion, 'yes', session_id='s2') == "I hear you, Ann."
+    assert companion.dispatcher.acomplete.await_count == 2
+
+
+def test_get_response_runs_the_async_pipeline(companion):
+    assert companion.get_response('people are mean', 'Ann', session_id='s3') == "I hear you, Ann."
+    turns = companion.conversation_memory['s3']
+    assert turns[-1]['gabe'] == "I hear you, Ann."
+    assert companion.user_insights['s3']['name'] == 'Ann'
@@ -0,0 +1,74 @@
+import pytest
+
+from intent_router import IntentRouter
+
+LEGACY_STORY_KEYWORDS = ['story', 'tell me a story', 'bible story', 'share a story', 'david and goliath', 'moses',
+                         'daniel', 'noah', 'jesus', 'parable', 'tell me about', 'biblical story']
+
+
+@pytest.fixture(scope='module')
+def router():
+    return IntentRouter()
+
+
+def intents(router, message):
+    return {(match.intent, match.key) for match in router.route(message)}
+
+
+@pytest.mark.parametrize('message, key', [
+    ('speak to me', 'on'),
+    ('Voice mode on!', 'on'),
+    ('  turn on voice please', 'on'),
+    ('text only', 'off'),
+    ('Stop talking, thanks.', 'off'),
+    ('turn off voice, text only please', 'off'),
+])
+def test_whole_message_voice_command(router, message, key):
+    assert router.command(message).key == key
+    assert intents(router, message) == {('voice', key)}
+
+
+@pytest.mark.parametrize('message', [
+    'Lord, please speak to me tonight',
+    'I wish God would speak to me',
+    'Can you keep it text only while I read my devotion about Daniel?',
+    'my brother would not stop talking at dinner and I got so angry',
+])
+def test_voice_phrase_inside_a_message_is_not_a_command(router, message):
+    assert router.command(message) is None
+    assert all(intent != 'voice' for intent, _ in intents(router, message))
+
+
+def test_voice_phrase_does_not_hide_other_intents(router):
+    assert intents(router, 'please pray, text only') == {('prayer', 'prayer')}
+
+
+@pytest.mark.parametrize('message', [
+    'tell me about goliath',
+    'Goliath was huge',
+    'parting the sea must have been scary',
+    'I crossed the red sea on a cruise',
+    'Who was Moses?',
+    'david and goliath please',
+    'share a story',
+    'I love Jesus',
+])
+def test_story_matches_the_original_keywords(router, message):
+    expected = any(keyword in message.lower() for keyword in LEGACY_STORY_KEYWORDS)
+    assert (router.first(message, 'story') is not None) == expected
+
+
+def test_named_story_keys(router):
+    assert router.first('Who was Moses?', 'story').key == 'red_sea'
+    assert router.first('tell me about David and Goliath', 'story').text == 'tell me about'
+    assert ('story', 'david_goliath') in intents(router, 'tell me about David and Goliath')
+
+
+@pytest.mark.parametrize('message', ['go on', 'Yes please!', 'ok, what happened next?', 'tell me more'])
+def test_story_continuation_is_a_command(router, message):
+    assert intents(router, message) == {('continue', 'story')}
+
+
+def test_continuation_words_inside_a_message_are_not_a_command(router):
+    assert router.command('yes, I want to go on living for God') is None
+    assert intents(router, 'tell me more about Jesus') == {('story', 'any')}
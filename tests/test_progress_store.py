@@ -0,0 +1,83 @@
+import pytest
+
+from progress_store import SQLiteProgressStore, merge_field
+
+
+@pytest.fixture
+def stores(tmp_path):
+    path = str(tmp_path / 'progress.db')
+    opened = [SQLiteProgressStore(path, flush_delay=60) for _ in range(2)]
+    yield opened + [lambda: SQLiteProgressStore(path, flush_delay=60)]
+    for store in opened:
+        store.close()
+
+
+def test_stale_worker_keeps_a_badge_awarded_elsewhere(stores):
+    a, b, reopen = stores
+    stale = b.get('u1')
+    a.get('u1').badges.append('Faith Seed')
+    a.save('u1')
+    a.flush()
+
+    stale.level = 'Shepherd'
+    b.save('u1')
+    b.flush()
+    assert stale.badges == ['Faith Seed']
+
+    stored = reopen().get('u1')
+    assert stored.badges == ['Faith Seed']
+    assert stored.level == 'Shepherd'
+
+
+def test_mastery_and_counters_merge_across_workers(stores):
+    a, b, reopen = stores
+    record_a, record_b = a.get('u1'), b.get('u1')
+    record_a.verse_mastery_progress['John 3:16'] = 1
+    a.save('u1')
+    record_b.verse_mastery_progress['Psalm 23:1'] = 2
+    b.save('u1')
+    for _ in range(5):
+        a.increment('u1', 'xp', 2)
+        b.increment('u1', 'xp', 3)
+    a.flush()
+    b.flush()
+
+    stored = reopen().get('u1')
+    assert stored.verse_mastery_progress == {'John 3:16': 1, 'Psalm 23:1': 2}
+    assert stored['xp'] == 25
+
+
+def test_a_burst_of_saves_is_one_write(stores):
+    a, _, _ = stores
+    for _ in range(100):
+        a.increment('u1', 'total_actions')
+        a.get('u1').streak += 1
+        a.save('u1')
+    assert a.flush() == 1
+    assert a.stats()['writes'] == 1
+
+
+def test_merge_field():
+    assert merge_field(['a'], ['a', 'b'], ['a', 'c']) == ['a', 'c', 'b']
+    assert merge_field(['a', 'b'], ['b'], ['a', 'b', 'c']) == ['b', 'c']
+    assert merge_field({'x': 1}, {'x': 1, 'y': 2}, {'x': 5}) == {'x': 5, 'y': 2}
+    assert merge_field('Seed', 'Seed', 'Shepherd') == 'Shepherd'
+    assert merge_field('Seed', 'Disciple', 'Shepherd') == 'Disciple'
+
+
+def test_change_made_after_a_flush_is_written(stores):
+    a, _, reopen = stores
+    record = a.get('u1')
+    a.increment('u1', 'xp', 5)
+    assert a.flush() == 1
+
+    # Changed after the flush that took the earlier mark
+    a.update('u1', lambda user_data: user_data.badges.append('Faith Seed'))
+    record.streak = 3
+    a.save('u1')
+    assert a.flush() == 1
+
+    stored = reopen().get('u1')
+    assert stored.badges == ['Faith Seed']
+    assert stored.streak == 3
+    assert stored['xp'] == 5
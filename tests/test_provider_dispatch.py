@@ -0,0 +1,41 @@
+import metrics
+from llm_providers import Completion
+from provider_dispatch import CircuitBreaker, HedgedDispatcher
+
+
+class FakeProvider:
+    def __init__(self, name):
+        self.name = name
+
+    def complete(self, system_prompt, messages, **options):
+        return Completion('ok', self.name)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_released_probe_lets_the_next_probe_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker('fake', failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_dispatchers_sharing_a_name_report_one_series():
+    dispatchers = [HedgedDispatcher([FakeProvider('fake-metrics')], name='test-metrics') for _ in range(3)]
+    dispatchers[-1].complete('system', [{'role': 'user', 'content': 'hi'}])
+
+    lines = [line for line in metrics.REGISTRY.render().splitlines()
+             if line.startswith('gabe_llm_circuit_state{') and 'dispatcher="test-metrics"' in line]
+    assert lines == ['gabe_llm_circuit_state{dispatcher="test-metrics",provider="fake-metrics"} 0']
@@ -0,0 +1,71 @@
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, cached_response
+
+
+class FakeAI:
+    """Stands in for GabeAI: records provider calls and replies with canned text"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    @cached_response('prayer')
+    def generate_prayer(self, request, user_name=None, age_range=None, conversation_history=None):
+        self.calls += 1
+        return self.reply(request, user_name)
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    cache = ResponseCache(variants=1, path='')
+    monkeypatch.setattr(response_cache, '_response_cache', cache)
+    return cache
+
+
+def test_first_name_only_reply_is_not_served_to_another_user():
+    ai = FakeAI(lambda request, name: "Sarah, God holds you close tonight.")
+    assert ai.generate_prayer('peace tonight', user_name='Sarah Jones') == "Sarah, God holds you close tonight."
+    assert ai.calls == 1
+
+    ai.reply = lambda request, name: f"{name}, God holds you close tonight."
+    answer = ai.generate_prayer('peace tonight', user_name='Tom')
+    assert 'Sarah' not in answer
+    assert answer == "Tom, God holds you close tonight."
+    assert ai.calls == 2
+
+    # The same user asking again is served from the cache
+    assert ai.generate_prayer('Peace tonight!', user_name='Sarah Jones') == "Sarah, God holds you close tonight."
+    assert ai.calls == 2
+
+
+@pytest.mark.parametrize('user_name, text', [('Mark', 'Mark 10:27'), ('Grace', 'grace')])
+def test_name_that_is_also_scripture_text_is_cached_verbatim(user_name, text):
+    ai = FakeAI(lambda request, name: f"{name}, remember {text}: with God all things are possible.")
+    first = ai.generate_prayer('strength', user_name=user_name)
+    assert ai.generate_prayer('strength', user_name=user_name) == first
+    assert ai.calls == 1
+    assert text in first
+    assert '{name}' not in first
+
+    ai.reply = lambda request, name: f"{name}, remember {text}: with God all things are possible."
+    other = ai.generate_prayer('strength', user_name='Ann')
+    assert other == f"Ann, remember {text}: with God all things are possible."
+    assert ai.calls == 2
+
+
+def test_anonymous_requests_share_an_entry():
+    ai = FakeAI(lambda request, name: "May God give you rest.")
+    ai.generate_prayer('rest')
+    ai.generate_prayer('rest', user_name=None)
+    assert ai.calls == 1
+
+
+def test_conversation_context_bypasses_the_cache(cache):
+    ai = FakeAI(lambda request, name: "A prayer about your exam.")
+    history = [{'role': 'user', 'content': 'my exam is tomorrow'}]
+    ai.generate_prayer('peace', user_name='Tom', conversation_history=history)
+    ai.generate_prayer('peace', user_name='Tom', conversation_history=history)
+    assert ai.calls == 2
+    assert cache.stats()['size'] == 0
@@ -0,0 +1,66 @@
+from session_store import SessionStore, SQLiteSessionBackend
+
+
+def make_store(path):
+    return SessionStore(backend=SQLiteSessionBackend(str(path)))
+
+
+def test_stale_save_keeps_fields_another_worker_changed(tmp_path):
+    path = tmp_path / 'sessions.db'
+    first, second = make_store(path), make_store(path)
+
+    state = first.get('s1')
+    state.conversation = [{'role': 'user', 'content': 'hi'}]
+    first.save('s1')
+
+    # Both workers now hold version 1; the second one writes first
+    stale = first.get('s1')
+    fresh = second.get('s1')
+    fresh.voice_mode = True
+    fresh.conversation.append({'role': 'assistant', 'content': 'Hey friend!'})
+    second.save('s1')
+
+    stale.story = {'story': 'david', 'part': 1}
+    stale.conversation.append({'role': 'user', 'content': 'tell me about David'})
+    first.save('s1')
+
+    stored = make_store(path).get('s1')
+    assert stored.voice_mode is True
+    assert stored.story == {'story': 'david', 'part': 1}
+    assert stored.conversation == [
+        {'role': 'user', 'content': 'hi'},
+        {'role': 'assistant', 'content': 'Hey friend!'},
+        {'role': 'user', 'content': 'tell me about David'},
+    ]
+    assert stored.version == 3
+
+
+def test_two_workers_creating_the_same_session_both_keep_their_fields(tmp_path):
+    path = tmp_path / 'sessions.db'
+    first, second = make_store(path), make_store(path)
+
+    first.get('s1').insights = {'name': 'Ann'}
+    second.get('s1').voice_mode = True
+    first.save('s1')
+    second.save('s1')
+
+    stored = make_store(path).get('s1')
+    assert stored.insights == {'name': 'Ann'}
+    assert stored.voice_mode is True
+
+
+def test_row_removed_between_version_and_load(tmp_path):
+    store = make_store(tmp_path / 'sessions.db')
+    store.get('s1').insights = {'name': 'Ann'}
+    store.save('s1')
+    other = make_store(tmp_path / 'sessions.db')
+    other.get('s1').voice_mode = True
+    other.save('s1')
+
+    # Another worker deletes the row after version() but before load()
+    store.backend.load = lambda session_id: None
+
+    assert store.get('s1', create=False) is None
+    state = store.get('s1')
+    assert state.version == 0 and state.insights is None
+    assert len(store) == 1
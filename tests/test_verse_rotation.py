@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from verse_rotation import Rotation, RotationStore
+
+SAVED = {'u1': {'verse:sad': Rotation(0, 0b0111).encode()}}
+
+
+class Profiles:
+    """In-memory stand-in for the profile reads and writes"""
+
+    def __init__(self, saved=None, fail=0):
+        self.saved = {user_id: dict(pools) for user_id, pools in (saved or SAVED).items()}
+        self.fail = fail
+        self.writes = []
+
+    def load(self, user_id):
+        if self.fail:
+            self.fail -= 1
+            raise TimeoutError("profile read timed out")
+        return dict(self.saved.get(user_id, {}))
+
+    async def load_async(self, user_id):
+        await asyncio.sleep(0)
+        return self.load(user_id)
+
+    def save(self, user_id, store):
+        rotation = store.take_pending(user_id)
+        self.writes.append(rotation)
+        self.saved.setdefault(user_id, {}).update(rotation)
+
+    def store(self, **kwargs):
+        return RotationStore(loader=self.load, saver=self.save, async_loader=self.load_async, **kwargs)
+
+
+def test_saved_rotation_continues():
+    profiles = Profiles()
+    store = profiles.store()
+    # Three of four seen: the only unseen verse comes next, then a new cycle
+    assert store.pick('u1', 'verse:sad', 4) == 3
+    assert Rotation.decode(profiles.saved['u1']['verse:sad']).seen == 0b1111
+    picks = {store.pick('u1', 'verse:sad', 4) for _ in range(4)}
+    assert picks == {0, 1, 2, 3}
+
+
+def test_failed_load_is_not_cached_or_saved_over():
+    profiles = Profiles(fail=1)
+    store = profiles.store()
+    store.pick('u1', 'verse:sad', 4)
+    assert profiles.writes == []
+    assert profiles.saved['u1']['verse:sad'] == SAVED['u1']['verse:sad']
+    assert store.stats()['unknown_picks'] == 1
+
+    # The next pick retries the load and carries on from the saved state
+    assert store.pick('u1', 'verse:sad', 4) == 3
+
+
+def test_pick_on_the_event_loop_loads_asynchronously():
+    profiles = Profiles()
+    store = profiles.store()
+
+    async def chat():
+        # A sync pick on the loop can't block on the read: it is unrecorded,
+        # and the load runs in the background
+        store.pick('u1', 'verse:sad', 4)
+        assert profiles.writes == []
+        await asyncio.sleep(0.01)
+        return store.pick('u1', 'verse:sad', 4)
+
+    assert asyncio.run(chat()) == 3
+
+
+def test_pick_async_waits_for_the_saved_state():
+    profiles = Profiles()
+    store = profiles.store()
+    assert asyncio.run(store.pick_async('u1', 'verse:sad', 4)) == 3
+
+
+def test_no_saved_rotation_starts_fresh_and_saves():
+    profiles = Profiles()
+    store = profiles.store()
+    store.pick('new', 'note:sad', 3)
+    assert Rotation.decode(profiles.saved['new']['note:sad']).seen.bit_count() == 1
+
+
+def test_rotation_never_repeats_within_a_cycle():
+    rotation = Rotation()
+    for cycle in range(3):
+        assert sorted(rotation.pick(7, 'u1:verse:sad') for _ in range(7)) == list(range(7))
+    with pytest.raises(ValueError):
+        rotation.pick(0, 'u1:verse:sad')
@@ -0,0 +1,284 @@
+"""
+Per-user content rotation
+Each user walks a pool (a mood's verses, a mood's notes) without repeats
+until every item has been shown. What they have seen is a bitset over the
+pool's content IDs, stored in their Firestore profile as a few hex
+characters per pool, so the rotation carries on across sessions and workers.
+"""
+
+import os
+import random
+import asyncio
+import hashlib
+import logging
+import functools
+import threading
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+import metrics
+from async_runner import get_loop, run_sync
+from firebase_service import get_firebase_service
+from ttl_cache import TTLCache
+
+# Shuffled orders kept per pool size; a user's cycle picks one of them
+ROTATION_ORDERS = int(os.environ.get('ROTATION_ORDERS', '16'))
+ROTATION_CACHE_SIZE = int(os.environ.get('ROTATION_CACHE_SIZE', '10000'))
+# How long a worker trusts its copy before re-reading the profile
+ROTATION_CACHE_TTL = float(os.environ.get('ROTATION_CACHE_TTL', '600'))
+ROTATION_LOAD_TIMEOUT = float(os.environ.get('ROTATION_LOAD_TIMEOUT', '1'))
+
+# loader(user_id) -> {pool: encoded}, {} when nothing is saved; raises when
+# the saved state can't be read. async_loader is the same as a coroutine.
+Loader = Callable[[str], Dict[str, str]]
+AsyncLoader = Callable[[str], Awaitable[Dict[str, str]]]
+# saver(user_id, store) schedules a write of store.take_pending(user_id)
+Saver = Callable[[str, 'RotationStore'], None]
+
+
+@functools.lru_cache(maxsize=256)
+def _orders(size: int) -> Tuple[Tuple[int, ...], ...]:
+    """ROTATION_ORDERS shuffles of range(size), identical in every process"""
+    rng = random.Random(size)
+    orders = []
+    for _ in range(max(ROTATION_ORDERS, 1)):
+        order = list(range(size))
+        rng.shuffle(order)
+        orders.append(tuple(order))
+    return tuple(orders)
+
+
+class Rotation:
+    """Where one user is in one pool: the cycle number and the IDs seen in it"""
+    __slots__ = ('cycle', 'seen')
+
+    def __init__(self, cycle: int = 0, seen: int = 0):
+        self.cycle = cycle
+        self.seen = seen
+
+    def encode(self) -> str:
+        return f"{self.cycle:x}.{self.seen:x}"
+
+    @classmethod
+    def decode(cls, value: Optional[str]) -> 'Rotation':
+        try:
+            cycle, seen = value.split('.')
+            return cls(int(cycle, 16), int(seen, 16))
+        except (AttributeError, ValueError):
+            return cls()
+
+    def pick(self, size: int, salt: str) -> int:
+        """The next unseen content ID in [0, size), starting a new cycle once
+        all have been seen.
+
+        Every pick of a cycle follows one shuffled order, so the next ID is
+        the order's entry at popcount(seen). The scan past seen IDs only runs
+        after the pool has changed size.
+        """
+        if size <= 0:
+            raise ValueError("Cannot rotate through an empty pool")
+        full = (1 << size) - 1
+        seen = self.seen & full
+        if seen == full:
+            self.cycle += 1
+            seen = 0
+
+        digest = hashlib.sha256(f"{salt}:{self.cycle}".encode('utf-8')).digest()
+        orders = _orders(size)
+        order = orders[int.from_bytes(digest[:4], 'big') % len(orders)]
+        position = seen.bit_count()
+        choice = order[position % size]
+        while seen >> choice & 1:
+            position += 1
+            choice = order[position % size]
+
+        self.seen = seen | 1 << choice
+        return choice
+
+
+class RotationStore:
+    """Rotations for recently active users, read from and written back to
+    their profile. Writes for a user are coalesced: picks made before the
+    previous write has gone out ride along with it.
+
+    A user whose saved state couldn't be read yet gets a random pick that is
+    neither cached nor saved, so a failed or pending load never overwrites
+    their real progress.
+    """
+
+    def __init__(self, loader: Optional[Loader] = None, saver: Optional[Saver] = None,
+                 async_loader: Optional[AsyncLoader] = None,
+                 max_users: int = ROTATION_CACHE_SIZE, ttl: float = ROTATION_CACHE_TTL):
+        self.loader = loader
+        self.async_loader = async_loader
+        self.saver = saver
+        self._users = TTLCache(max_entries=max_users, ttl=ttl)
+        self._pending: Dict[str, Dict[str, str]] = {}
+        self._loading: Set[str] = set()
+        self._lock = threading.Lock()
+        self.cycles_completed = 0
+        self.unknown_picks = 0
+
+    def pick(self, user_id: str, pool: str, size: int) -> int:
+        """The next content ID of `pool` for the user"""
+        rotations = self._rotations(user_id)
+        if rotations is None:
+            return self._unknown_pick(size)
+        return self._pick(user_id, rotations, pool, size)
+
+    async def pick_async(self, user_id: str, pool: str, size: int) -> int:
+        """pick() for code on the event loop: waits for the saved state instead of blocking on it"""
+        rotations = await self.load_async(user_id)
+        if rotations is None:
+            return self._unknown_pick(size)
+        return self._pick(user_id, rotations, pool, size)
+
+    async def load_async(self, user_id: str) -> Optional[Dict[str, Rotation]]:
+        """The user's rotations, loaded without blocking the loop; None if they can't be read"""
+        rotations = self._users.get(user_id)
+        if rotations is not None or self.async_loader is None:
+            return rotations if rotations is not None else self._rotations(user_id)
+        try:
+            stored = await asyncio.wait_for(self.async_loader(user_id), ROTATION_LOAD_TIMEOUT)
+        except Exception as e:
+            logging.warning(f"Could not load verse rotation for {user_id}: {e!r}")
+            return None
+        return self._remember(user_id, stored)
+
+    def _unknown_pick(self, size: int) -> int:
+        if size <= 0:
+            raise ValueError("Cannot rotate through an empty pool")
+        self.unknown_picks += 1
+        return random.randrange(size)
+
+    def _pick(self, user_id: str, rotations: Dict[str, Rotation], pool: str, size: int) -> int:
+        with self._lock:
+            rotation = rotations.get(pool)
+            if rotation is None:
+                rotation = rotations[pool] = Rotation()
+            cycle = rotation.cycle
+            choice = rotation.pick(size, f"{user_id}:{pool}")
+            if rotation.cycle != cycle:
+                self.cycles_completed += 1
+            encoded = rotation.encode()
+            pending = self._pending.get(user_id)
+            if pending is not None:
+                pending[pool] = encoded
+                return choice
+            self._pending[user_id] = {pool: encoded}
+        self._save(user_id)
+        return choice
+
+    def forget(self, user_id: str):
+        self._users.pop(user_id)
+
+    def stats(self) -> Dict[str, int]:
+        stats = self._users.stats()
+        stats['cycles_completed'] = self.cycles_completed
+        stats['pending_writes'] = len(self._pending)
+        stats['unknown_picks'] = self.unknown_picks
+        return stats
+
+    def take_pending(self, user_id: str) -> Dict[str, str]:
+        """Rotations changed since the user's last write; the caller writes them"""
+        with self._lock:
+            return self._pending.pop(user_id, {})
+
+    def _rotations(self, user_id: str) -> Optional[Dict[str, Rotation]]:
+        """The cached or freshly loaded rotations, or None while they're unknown"""
+        rotations = self._users.get(user_id)
+        if rotations is not None:
+            return rotations
+        if self.loader is None and self.async_loader is None:
+            return self._remember(user_id, {})
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None or self.loader is None:
+            # Blocking here would stall the loop the read needs: load in the
+            # background and let this one pick go unrecorded
+            self._load_in_background(user_id, loop)
+            return None
+        try:
+            return self._remember(user_id, self.loader(user_id))
+        except Exception as e:
+            logging.warning(f"Could not load verse rotation for {user_id}: {e!r}")
+            return None
+
+    def _load_in_background(self, user_id: str, loop: Optional[asyncio.AbstractEventLoop]):
+        if self.async_loader is None:
+            return
+        with self._lock:
+            if user_id in self._loading:
+                return
+            self._loading.add(user_id)
+
+        async def load():
+            try:
+                await self.load_async(user_id)
+            finally:
+                self._loading.discard(user_id)
+
+        if loop is not None:
+            loop.create_task(load())
+        else:
+            asyncio.run_coroutine_threadsafe(load(), get_loop())
+
+    def _remember(self, user_id: str, stored: Dict[str, str]) -> Dict[str, Rotation]:
+        loaded = {pool: Rotation.decode(value) for pool, value in (stored or {}).items()}
+        with self._lock:
+            # Another thread may have loaded the user meanwhile; keep its copy
+            rotations = self._users.get(user_id)
+            if rotations is None:
+                rotations = loaded
+                self._users.set(user_id, rotations)
+        return rotations
+
+    def _save(self, user_id: str):
+        if self.saver is None:
+            self.take_pending(user_id)
+            return
+        try:
+            self.saver(user_id, self)
+        except Exception as e:
+            self.take_pending(user_id)
+            logging.warning(f"Could not save verse rotation for {user_id}: {e}")
+
+
+async def _load_from_profile_async(user_id: str) -> Dict[str, str]:
+    return await get_firebase_service().get_rotation(user_id)
+
+
+def _load_from_profile(user_id: str) -> Dict[str, str]:
+    return run_sync(_load_from_profile_async(user_id), timeout=ROTATION_LOAD_TIMEOUT)
+
+
+def _save_to_profile(user_id: str, store: RotationStore):
+    async def write():
+        # Runs once the loop gets to it; later picks have joined the payload by then
+        rotation = store.take_pending(user_id)
+        if rotation:
+            await get_firebase_service().save_rotation(user_id, rotation)
+
+    def log_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            logging.warning(f"Verse rotation write failed for {user_id}: {future.exception()}")
+
+    asyncio.run_coroutine_threadsafe(write(), get_loop()).add_done_callback(log_failure)
+
+
+_rotation_store = None
+_rotation_store_lock = threading.Lock()
+
+
+def get_rotation_store() -> RotationStore:
+    """Process-wide rotation store backed by the users' Firestore profiles"""
+    global _rotation_store
+    if _rotation_store is None:
+        with _rotation_store_lock:
+            if _rotation_store is None:
+                _rotation_store = RotationStore(loader=_load_from_profile, saver=_save_to_profile,
+                                                async_loader=_load_from_profile_async)
+                metrics.REGISTRY.register_collector(
+                    lambda: metrics.cache_family('rotation', _rotation_store.stats()))
+    return _rotation_store
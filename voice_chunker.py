@@ -0,0 +1,170 @@
+"""
+Incremental voice chunker
+Turns streamed text into speakable chunks as soon as each sentence is
+complete, so voice mode can start talking before generation finishes.
+Chunks are slices of the original text: punctuation and wording are kept.
+"""
+
+import re
+from typing import Iterable, Iterator, List
+
+# Words that end in a period without ending the sentence, lowercased and
+# without the period
+ABBREVIATIONS = frozenset({
+    'mr', 'mrs', 'ms', 'dr', 'st', 'jr', 'sr', 'rev', 'fr', 'vs', 'etc', 'e.g', 'i.e', 'cf', 'approx', 'vol',
+    'ch', 'chap', 'vv', 'ver',
+})
+
+# Bible book abbreviations ("1 Cor. 13:4"). Several are also names (Sam, Dan,
+# Phil), so they only count when a chapter number follows.
+BOOK_ABBREVIATIONS = frozenset({
+    'gen', 'ex', 'exod', 'lev', 'num', 'deut', 'josh', 'judg', 'sam', 'kgs', 'chr', 'neh', 'esth', 'ps', 'psa',
+    'prov', 'eccl', 'eccles', 'isa', 'jer', 'lam', 'ezek', 'dan', 'hos', 'obad', 'mic', 'nah', 'hab', 'zeph',
+    'hag', 'zech', 'mal', 'matt', 'mt', 'mk', 'lk', 'jn', 'rom', 'cor', 'gal', 'eph', 'phil', 'col', 'thess',
+    'tim', 'tit', 'philem', 'heb', 'jas', 'pet', 'jude', 'rev',
+})
+
+# Sentence-ending punctuation, any closing quotes/brackets, then whitespace.
+# A period between digits ("3.16") never matches because whitespace is required.
+_BOUNDARY_RE = re.compile(r'[.!?…]+["\'”’)\]]*(?=\s)|\n\s*\n')
+_WORD_BEFORE_RE = re.compile(r'([\w.]+)[.]$')
+# Places to cut a sentence that is too long to speak as one chunk
+_CLAUSE_RE = re.compile(r'[,;—–]\s|:\s|\s-\s')
+
+
+class VoiceChunker:
+    """Feed text pieces in, get voice-ready chunks out.
+
+    A finished sentence is packed with the ones before it while the chunk
+    stays under `max_chars`; the chunk is released once it reaches
+    `min_chars`. The very first sentence is released straight away so speech
+    can start early unless `eager_first` is off. min_chars == max_chars
+    without eager_first gives plain greedy packing.
+    """
+
+    def __init__(self, max_chars: int = 350, min_chars: int = 80, eager_first: bool = True):
+        self.max_chars = max_chars
+        self.min_chars = min(min_chars, max_chars)
+        self.eager_first = eager_first
+        self._buffer = ''
+        self._pending = ''
+        self._emitted = 0
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text; returns any chunks that are now complete"""
+        if not text:
+            return []
+        self._buffer += text
+        chunks = []
+        while True:
+            end = self._sentence_end(final=False)
+            if end is None:
+                break
+            sentence, self._buffer = self._buffer[:end].strip(), self._buffer[end:].lstrip()
+            chunks.extend(self._add_sentence(sentence))
+
+        # No boundary in sight and already too long to speak in one go
+        while len(self._buffer) > self.max_chars:
+            cut = self._cut_point(self._buffer)
+            piece, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:].lstrip()
+            chunks.extend(self._release())
+            chunks.extend(self._emit(piece))
+        return chunks
+
+    def flush(self) -> List[str]:
+        """End of stream: whatever is left becomes the last chunks"""
+        chunks = []
+        while True:
+            end = self._sentence_end(final=True)
+            if end is None:
+                break
+            sentence, self._buffer = self._buffer[:end].strip(), self._buffer[end:].lstrip()
+            chunks.extend(self._add_sentence(sentence))
+        if self._buffer.strip():
+            chunks.extend(self._add_sentence(self._buffer.strip()))
+        self._buffer = ''
+        chunks.extend(self._release())
+        return chunks
+
+    def _sentence_end(self, final: bool):
+        """Offset just past the first real sentence boundary in the buffer"""
+        for match in _BOUNDARY_RE.finditer(self._buffer):
+            end = match.end()
+            if match.group().strip() == '':
+                return end
+            # Need the next visible character to judge the boundary
+            rest = self._buffer[end:].lstrip()
+            if not rest:
+                if final:
+                    return end
+                return None
+            if match.group()[0] == '.' and self._is_abbreviation(match.start(), rest[0]):
+                continue
+            # "...and then. so" is not a new sentence; "3:16. Then" is
+            if rest[0].islower():
+                continue
+            return end
+        return None
+
+    def _is_abbreviation(self, period_at: int, next_char: str) -> bool:
+        word = _WORD_BEFORE_RE.search(self._buffer[:period_at + 1])
+        if not word:
+            return False
+        token = word.group(1).lower()
+        if token in ABBREVIATIONS:
+            return True
+        if token in BOOK_ABBREVIATIONS and next_char.isdigit():
+            return True
+        # Single capitals are initials ("C. S. Lewis"), except "I" and "A"
+        raw = word.group(1)
+        return len(raw) == 1 and raw.isupper() and raw not in ('I', 'A')
+
+    def _add_sentence(self, sentence: str) -> List[str]:
+        chunks = []
+        if len(sentence) > self.max_chars:
+            chunks.extend(self._release())
+            while len(sentence) > self.max_chars:
+                cut = self._cut_point(sentence)
+                chunks.extend(self._emit(sentence[:cut].strip()))
+                sentence = sentence[cut:].lstrip()
+        if self._pending and len(self._pending) + 1 + len(sentence) > self.max_chars:
+            chunks.extend(self._release())
+        self._pending = f"{self._pending} {sentence}" if self._pending else sentence
+        if (self.eager_first and self._emitted == 0) or len(self._pending) >= self.min_chars:
+            chunks.extend(self._release())
+        return chunks
+
+    def _cut_point(self, text: str) -> int:
+        """Last clause break, else last space, before max_chars"""
+        window = text[:self.max_chars]
+        clauses = [match.end() for match in _CLAUSE_RE.finditer(window)]
+        if clauses and clauses[-1] > self.max_chars // 3:
+            return clauses[-1]
+        space = window.rfind(' ')
+        return space if space > 0 else self.max_chars
+
+    def _release(self) -> List[str]:
+        pending, self._pending = self._pending, ''
+        return self._emit(pending)
+
+    def _emit(self, chunk: str) -> List[str]:
+        if not chunk:
+            return []
+        self._emitted += 1
+        return [chunk]
+
+
+def chunk_stream(pieces: Iterable[str], max_chars: int = 350, min_chars: int = 80) -> Iterator[str]:
+    """Voice chunks from an iterable of streamed text pieces"""
+    chunker = VoiceChunker(max_chars, min_chars)
+    for piece in pieces:
+        yield from chunker.feed(piece)
+    yield from chunker.flush()
+
+
+def chunk_text(text: str, max_chars: int = 350) -> List[str]:
+    """Greedy sentence packing of a finished text"""
+    chunker = VoiceChunker(max_chars, min_chars=max_chars, eager_first=False)
+    chunks = chunker.feed(text or '')
+    chunks.extend(chunker.flush())
+    return chunks